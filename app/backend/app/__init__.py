@@ -1,15 +1,20 @@
 import os
+from app.utils import UPLOAD_FOLDER, load_env
+
+# Settings are read from the environment when modules are imported (limiter,
+# storage, caches...): load .env before importing any of them
+load_env()
+
 from flask import Flask
 from flask_cors import CORS
-from dotenv import load_dotenv
 from app.api import api_bp
-from app.extensions import login_manager, bcrypt, limiter, swagger
-from app.utils import UPLOAD_FOLDER
+from app.extensions import login_manager, bcrypt, limiter, init_swagger
+from app import metrics, query_budget, compression, db
 
 
 def create_app(debug: bool = False):
     # Load .env file
-    load_dotenv()
+    load_env()
 
     # The APP + Settings
     app = Flask(__name__, template_folder='../frontend')
@@ -36,14 +41,34 @@ def create_app(debug: bool = False):
     # Set the limiter
     limiter.init_app(app)
 
-    # Set the swagger
-    swagger.init_app(app)
-    
+    # Set the request / MongoDB metrics
+    metrics.init_app(app)
+
+    # Keep a user's reads on the MongoDB primary right after their writes
+    db.init_app(app)
+
+    # Compress large JSON responses (gzip / zstd)
+    compression.init_app(app)
+
+    # Flag routes issuing too many / repeated MongoDB queries (debug and tests)
+    if debug or os.getenv("QUERY_BUDGET_ENABLED") == "1":
+        query_budget.init_app(app)
+
+    # Set the swagger, off by default in production (ENABLE_SWAGGER=1 to force it)
+    if os.getenv("ENABLE_SWAGGER", "1" if debug else "0") == "1":
+        init_swagger(app)
+    # Prebuilt spec (`python -m app.openapi`), served as a static file
+    from app.openapi import init_app as init_openapi
+    init_openapi(app)
+
     # Add cross origin cookies
     origin = os.getenv("REACT_HOST_ORIGIN")
-    if "127.0.0.1" in origin:
+    if origin and "127.0.0.1" in origin:
         print("/!\\ WARNING: 127.0.0.1 in REACT_HOST_ORIGIN break cookies -> Instead use localhost")
-    CORS(app, supports_credentials=True, resources={r"*": {"origins": [origin]}}, max_age=86400)
+    if origin:
+        CORS(app, supports_credentials=True, resources={r"*": {"origins": [origin]}}, max_age=86400)
+    else:
+        print("/!\\ WARNING: REACT_HOST_ORIGIN not set, CORS disabled (same origin requests only)")
     app.secret_key = os.getenv("APP_SECRET_KEY")
 
     # Register routes blueprint
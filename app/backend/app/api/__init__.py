@@ -3,4 +3,4 @@ from flask import Blueprint
 api_bp = Blueprint("api", __name__)
 
 # Import routes to register them
-from app.api.routes import user, containers, categories, items, media, export_import
+from app.api.routes import user, containers, categories, items, media, export_import, metrics, tags, search, duplicates, import_uploads, members
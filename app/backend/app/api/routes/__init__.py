@@ -1,2 +1,2 @@
 # Import all routes to register them with the blueprint
-from app.api.routes import user, containers, categories, items, media, export_import
\ No newline at end of file
+from app.api.routes import user, containers, categories, items, media, export_import, metrics, tags, search, duplicates, import_uploads, members
\ No newline at end of file
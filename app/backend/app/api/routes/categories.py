@@ -5,6 +5,7 @@ from app.api import api_bp
 from app.db import db
 from app.utils import MAX_SIZE_NAME
 from app.api.utils.helpers import safe_object_id, get_container_access
+from app.api.utils import category_cache, changes
 
 
 @api_bp.route("/container/<container_id>/categories", methods=["GET"])
@@ -48,10 +49,10 @@ def list_categories(container_id):
     if not container:
         return jsonify({"error": "Unauthorized access to this container!"}), 403
     
-    categories = list(db.categories.find({"container_id": container_id}))
-    for cat in categories:
-        cat["_id"] = str(cat["_id"])
-        cat["container_id"] = str(cat["container_id"])
+    categories = [
+        {"_id": str(cat_id), "name": name, "container_id": str(container_id)}
+        for cat_id, name in category_cache.get_categories(container).items()
+    ]
     return jsonify(categories), 200
 
 
@@ -117,10 +118,12 @@ def add_category(container_id):
     
     category = {
         "name": category_name,
-        "container_id": container_id
+        "container_id": container_id,
+        "updated_at": changes.now()
     }
     
     result = db.categories.insert_one(category)
+    category_cache.category_added(container_id, result.inserted_id, category_name)
     
     return jsonify({"message": "Category added", "id": str(result.inserted_id)}), 201
 
@@ -186,10 +189,11 @@ def update_category(container_id, category_id):
     
     result = db.categories.update_one(
         {"_id": category_id, "container_id": container_id},
-        {"$set": {"name": data["name"]}}
+        {"$set": {"name": data["name"], "updated_at": changes.now()}}
     )
     if result.matched_count == 0:
         return jsonify({"error": "Category not found"}), 404
+    category_cache.category_renamed(container_id, category_id, data["name"])
     
     return jsonify({"message": "Category updated successfully"}), 201
 
@@ -238,6 +242,9 @@ def delete_category(container_id, category_id):
     result = db.categories.delete_one({"container_id": container_id, "_id": category_id})
     
     if result.deleted_count == 1:
+        category_cache.category_removed(container_id, category_id)
+        # Importing the delta also removes the items of the category
+        changes.record_deletion("category", category_id, container_id)
         return jsonify({"message": "Category deleted successfully"}), 200
     else:
         return jsonify({"message": "Category not found"}), 404
\ No newline at end of file
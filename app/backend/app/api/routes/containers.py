@@ -3,9 +3,13 @@ from flask_login import login_required, current_user
 from bson import ObjectId
 from pymongo.errors import DuplicateKeyError
 from app.api import api_bp
-from app.db import db
+from app.db import db, read_db
 from app.utils import MAX_SIZE_NAME
 from app.api.utils.helpers import safe_object_id, get_container_access
+from app.api.utils import category_cache, changes, memberships
+
+# Bookkeeping fields (admin count, category cache version) kept out of API responses
+INTERNAL_CONTAINER_FIELDS = ("admin_count", "categories_version")
 
 
 @api_bp.route("/containers", methods=["GET"])
@@ -35,19 +39,20 @@ def list_containers():
               admin_id:
                 type: string
                 example: "507f1f77bcf86cd799439012"
-              member_ids:
-                type: array
-                items:
-                  type: string
+              role:
+                type: string
+                enum: [admin, member]
+                description: Role of the current user
       401:
         description: Not authenticated
     """
     user_id = ObjectId(current_user.id)
-    containers = list(db.containers.find({"member_ids": user_id}))
+    roles = memberships.user_roles(user_id, read_db)
+    containers = list(read_db.containers.find({"_id": {"$in": list(roles)}}, {field: 0 for field in INTERNAL_CONTAINER_FIELDS}))
     for container in containers:
+        container["role"] = roles[container["_id"]]
         container["_id"] = str(container["_id"])
         container["admin_id"] = str(container["admin_id"])
-        container["member_ids"] = [str(uid) for uid in container["member_ids"]]
     return jsonify(containers), 200
 
 
@@ -112,10 +117,10 @@ def add_container():
     if not user_id:
         return jsonify({"error": "User not found"}), 404
 
-    # Enforce unique container name per admin
+    # Enforce unique container name among the containers the user administers
     existing = db.containers.find_one({
         "name": container_name,
-        "admin_id": user_id
+        "_id": {"$in": memberships.admin_container_ids(user_id)}
     })
     if existing:
         return jsonify({"error": "Container already exists"}), 409
@@ -123,13 +128,14 @@ def add_container():
     container = {
         "name": container_name,
         "admin_id": user_id,
-        "member_ids": [user_id],
+        "admin_count": 1,
     }
 
     try:
         result = db.containers.insert_one(container)
     except DuplicateKeyError:
         return jsonify({"error": "Container already exists"}), 409
+    db.memberships.insert_one(memberships.membership(result.inserted_id, user_id, memberships.ADMIN))
 
     return jsonify({"message": "Container added", "id": str(result.inserted_id)}), 201
 
@@ -163,20 +169,23 @@ def delete_container(container_id):
       401:
         description: Not authenticated
       403:
-        description: Unauthorized access
+        description: Unauthorized access (container admins only)
       404:
         description: Container not found
     """
-    container, container_id = get_container_access(container_id, current_user.id)
+    container, container_id = get_container_access(container_id, current_user.id, roles=[memberships.ADMIN])
     if not container:
         return jsonify({"error": "Unauthorized access to this container!"}), 403
 
-    # Delete all items and categories belonging to this container
+    # Delete all items, categories and memberships belonging to this container
     db.items.delete_many({"container_id": container_id})
     db.categories.delete_many({"container_id": container_id})
+    memberships.remove_container(container_id)
     result = db.containers.delete_one({"_id": container["_id"]})
+    category_cache.container_removed(container["_id"])
     
     if result.deleted_count == 1:
+        changes.record_deletion("container", container["_id"], container["_id"])
         return jsonify({"message": "Container deleted successfully"}), 200
     else:
         return jsonify({"error": "Container not found"}), 404
@@ -273,10 +282,6 @@ def get_container(container_id):
               type: string
             admin_id:
               type: string
-            member_ids:
-              type: array
-              items:
-                type: string
       401:
         description: Not authenticated
       403:
@@ -286,10 +291,12 @@ def get_container(container_id):
     if not container:
         return jsonify({"error": "Unauthorized access to this container!"}), 403
 
+    # The access check reads the whole document (the category cache needs its version)
+    for field in INTERNAL_CONTAINER_FIELDS:
+        container.pop(field, None)
+
     # Convert ObjectIds to strings for JSON
     container["_id"] = str(container["_id"])
     if "admin_id" in container:
         container["admin_id"] = str(container["admin_id"])
-    if "member_ids" in container:
-        container["member_ids"] = [str(x) for x in container["member_ids"]]
     return container, 200
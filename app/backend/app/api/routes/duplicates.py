@@ -0,0 +1,204 @@
+from flask import request, jsonify
+from flask_login import login_required, current_user
+from app.api import api_bp
+from app.db import read_db
+from app.api.utils.helpers import safe_int, safe_float, safe_object_id, get_container_access
+from app.api.utils.dedup import load_index, DEFAULT_THRESHOLD
+from app.api.utils.phash import similar_items, similar_pairs, DEFAULT_MAX_DISTANCE, MAX_DISTANCE
+
+MAX_DUPLICATES_LIMIT = 500
+DUPLICATE_ITEM_PROJECTION = {"name": 1, "serie": 1, "edition": 1, "category_id": 1, "image_path": 1}
+
+
+def _public_item(item):
+    return {
+        "_id": str(item["_id"]),
+        "name": item.get("name"),
+        "serie": item.get("serie"),
+        "edition": item.get("edition"),
+        "category_id": str(item["category_id"]) if item.get("category_id") else None,
+        "image_path": item.get("image_path"),
+    }
+
+
+@api_bp.route("/container/<container_id>/items/duplicates", methods=["GET"])
+@login_required
+def find_duplicates(container_id):
+    """
+    Find likely duplicate items in a container
+    ---
+    tags:
+      - Items
+    security:
+      - Session: []
+    description: |
+      Compares the normalized name, serie and edition of the items with a
+      MinHash/LSH index, only items sharing a signature band are scored.
+      A pair is reported when its estimated Jaccard similarity reaches the
+      threshold, or when one text is almost fully contained in the other.
+    parameters:
+      - name: container_id
+        in: path
+        type: string
+        required: true
+      - name: threshold
+        in: query
+        type: number
+        default: 0.5
+        minimum: 0.1
+        maximum: 1
+      - name: limit
+        in: query
+        type: integer
+        default: 100
+        maximum: 500
+    responses:
+      200:
+        description: Pairs sorted by decreasing similarity
+        schema:
+          type: object
+          properties:
+            scanned:
+              type: integer
+            pairs:
+              type: array
+              items:
+                type: object
+                properties:
+                  items:
+                    type: array
+                    items:
+                      type: object
+                  jaccard:
+                    type: number
+                  containment:
+                    type: number
+      401:
+        description: Not authenticated
+      403:
+        description: Unauthorized access
+    """
+    container, container_id = get_container_access(container_id, current_user.id)
+    if not container:
+        return jsonify({"error": "Unauthorized access to this container!"}), 403
+
+    threshold = max(0.1, min(safe_float(request.args.get("threshold"), DEFAULT_THRESHOLD), 1.0))
+    limit = max(1, min(safe_int(request.args.get("limit"), 100), MAX_DUPLICATES_LIMIT))
+
+    index, items = load_index(read_db, container_id, DUPLICATE_ITEM_PROJECTION)
+    pairs = sorted(index.pairs(threshold), key=lambda pair: max(pair[2], pair[3]), reverse=True)
+
+    return jsonify({
+        "scanned": len(items),
+        "pairs": [
+            {
+                "items": [_public_item(items[key_a]), _public_item(items[key_b])],
+                "jaccard": round(jaccard, 2),
+                "containment": round(containment, 2),
+            }
+            for key_a, key_b, jaccard, containment in pairs[:limit]
+        ]
+    }), 200
+
+
+@api_bp.route("/container/<container_id>/items/similar-images", methods=["GET"])
+@login_required
+def find_similar_images(container_id):
+    """
+    Find items of a container with the same or a nearly identical photo
+    ---
+    tags:
+      - Items
+    security:
+      - Session: []
+    description: |
+      Compares the perceptual hashes (64-bit dHash) of the item images. The
+      hashes are indexed by band, only items sharing a band value close enough
+      to reach `max_distance` are compared. With `item_id`, returns the items
+      whose image is similar to the image of this item, else the similar pairs
+      of the whole container.
+    parameters:
+      - name: container_id
+        in: path
+        type: string
+        required: true
+      - name: item_id
+        in: query
+        type: string
+        required: false
+      - name: max_distance
+        in: query
+        type: integer
+        default: 6
+        minimum: 0
+        maximum: 11
+        description: Maximum number of differing hash bits (0 is the same image)
+      - name: limit
+        in: query
+        type: integer
+        default: 100
+        maximum: 500
+    responses:
+      200:
+        description: Items (with item_id) or pairs sorted by increasing distance
+        schema:
+          type: object
+          properties:
+            scanned:
+              type: integer
+            items:
+              type: array
+              items:
+                type: object
+                properties:
+                  item:
+                    type: object
+                  distance:
+                    type: integer
+            pairs:
+              type: array
+              items:
+                type: object
+                properties:
+                  items:
+                    type: array
+                    items:
+                      type: object
+                  distance:
+                    type: integer
+      400:
+        description: Invalid item ID
+      401:
+        description: Not authenticated
+      403:
+        description: Unauthorized access
+      404:
+        description: Item not found or without a hashed image
+    """
+    container, container_id = get_container_access(container_id, current_user.id)
+    if not container:
+        return jsonify({"error": "Unauthorized access to this container!"}), 403
+
+    max_distance = max(0, min(safe_int(request.args.get("max_distance"), DEFAULT_MAX_DISTANCE), MAX_DISTANCE))
+    limit = max(1, min(safe_int(request.args.get("limit"), 100), MAX_DUPLICATES_LIMIT))
+
+    if request.args.get("item_id"):
+        item_id = safe_object_id(request.args["item_id"])
+        if item_id is None:
+            return jsonify({"error": "Invalid item ID"}), 400
+        item = read_db.items.find_one({"container_id": container_id, "_id": item_id}, {"image_hash": 1})
+        if not item or not item.get("image_hash"):
+            return jsonify({"error": "Item not found or without a hashed image"}), 404
+        similar = similar_items(read_db, container_id, item["image_hash"], max_distance, DUPLICATE_ITEM_PROJECTION, exclude=item_id)
+        return jsonify({
+            "items": [{"item": _public_item(found), "distance": distance} for found, distance in similar[:limit]]
+        }), 200
+
+    pairs, items = similar_pairs(read_db, container_id, max_distance, DUPLICATE_ITEM_PROJECTION)
+    return jsonify({
+        "scanned": len(items),
+        "pairs": [
+            {"items": [_public_item(items[key_a]), _public_item(items[key_b])], "distance": distance}
+            for key_a, key_b, distance in pairs[:limit]
+        ]
+    }), 200
@@ -1,17 +1,60 @@
 import datetime
 import json
 import base64
-from pathlib import Path
-from flask import request, jsonify, send_file
+import os
+from flask import request, jsonify, Response, stream_with_context
 from flask_login import login_required, current_user
 from bson import ObjectId
-from io import BytesIO
 from app.api import api_bp
-from app.db import db
-from app.utils import UPLOAD_FOLDER
+from app.db import db, read_db, get_read_db, max_read_lag
 from app.api.utils.helpers import safe_object_id, get_container_access
+from app.api.utils import category_cache
+from app.api.utils.search import INTERNAL_ITEM_PROJECTION
+from app.api.utils import changes, images, pipeline
+from app import compression as compression_utils, storage
+from app.api.utils.importer import plan_import, apply_import, EXPORT_VERSION
+from app.api.utils.delta import resolve_baseline, apply_chain
 
-EXPORT_VERSION = "1.0"
+DELETED_KEYS = {"category": "deleted_categories", "item": "deleted_items"}
+
+
+def _export_item(item, include_images):
+    """JSON bytes of one exported item (runs in the export pool)"""
+    item_export = {
+        "source_id": str(item["_id"]),
+        "category_temp_id": str(item["category_id"]),
+        "name": item.get("name"),
+        "owner": item.get("owner"),
+        "serie": item.get("serie"),
+        "description": item.get("description"),
+        "value": item.get("value"),
+        "date_created": item.get("date_created"),
+        "location": item.get("location"),
+        "creator": item.get("creator"),
+        "tags": item.get("tags", []),
+        "comment": item.get("comment"),
+        "condition": item.get("condition"),
+        "number": item.get("number"),
+        "edition": item.get("edition"),
+        "image_path": item.get("image_path")
+    }
+    
+    # Include image as base64 if requested
+    image_data = None
+    if include_images and item.get("image_path") and item["image_path"] != "not-image.png":
+        try:
+            image_data = base64.b64encode(storage.media.read(item["image_path"]))
+            item_export["image_extension"] = os.path.splitext(item["image_path"])[1]
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Failed to encode image: {e}")
+    
+    item_json = _dumps(item_export).encode('utf-8')
+    if image_data is None:
+        return item_json
+    # Base64 needs no JSON escaping: splice the bytes instead of dumping a multi-MB string
+    return item_json[:-1] + b',"image_data":"' + image_data + b'"}'
 
 
 @api_bp.route("/export/containers", methods=["POST"])
@@ -40,9 +83,23 @@ def export_containers():
               type: boolean
               description: Whether to include images as base64
               default: true
+            since:
+              type: string
+              description: |
+                Baseline of a differential export, the id of a previous export
+                (`export_id` of its file) or an ISO 8601 timestamp. Only the
+                categories and items created, updated or deleted since then are
+                exported, plus containers absent from the baseline export.
+            compression:
+              type: string
+              enum: [gzip, zstd]
+              description: |
+                Download a compressed file (.json.gz / .json.zst), compressed while
+                it is streamed. Without it the JSON is still compressed on the wire
+                when the client sends Accept-Encoding.
     responses:
       200:
-        description: JSON export file
+        description: JSON export file (`kind` is `full` or `delta`), streamed
         content:
           application/json:
             schema:
@@ -59,95 +116,142 @@ def export_containers():
     if not container_ids:
         return jsonify({"error": "No containers selected"}), 400
     
-    export_data = {
-        "version": EXPORT_VERSION,
-        "export_date": datetime.datetime.now(datetime.timezone.utc).isoformat(),
-        "containers": []
-    }
+    user_id = ObjectId(current_user.id)
+    baseline, error = resolve_baseline(data.get("since"), user_id)
+    if error:
+        return jsonify({"error": error}), 400
+    
+    compression = data.get("compression")
+    if compression and compression not in compression_utils.available_encodings():
+        return jsonify({"error": f"Unsupported compression, expected one of: {', '.join(compression_utils.available_encodings())}"}), 400
     
-    for idx, container_id_str in enumerate(container_ids):
+    containers = []
+    for container_id_str in container_ids:
         container, container_id = get_container_access(container_id_str, current_user.id)
         if not container:
             return jsonify({"error": f"Unauthorized access to container {container_id_str}"}), 403
-        
-        # Create temporary ID for this container
-        container_temp_id = f"container_{idx + 1}"
-        
-        # Export container
-        container_export = {
-            "temp_id": container_temp_id,
-            "name": container["name"],
-            "categories": [],
-            "items": []
-        }
-        
-        # Map ObjectId to temp_id for categories
-        category_id_map = {}
-        
-        # Export categories
-        categories = list(db.categories.find({"container_id": container_id}))
-        for cat_idx, category in enumerate(categories):
-            category_temp_id = f"category_{idx + 1}_{cat_idx + 1}"
-            category_id_map[str(category["_id"])] = category_temp_id
-            
-            container_export["categories"].append({
-                "temp_id": category_temp_id,
-                "name": category["name"]
-            })
-        
-        # Export items
-        items = list(db.items.find({"container_id": container_id}))
-        for item in items:
-            item_export = {
-                "category_temp_id": category_id_map.get(str(item["category_id"])),
-                "name": item.get("name"),
-                "owner": item.get("owner"),
-                "serie": item.get("serie"),
-                "description": item.get("description"),
-                "value": item.get("value"),
-                "date_created": item.get("date_created"),
-                "location": item.get("location"),
-                "creator": item.get("creator"),
-                "tags": item.get("tags", []),
-                "comment": item.get("comment"),
-                "condition": item.get("condition"),
-                "number": item.get("number"),
-                "edition": item.get("edition"),
-                "image_path": item.get("image_path")
-            }
-            
-            # Include image as base64 if requested
-            if include_images and item.get("image_path"):
-                try:
-                    image_path = Path(UPLOAD_FOLDER) / item["image_path"]
-                    if image_path.exists() and image_path.is_file():
-                        with open(image_path, "rb") as img_file:
-                            image_data = base64.b64encode(img_file.read()).decode('utf-8')
-                            item_export["image_data"] = image_data
-                            item_export["image_extension"] = image_path.suffix
-                except Exception as e:
-                    print(f"Failed to encode image: {e}")
-            
-            container_export["items"].append(item_export)
-        
-        export_data["containers"].append(container_export)
+        containers.append(container)
     
-    # Create JSON file
-    json_data = json.dumps(export_data, indent=2, ensure_ascii=False)
+    # Read the clock before the data: a change made during the export is exported again next time.
+    # Reads resolved once here (the containers are read in the export pool, outside of the request),
+    # a secondary may lag behind the primary: the clock is moved back by that much.
+    export_db = get_read_db()
+    export_id = ObjectId()
+    created_at = changes.now() - datetime.timedelta(seconds=max_read_lag())
+    header = {
+        "version": EXPORT_VERSION,
+        "export_id": str(export_id),
+        "kind": "delta" if baseline else "full",
+        "export_date": created_at.isoformat(),
+    }
+    if baseline:
+        header["base_export_id"] = baseline["export_id"]
+        header["since"] = baseline["since"].isoformat()
+    if baseline and baseline["container_ids"]:
+        deleted = export_db.deletions.find(
+            {"kind": "container", "source_id": {"$in": baseline["container_ids"]}, "deleted_at": {"$gte": baseline["since"]}},
+            {"source_id": 1}
+        )
+        header["deleted_containers"] = [str(tombstone["source_id"]) for tombstone in deleted]
     
-    # Return as downloadable file
-    buffer = BytesIO()
-    buffer.write(json_data.encode('utf-8'))
-    buffer.seek(0)
+    db.exports.insert_one({
+        "_id": export_id,
+        "user_id": user_id,
+        "kind": header["kind"],
+        "container_ids": [container["_id"] for container in containers],
+        "created_at": created_at,
+        "base_export_id": ObjectId(baseline["export_id"]) if baseline and baseline["export_id"] else None
+    })
     
+    chunks = _iter_export(header, containers, baseline, include_images, export_db)
     filename = f"libstock_export_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    headers = {}
+    mimetype = 'application/json'
+    if compression:
+        # Compressed file, kept compressed by the client
+        chunks = compression_utils.compress_stream(chunks, compression)
+        filename += compression_utils.EXTENSIONS[compression]
+        mimetype = compression_utils.MIMETYPES[compression]
+    else:
+        # Plain JSON file, compressed on the wire when the client accepts it
+        encoding = compression_utils.negotiate(request.accept_encodings)
+        if encoding:
+            chunks = compression_utils.compress_stream(chunks, encoding)
+            headers["Content-Encoding"] = encoding
+    headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    response = Response(stream_with_context(chunks), mimetype=mimetype, headers=headers)
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def _dumps(value):
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def _load_container(container, baseline, database):
+    """Read the categories, deletions and item documents of one exported container"""
+    container_id = container["_id"]
+    
+    # Containers missing from the baseline export are exported in full
+    full = not baseline or (baseline["container_ids"] is not None and container_id not in baseline["container_ids"])
+    since = None if full else baseline["since"]
+    
+    # Source ids are the temp ids, so a delta can be merged on top of its baseline
+    container_export = {
+        "temp_id": str(container_id),
+        "name": container["name"],
+        "categories": []
+    }
+    if baseline:
+        container_export["full"] = full
+    
+    # Export categories
+    if since is None:
+        categories = category_cache.get_categories(container)
+    else:
+        categories = {
+            category["_id"]: category["name"]
+            for category in database.categories.find({"container_id": container_id, "updated_at": {"$gte": since}}, {"name": 1})
+        }
+    for category_id, category_name in categories.items():
+        container_export["categories"].append({
+            "temp_id": str(category_id),
+            "name": category_name
+        })
+    
+    if since is not None:
+        container_export["deleted_categories"] = []
+        container_export["deleted_items"] = []
+        tombstones = database.deletions.find(
+            {"container_id": container_id, "deleted_at": {"$gte": since}, "kind": {"$in": ["category", "item"]}},
+            {"kind": 1, "source_id": 1}
+        )
+        for tombstone in tombstones:
+            container_export[DELETED_KEYS[tombstone["kind"]]].append(str(tombstone["source_id"]))
     
-    return send_file(
-        buffer,
-        as_attachment=True,
-        download_name=filename,
-        mimetype='application/json'
-    )
+    # Item documents only, images are read while streaming
+    item_filter = {"container_id": container_id}
+    if since is not None:
+        item_filter["updated_at"] = {"$gte": since}
+    items = list(database.items.find(item_filter, INTERNAL_ITEM_PROJECTION))
+    return container_export, items
+
+
+def _iter_export(header, containers, baseline, include_images, database):
+    """Yield the export file in UTF-8 pieces
+
+    The next container is read while the current one streams, and images are
+    read and encoded ahead in the export pool (bounded window, output order kept).
+    """
+    yield _dumps(header)[:-1].encode('utf-8') + b',"containers":['
+    loaded = pipeline.ordered_map(lambda container: _load_container(container, baseline, database), containers, window=2)
+    for position, (container_export, items) in enumerate(loaded):
+        yield (b',' if position else b'') + _dumps(container_export)[:-1].encode('utf-8') + b',"items":['
+        exported = pipeline.ordered_map(lambda item: _export_item(item, include_images), items)
+        for index, item_json in enumerate(exported):
+            yield (b',' if index else b'') + item_json
+        yield b']}'
+    yield b']}'
 
 
 @api_bp.route("/import/containers", methods=["POST"])
@@ -167,14 +271,73 @@ def import_containers():
         in: formData
         type: file
         required: true
-        description: JSON export file
+        description: JSON export file (full export), optionally gzip or zstd compressed
+      - name: deltas
+        in: formData
+        type: file
+        required: false
+        description: Differential exports to apply on top of `file`, oldest first (repeat the field)
       - name: conflict_strategy
         in: formData
         type: string
         enum: [skip, rename, replace]
         default: rename
         description: How to handle container name conflicts
+      - name: detect_duplicates
+        in: formData
+        type: boolean
+        default: false
+        description: Report imported items that look like items already in the container with the same name, or like other imported items
+      - name: dry_run
+        in: formData
+        type: boolean
+        default: false
+        description: Only return the import plan, nothing is written
     responses:
+      200:
+        description: Import plan (dry run)
+        schema:
+          type: object
+          properties:
+            conflict_strategy:
+              type: string
+            containers:
+              type: array
+              items:
+                type: object
+                properties:
+                  source_name:
+                    type: string
+                  name:
+                    type: string
+                    description: Name after conflict resolution
+                  action:
+                    type: string
+                    enum: [create, rename, replace, skip]
+                  replaces:
+                    type: string
+                    description: ID of the container deleted by a replace
+                  categories:
+                    type: integer
+                  items:
+                    type: integer
+                  skipped_categories:
+                    type: array
+                    items:
+                      type: object
+                  skipped_items:
+                    type: array
+                    items:
+                      type: object
+                      properties:
+                        index:
+                          type: integer
+                        name:
+                          type: string
+                        reason:
+                          type: string
+            summary:
+              type: object
       201:
         description: Import successful
         schema:
@@ -186,8 +349,28 @@ def import_containers():
               type: array
               items:
                 type: object
+                properties:
+                  possible_duplicates:
+                    type: array
+                    description: Only with detect_duplicates
+                    items:
+                      type: object
+                  invalid_images:
+                    type: array
+                    description: Items imported without their image (not a valid image)
+                    items:
+                      type: object
+                      properties:
+                        index:
+                          type: integer
+                        name:
+                          type: string
+                        error:
+                          type: string
       400:
         description: Invalid file or data
+      503:
+        description: Image processing unavailable, nothing more is imported (retry)
     """
     if 'file' not in request.files:
         return jsonify({"error": "No file provided"}), 400
@@ -197,120 +380,32 @@ def import_containers():
         return jsonify({"error": "No file selected"}), 400
     
     conflict_strategy = request.form.get('conflict_strategy', 'rename')
+    detect_duplicates = request.form.get('detect_duplicates', 'false').lower() in ('1', 'true', 'yes')
+    dry_run = request.form.get('dry_run', 'false').lower() in ('1', 'true', 'yes')
     
     try:
         # Parse JSON
-        import_data = json.load(file)
+        import_data = json.load(compression_utils.decompressing_reader(file.stream))
         
         # Validate version
         if import_data.get("version") != EXPORT_VERSION:
             return jsonify({"error": f"Unsupported export version. Expected {EXPORT_VERSION}"}), 400
         
         user_id = ObjectId(current_user.id)
-        imported_containers = []
+        try:
+            deltas = [
+                json.load(compression_utils.decompressing_reader(delta_file.stream))
+                for delta_file in request.files.getlist('deltas')
+            ]
+            if deltas or import_data.get("kind") == "delta":
+                import_data = apply_chain(import_data, deltas)
+            plan = plan_import(import_data, user_id, conflict_strategy)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if dry_run:
+            return jsonify(plan), 200
         
-        # Process each container
-        for container_data in import_data.get("containers", []):
-            container_name = container_data["name"]
-            
-            # Handle name conflicts
-            if conflict_strategy == "skip":
-                existing = db.containers.find_one({"name": container_name, "admin_id": user_id})
-                if existing:
-                    continue
-            elif conflict_strategy == "rename":
-                counter = 1
-                original_name = container_name
-                while db.containers.find_one({"name": container_name, "admin_id": user_id}):
-                    container_name = f"{original_name} ({counter})"
-                    counter += 1
-            elif conflict_strategy == "replace":
-                existing = db.containers.find_one({"name": container_name, "admin_id": user_id})
-                if existing:
-                    # Delete existing container and all its data
-                    db.items.delete_many({"container_id": existing["_id"]})
-                    db.categories.delete_many({"container_id": existing["_id"]})
-                    db.containers.delete_one({"_id": existing["_id"]})
-            
-            # Create new container
-            new_container = {
-                "name": container_name,
-                "admin_id": user_id,
-                "member_ids": [user_id]
-            }
-            container_result = db.containers.insert_one(new_container)
-            new_container_id = container_result.inserted_id
-            
-            # Map temp_id to real ObjectId for categories
-            category_id_map = {}
-            
-            # Import categories
-            for category_data in container_data.get("categories", []):
-                new_category = {
-                    "name": category_data["name"],
-                    "container_id": new_container_id
-                }
-                category_result = db.categories.insert_one(new_category)
-                category_id_map[category_data["temp_id"]] = category_result.inserted_id
-            
-            # Import items
-            for item_data in container_data.get("items", []):
-                category_id = category_id_map.get(item_data.get("category_temp_id"))
-                if not category_id:
-                    continue  # Skip items with invalid category
-                
-                # Handle image import
-                image_path = None
-                if item_data.get("image_data"):
-                    try:
-                        import secrets
-                        # Decode base64 image
-                        image_bytes = base64.b64decode(item_data["image_data"])
-                        
-                        # Generate new filename
-                        extension = item_data.get("image_extension", ".png")
-                        new_filename = secrets.token_hex(16) + extension
-                        image_path = Path(UPLOAD_FOLDER) / new_filename
-                        
-                        # Save image
-                        with open(image_path, "wb") as img_file:
-                            img_file.write(image_bytes)
-                        
-                        image_path = new_filename
-                    except Exception as e:
-                        print(f"Failed to import image: {e}")
-                        image_path = item_data.get("image_path", "not-image.png")
-                else:
-                    image_path = item_data.get("image_path", "not-image.png")
-                
-                # Create new item
-                new_item = {
-                    "container_id": new_container_id,
-                    "category_id": category_id,
-                    "name": item_data.get("name"),
-                    "owner": item_data.get("owner"),
-                    "serie": item_data.get("serie", ""),
-                    "description": item_data.get("description", ""),
-                    "value": item_data.get("value", 0.0),
-                    "date_created": item_data.get("date_created", ""),
-                    "date_added": datetime.datetime.now(datetime.timezone.utc),
-                    "location": item_data.get("location", ""),
-                    "creator": current_user.username,
-                    "tags": item_data.get("tags", []),
-                    "image_path": image_path,
-                    "comment": item_data.get("comment", ""),
-                    "condition": item_data.get("condition", ""),
-                    "number": item_data.get("number", 1),
-                    "edition": item_data.get("edition", "")
-                }
-                db.items.insert_one(new_item)
-            
-            imported_containers.append({
-                "name": container_name,
-                "id": str(new_container_id),
-                "categories_count": len(container_data.get("categories", [])),
-                "items_count": len(container_data.get("items", []))
-            })
+        imported_containers = apply_import(import_data, plan, user_id, current_user.username, detect_duplicates)
         
         return jsonify({
             "message": "Import successful",
@@ -319,6 +414,9 @@ def import_containers():
         
     except json.JSONDecodeError:
         return jsonify({"error": "Invalid JSON file"}), 400
+    except images.ImageProcessingUnavailable as e:
+        print(f"Import error: {e}")
+        return jsonify({"error": "Image processing is unavailable, please retry"}), 503, {"Retry-After": "5"}
     except Exception as e:
         print(f"Import error: {e}")
         return jsonify({"error": f"Import failed: {str(e)}"}), 500
@@ -378,20 +476,12 @@ def preview_export():
         if not container:
             continue
         
-        categories_count = db.categories.count_documents({"container_id": container_id})
-        items_count = db.items.count_documents({"container_id": container_id})
+        categories_count = read_db.categories.count_documents({"container_id": container_id})
+        items_count = read_db.items.count_documents({"container_id": container_id})
         
         # Estimate size
-        items = list(db.items.find({"container_id": container_id}, {"image_path": 1}))
-        total_size = 0
-        for item in items:
-            if item.get("image_path"):
-                try:
-                    image_path = Path(UPLOAD_FOLDER) / item["image_path"]
-                    if image_path.exists():
-                        total_size += image_path.stat().st_size
-                except:
-                    pass
+        names = [item["image_path"] for item in read_db.items.find({"container_id": container_id}, {"image_path": 1}) if item.get("image_path")]
+        total_size = sum(storage.media.sizes(names).values())
         
         preview_data.append({
             "id": str(container_id),
@@ -0,0 +1,349 @@
+import datetime
+import math
+import re
+from flask import request, jsonify, current_app
+from flask_login import login_required, current_user
+from bson import ObjectId
+from app.api import api_bp
+from app.db import db
+from app.extensions import limiter
+from app.api.utils.helpers import safe_int, safe_object_id
+from app.api.utils import staging
+from app.api.utils.importer import CONFLICT_STRATEGIES
+
+SHA256_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+def _get_upload(upload_id):
+    """Upload document of the current user, or None"""
+    upload_id = safe_object_id(upload_id)
+    if upload_id is None:
+        return None
+    upload = db.import_uploads.find_one({"_id": upload_id, "user_id": ObjectId(current_user.id)})
+    return staging.fail_stale(upload) if upload else None
+
+
+def _upload_status(upload):
+    missing = staging.missing_chunks(upload)
+    status = {
+        "upload_id": str(upload["_id"]),
+        "filename": upload.get("filename"),
+        "size": upload["size"],
+        "chunk_size": upload["chunk_size"],
+        "total_chunks": upload["total_chunks"],
+        "received_chunks": upload["total_chunks"] - len(missing),
+        "missing_chunks": missing,
+        "status": upload["status"],
+        "expires_at": upload["expires_at"].isoformat(),
+    }
+    if "result" in upload:
+        status["result"] = upload["result"]
+    if "error" in upload:
+        status["error"] = upload["error"]
+    return status
+
+
+@api_bp.route("/import/uploads", methods=["POST"])
+@login_required
+def init_import_upload():
+    """
+    Start a resumable chunked import upload
+    ---
+    tags:
+      - Export/Import
+    security:
+      - Session: []
+    description: |
+      Large exports (with images) go over the request size limit of
+      `/import/containers`. Declare the file here, send every chunk with
+      `PUT /import/uploads/{upload_id}/chunks/{index}` (in any order, a failed
+      chunk is simply sent again), then call `finalize`. `GET /import/uploads/{upload_id}`
+      lists the missing chunks to resume an interrupted upload.
+    parameters:
+      - in: body
+        name: body
+        required: true
+        schema:
+          type: object
+          required:
+            - size
+            - sha256
+          properties:
+            filename:
+              type: string
+            size:
+              type: integer
+              description: File size in bytes
+            sha256:
+              type: string
+              description: Hex sha256 of the whole file, verified on finalize
+            chunk_size:
+              type: integer
+              description: Bytes per chunk (server default and maximum when omitted or too large)
+    responses:
+      201:
+        description: Upload created
+        schema:
+          type: object
+          properties:
+            upload_id:
+              type: string
+            chunk_size:
+              type: integer
+            total_chunks:
+              type: integer
+            expires_at:
+              type: string
+      400:
+        description: Invalid size or checksum
+      413:
+        description: File larger than the import limit
+    """
+    data = request.get_json(silent=True) or {}
+    size = safe_int(data.get("size"))
+    sha256 = str(data.get("sha256", "")).lower()
+    if size <= 0:
+        return jsonify({"error": "Invalid size"}), 400
+    if size > staging.MAX_IMPORT_SIZE:
+        return jsonify({"error": f"File too large (max {staging.MAX_IMPORT_SIZE} bytes)"}), 413
+    if not SHA256_PATTERN.match(sha256):
+        return jsonify({"error": "Invalid sha256, expected 64 hex characters"}), 400
+
+    # A chunk must fit in one request
+    max_chunk = min(staging.CHUNK_SIZE, current_app.config.get("MAX_CONTENT_LENGTH") or staging.CHUNK_SIZE)
+    chunk_size = safe_int(data.get("chunk_size"), max_chunk)
+    chunk_size = max(1, min(chunk_size, max_chunk))
+
+    staging.purge_expired()
+    upload = {
+        "user_id": ObjectId(current_user.id),
+        "filename": str(data.get("filename", ""))[:256],
+        "size": size,
+        "sha256": sha256,
+        "chunk_size": chunk_size,
+        "total_chunks": math.ceil(size / chunk_size),
+        "status": "uploading",
+        "created_at": datetime.datetime.now(datetime.timezone.utc),
+        "expires_at": staging.expires_at(),
+    }
+    result = db.import_uploads.insert_one(upload)
+    return jsonify({
+        "upload_id": str(result.inserted_id),
+        "chunk_size": chunk_size,
+        "total_chunks": upload["total_chunks"],
+        "expires_at": upload["expires_at"].isoformat(),
+    }), 201
+
+
+@api_bp.route("/import/uploads/<upload_id>/chunks/<int:index>", methods=["PUT"])
+@limiter.exempt  # One request per chunk: bounded by the declared size, not by the hourly default
+@login_required
+def put_import_chunk(upload_id, index):
+    """
+    Send one chunk of an import upload
+    ---
+    tags:
+      - Export/Import
+    security:
+      - Session: []
+    consumes:
+      - application/octet-stream
+    parameters:
+      - name: upload_id
+        in: path
+        type: string
+        required: true
+      - name: index
+        in: path
+        type: integer
+        required: true
+        description: Zero-based chunk index
+      - name: X-Chunk-Sha256
+        in: header
+        type: string
+        required: false
+        description: Hex sha256 of the chunk, rejected on mismatch
+      - in: body
+        name: body
+        required: true
+        schema:
+          type: string
+          format: binary
+    responses:
+      200:
+        description: Chunk stored (sending it again replaces it)
+        schema:
+          type: object
+          properties:
+            received_chunks:
+              type: integer
+            missing_chunks:
+              type: integer
+      400:
+        description: Invalid index, size or checksum
+      404:
+        description: Upload not found
+      409:
+        description: Upload already finalized
+    """
+    upload = _get_upload(upload_id)
+    if not upload:
+        return jsonify({"error": "Upload not found"}), 404
+    if upload["status"] not in ("uploading", "failed"):
+        return jsonify({"error": f"Upload is {upload['status']}"}), 409
+    if not 0 <= index < upload["total_chunks"]:
+        return jsonify({"error": f"Invalid chunk index (0 to {upload['total_chunks'] - 1})"}), 400
+
+    try:
+        staging.write_chunk(upload, index, request.stream, request.headers.get("X-Chunk-Sha256"))
+    except staging.ChecksumMismatch as e:
+        return jsonify({"error": str(e)}), 400
+
+    db.import_uploads.update_one(
+        {"_id": upload["_id"]},
+        {"$set": {"status": "uploading", "expires_at": staging.expires_at()}}
+    )
+    missing = len(staging.missing_chunks(upload))
+    return jsonify({"received_chunks": upload["total_chunks"] - missing, "missing_chunks": missing}), 200
+
+
+@api_bp.route("/import/uploads/<upload_id>", methods=["GET"])
+@limiter.exempt  # Polled while the import runs
+@login_required
+def get_import_upload(upload_id):
+    """
+    Status of an import upload (missing chunks, import progress and result)
+    ---
+    tags:
+      - Export/Import
+    security:
+      - Session: []
+    parameters:
+      - name: upload_id
+        in: path
+        type: string
+        required: true
+    responses:
+      200:
+        description: Upload status
+        schema:
+          type: object
+          properties:
+            status:
+              type: string
+              enum: [uploading, importing, planned, done, failed]
+            missing_chunks:
+              type: array
+              items:
+                type: integer
+            result:
+              type: object
+              description: Import plan (dry run) or imported containers
+            error:
+              type: string
+      404:
+        description: Upload not found
+    """
+    upload = _get_upload(upload_id)
+    if not upload:
+        return jsonify({"error": "Upload not found"}), 404
+    return jsonify(_upload_status(upload)), 200
+
+
+@api_bp.route("/import/uploads/<upload_id>/finalize", methods=["POST"])
+@login_required
+def finalize_import_upload(upload_id):
+    """
+    Verify the uploaded file and import it in the background
+    ---
+    tags:
+      - Export/Import
+    security:
+      - Session: []
+    parameters:
+      - name: upload_id
+        in: path
+        type: string
+        required: true
+      - in: body
+        name: body
+        required: false
+        schema:
+          type: object
+          properties:
+            conflict_strategy:
+              type: string
+              enum: [skip, rename, replace]
+              default: rename
+            detect_duplicates:
+              type: boolean
+              default: false
+            dry_run:
+              type: boolean
+              default: false
+              description: Only compute the plan, the upload can be finalized again afterwards
+    responses:
+      202:
+        description: |
+          Import started, poll `GET /import/uploads/{upload_id}`. A file not
+          matching the declared size and sha256 ends `failed` with the error.
+      400:
+        description: Invalid option
+      404:
+        description: Upload not found
+      409:
+        description: Missing chunks, or import already running or done
+    """
+    upload = _get_upload(upload_id)
+    if not upload:
+        return jsonify({"error": "Upload not found"}), 404
+
+    data = request.get_json(silent=True) or {}
+    options = {
+        "conflict_strategy": data.get("conflict_strategy", "rename"),
+        "detect_duplicates": bool(data.get("detect_duplicates", False)),
+        "dry_run": bool(data.get("dry_run", False)),
+    }
+    if options["conflict_strategy"] not in CONFLICT_STRATEGIES:
+        return jsonify({"error": f"Invalid conflict strategy, expected one of: {', '.join(CONFLICT_STRATEGIES)}"}), 400
+
+    missing = staging.missing_chunks(upload)
+    if missing:
+        return jsonify({"error": "Missing chunks", "missing_chunks": missing}), 409
+
+    if not staging.start_import(upload, current_user.username, options):
+        return jsonify({"error": "Upload already finalized"}), 409
+
+    return jsonify(_upload_status(_get_upload(upload_id))), 202
+
+
+@api_bp.route("/import/uploads/<upload_id>", methods=["DELETE"])
+@login_required
+def delete_import_upload(upload_id):
+    """
+    Abort an import upload and delete its staged data
+    ---
+    tags:
+      - Export/Import
+    security:
+      - Session: []
+    parameters:
+      - name: upload_id
+        in: path
+        type: string
+        required: true
+    responses:
+      200:
+        description: Upload deleted
+      404:
+        description: Upload not found
+      409:
+        description: Import running
+    """
+    upload = _get_upload(upload_id)
+    if not upload:
+        return jsonify({"error": "Upload not found"}), 404
+    if upload["status"] == "importing":
+        return jsonify({"error": "Import running"}), 409
+    staging.remove(upload["_id"])
+    return jsonify({"message": "Upload deleted"}), 200
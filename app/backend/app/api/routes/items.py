@@ -1,17 +1,21 @@
 import datetime
-import base64
 from flask import request, jsonify
 from flask_login import login_required, current_user
 from bson import ObjectId
-from pathlib import Path
 from app.api import api_bp
-from app.db import db
-from app.utils import MAX_SIZE_NAME, UPLOAD_FOLDER
+from app.db import db, read_db
+from app import storage
 from app.api.utils.helpers import safe_object_id, safe_float, safe_int, get_container_access
 from app.api.utils.validators import validate_item_data
+from app.api.utils import category_cache, changes, images
+from app.api.utils.search import search_fields, INTERNAL_ITEM_PROJECTION
+from app.api.utils.dedup import dedup_fields, DEDUP_FIELDS
+from app.api.utils.phash import image_hash_fields
+from app.query_budget import query_budget
 
 
 @api_bp.route("/container/<container_id>/items", methods=["GET"])
+@query_budget(4)
 @login_required
 def list_items_for_container(container_id):
     """
@@ -54,10 +58,8 @@ def list_items_for_container(container_id):
                   type: string
       401:
         description: Not authenticated
-      403:
-        description: Access denied
       404:
-        description: Container not found
+        description: Container not found or access denied
       500:
         description: Internal server error
     """
@@ -66,13 +68,11 @@ def list_items_for_container(container_id):
         if not container:
             return jsonify({"error": "Container not found"}), 404
         
-        # Check if user has access (is member or admin)
-        user_id = ObjectId(current_user.id)
-        if user_id not in container["member_ids"]:
-            return jsonify({"error": "Access denied"}), 403
-        
         # Fetch items linked to this container
-        items = list(db.items.find({"container_id": container_id}))
+        items = list(read_db.items.find({"container_id": container_id}, INTERNAL_ITEM_PROJECTION))
+        
+        # Resolve category names from the per-container cache
+        category_names = category_cache.get_categories(container)
         
         # Convert ObjectIds & dates for JSON
         for item in items:
@@ -82,9 +82,8 @@ def list_items_for_container(container_id):
                 item["date_added"] = item["date_added"].isoformat()
             
             # Get category name
-            category = db.categories.find_one({"_id": item["category_id"]})
+            item["category"] = category_names.get(item["category_id"], "")
             item["category_id"] = ""
-            item["category"] = category["name"]
         
         return jsonify(items), 200
     except Exception as e:
@@ -146,8 +145,12 @@ def add_item(container_id):
               items:
                 type: string
               maxItems: 50
-            image_path:
+            image_token:
+              type: string
+              description: Token returned by `/upload/image/preview`
+            image_data:
               type: string
+              description: Base64 image (legacy, prefer image_token)
             category:
               type: string
               description: Category ID
@@ -176,6 +179,10 @@ def add_item(container_id):
         description: Unauthorized access
       404:
         description: Category not found
+      500:
+        description: Image could not be saved
+      503:
+        description: Image processing unavailable (pool failure or timeout), retry later
     """
     container, container_id = get_container_access(container_id, current_user.id)
     if not container:
@@ -210,21 +217,12 @@ def add_item(container_id):
         if not all(field in data for field in required_fields):
             return jsonify({"error": "Missing fields"}), 400
         
-        # Validate name
-        item_name = data.get('name', '').strip()
-        if not item_name or len(item_name) > MAX_SIZE_NAME:
-            return jsonify({"error": f"Invalid item name length ({MAX_SIZE_NAME} characters maximum)"}), 400
-        
         # Validate category
         category_id = safe_object_id(data.get('category'))
         if category_id is None:
             return jsonify({"error": "Invalid category ID"}), 400
         
-        category = db.categories.find_one({
-            "_id": category_id,
-            "container_id": container_id
-        })
-        if not category:
+        if category_id not in category_cache.get_categories(container):
             return jsonify({"error": "Category not found in this container"}), 404
         
         # Validate all item data
@@ -232,21 +230,18 @@ def add_item(container_id):
         if error:
             return jsonify({"error": error}), 400
         
-        image_path = "not-image.png"
-        if data.get("image_data"):
+        image_path, image_hash = "not-image.png", None
+        if data.get("image_token") or data.get("image_data"):
             try:
-                import secrets
-                image_bytes = base64.b64decode(data["image_data"])
-                extension = data.get("image_extension", ".png")
-                new_filename = secrets.token_hex(16) + extension
-                file_path = Path(UPLOAD_FOLDER) / new_filename
-                
-                with open(file_path, "wb") as img_file:
-                    img_file.write(image_bytes)
-                
-                image_path = new_filename
+                image_path, image_hash = images.store_from_payload(data, ObjectId(current_user.id))
+            except (images.InvalidImage, images.UnknownImageToken) as e:
+                return jsonify({"error": str(e)}), 400
+            except images.ImageProcessingUnavailable as e:
+                print(f"Failed to save image: {e}")
+                return jsonify({"error": "Image processing is unavailable, please retry"}), 503, {"Retry-After": "5"}
             except Exception as e:
                 print(f"Failed to save image: {e}")
+                return jsonify({"error": "Failed to save image"}), 500
 
         item = {
             "container_id": container_id,
@@ -268,6 +263,10 @@ def add_item(container_id):
             "edition": data.get("edition", ""),
         }
 
+        item["updated_at"] = item["date_added"]
+        item.update(search_fields(item))
+        item.update(dedup_fields(item))
+        item.update(image_hash_fields(image_hash))
         result = db.items.insert_one(item)
         return jsonify({"message": "Item added", "id": str(result.inserted_id)}), 201
 
@@ -303,9 +302,6 @@ def delete_item(container_id, item_id):
       404:
         description: Item not found
     """
-    from pathlib import Path
-    from app.utils import UPLOAD_FOLDER
-    
     container, container_id = get_container_access(container_id, current_user.id)
     if not container:
         return jsonify({"error": "Unauthorized access to this container!"}), 403
@@ -320,13 +316,13 @@ def delete_item(container_id, item_id):
     })
     if not item:
         return jsonify({"error": "Item not found"}), 404
+    changes.record_deletion("item", item_id, container["_id"])
     
     # Try to delete image if any
     if item.get('image_path'):
         try:
-            image_path = Path(UPLOAD_FOLDER) / item['image_path']
-            if image_path.exists() and image_path.is_file():
-                image_path.unlink()
+            storage.media.delete(item['image_path'])
+            images.delete_thumbnails(item['image_path'])
         except Exception as e:
             print(f"Failed to delete image: {e}")
     
@@ -391,7 +387,7 @@ def get_item_by_id(container_id, item_id):
         return jsonify({"error": "Invalid item ID"}), 400
 
     try:
-        item = db.items.find_one({"container_id": container_id, "_id": item_id})
+        item = db.items.find_one({"container_id": container_id, "_id": item_id}, INTERNAL_ITEM_PROJECTION)
         if not item:
             return jsonify({"error": "Item not found"}), 404
 
@@ -452,6 +448,9 @@ def update_item(container_id, item_id):
               items:
                 type: string
               maxItems: 50
+            image_token:
+              type: string
+              description: Token returned by `/upload/image/preview`, replaces the image
             # ... other fields
     responses:
       200:
@@ -464,6 +463,10 @@ def update_item(container_id, item_id):
         description: Unauthorized access
       404:
         description: Item or category not found
+      500:
+        description: Image could not be saved
+      503:
+        description: Image processing unavailable (pool failure or timeout), retry later
     """
     container, container_id = get_container_access(container_id, current_user.id)
     if not container:
@@ -486,11 +489,7 @@ def update_item(container_id, item_id):
     if category_id is None:
         return jsonify({"error": "Invalid category ID"}), 400
     
-    category = db.categories.find_one({
-        "_id": category_id,
-        "container_id": container_id
-    })
-    if not category:
+    if category_id not in category_cache.get_categories(container):
         return jsonify({"error": "Category not found in this container"}), 404
     
     # Validate item data
@@ -498,29 +497,27 @@ def update_item(container_id, item_id):
     if error:
         return jsonify({"error": error}), 400
     
-    image_path = "not-image.png"
-    if data.get("image_data"):
+    image_path, image_hash = "not-image.png", None
+    if data.get("image_token") or data.get("image_data"):
         try:
-            import secrets
-            image_bytes = base64.b64decode(data["image_data"])
-            extension = data.get("image_extension", ".png")
-            new_filename = secrets.token_hex(16) + extension
-            file_path = Path(UPLOAD_FOLDER) / new_filename
-            
-            with open(file_path, "wb") as img_file:
-                img_file.write(image_bytes)
+            new_filename, image_hash = images.store_from_payload(data, ObjectId(current_user.id))
             
             if item.get("image_path") and item["image_path"] != "not-image.png":
                 try:
-                    old_image = Path(UPLOAD_FOLDER) / item["image_path"]
-                    if old_image.exists():
-                        old_image.unlink()
+                    storage.media.delete(item["image_path"])
+                    images.delete_thumbnails(item["image_path"])
                 except Exception as e:
                     print(f"Failed to delete old image: {e}")
             
             image_path = new_filename
+        except (images.InvalidImage, images.UnknownImageToken) as e:
+            return jsonify({"error": str(e)}), 400
+        except images.ImageProcessingUnavailable as e:
+            print(f"Failed to save new image: {e}")
+            return jsonify({"error": "Image processing is unavailable, please retry"}), 503, {"Retry-After": "5"}
         except Exception as e:
             print(f"Failed to save new image: {e}")
+            return jsonify({"error": "Failed to save image"}), 500
     
     update_fields = {
         "name": data.get("name"),
@@ -544,6 +541,14 @@ def update_item(container_id, item_id):
 
     # Remove keys with None values
     update_fields = {k: v for k, v in update_fields.items() if v is not None}
+    if image_path:
+        # After the None filter: an image that could not be hashed clears the previous hash
+        update_fields.update(image_hash_fields(image_hash))
+    update_fields.update(search_fields(update_fields))
+    if any(field in update_fields for field in DEDUP_FIELDS):
+        # The signature covers name, serie and edition: merge with the stored values
+        update_fields.update(dedup_fields({**item, **update_fields}))
+    update_fields["updated_at"] = changes.now()
 
     result = db.items.update_one(
         {"container_id": container_id, "_id": item_id},
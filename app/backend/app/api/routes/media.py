@@ -1,16 +1,22 @@
-import secrets
 import base64
-from pathlib import Path
-from flask import request, jsonify, send_from_directory
-from flask_login import login_required
+import secrets
+from flask import request, jsonify, url_for, Response
+from flask_login import login_required, current_user
+from bson import ObjectId
 from werkzeug.utils import secure_filename
 from app.api import api_bp
-from app.utils import UPLOAD_FOLDER
+from app import storage
+from app.db import read_db
 from app.extensions import limiter
+from app.api.utils import images
+from app.api.utils.helpers import safe_int, get_container_access
 
 
+# Thumbnails per batch request
+MAX_THUMBNAILS = 100
+
 # File upload config
-ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "gif"}
+ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "gif", "webp"}
 def allowed_rename_file(filename):
     """Generate a new secure filename with random name"""
     if '.' in filename:
@@ -58,23 +64,26 @@ def media(filename):
         safe_name = secure_filename(filename)
         if safe_name != filename:
             return jsonify({"error": "Invalid filename"}), 400
-        return send_from_directory(str(Path(UPLOAD_FOLDER)), safe_name)
+        return storage.media.send(safe_name)
     except Exception as e:
         print(f"Error serving file: {e}")
         return jsonify({"error": "File not found"}), 404
 
 
 @api_bp.route('/upload/image/preview', methods=['POST'])
-@limiter.limit("50 per hour")  # Plus permissif car pas de sauvegarde
+@limiter.limit("50 per hour")
 @login_required
 def preview_image():
     """
-    Convert image to base64 for preview (no server storage)
+    Stage an image for an item (validated, downscaled and re-encoded once)
     ---
     tags:
       - Media
     security:
       - Session: []
+    description: |
+      Pass the returned `image_token` as `image_token` to item add/update instead
+      of sending the image again in base64. Unused tokens expire.
     consumes:
       - multipart/form-data
     parameters:
@@ -82,21 +91,32 @@ def preview_image():
         in: formData
         type: file
         required: true
-        description: Image file to preview
+        description: Image file to stage
     responses:
-      200:
-        description: Image converted to base64
+      201:
+        description: Image staged
         schema:
           type: object
           properties:
-            image_data:
+            image_token:
               type: string
-              description: Base64 encoded image
+            thumbnail_url:
+              type: string
+              example: "/api/upload/image/staged/0f3c.../thumbnail"
             image_extension:
               type: string
-              example: ".png"
+              example: ".webp"
+            size:
+              type: integer
+              description: Stored size in bytes
+            expires_at:
+              type: string
       400:
-        description: Invalid file
+        description: Invalid file or not an image
+      500:
+        description: Image could not be processed
+      503:
+        description: Image processing unavailable (pool failure or timeout), retry later
     """
     file = request.files.get('image')
     if not file:
@@ -107,19 +127,195 @@ def preview_image():
         return jsonify({"error": "Invalid file"}), 400
     
     extension = file.filename.rsplit('.', 1)[1].lower()
-    allowed_extensions = {"png", "jpg", "jpeg", "gif"}
+    allowed_extensions = {"png", "jpg", "jpeg", "gif", "webp"}
     if extension not in allowed_extensions:
         return jsonify({"error": "Invalid file type"}), 400
     
-    # Convert to base64
+    images.purge_staged()
+    # Validate the real type and re-encode, the staged image is what will be stored
+    try:
+        staged = images.stage(file.read(), ObjectId(current_user.id))
+    except images.InvalidImage as e:
+        return jsonify({"error": str(e)}), 400
+    except images.ImageProcessingUnavailable as e:
+        print(f"Error staging image: {e}")
+        return jsonify({"error": "Image processing is unavailable, please retry"}), 503, {"Retry-After": "5"}
+    except Exception as e:
+        print(f"Error staging image: {e}")
+        return jsonify({"error": "Failed to process image"}), 500
+
+    return jsonify({
+        "image_token": staged["_id"],
+        "thumbnail_url": url_for("api.staged_image_thumbnail", token=staged["_id"]),
+        "image_extension": staged["extension"],
+        "size": staged["size"],
+        "expires_at": staged["expires_at"].isoformat(),
+    }), 201
+
+
+@api_bp.route('/upload/image/staged/<token>/thumbnail')
+@limiter.exempt  # Displayed right after the upload, which is already limited
+@login_required
+def staged_image_thumbnail(token):
+    """
+    Thumbnail of a staged image
+    ---
+    tags:
+      - Media
+    security:
+      - Session: []
+    parameters:
+      - name: token
+        in: path
+        type: string
+        required: true
+    responses:
+      200:
+        description: Thumbnail content
+      404:
+        description: Unknown or expired token
+    """
+    staged = images.get_staged(token, ObjectId(current_user.id))
+    if not staged:
+        return jsonify({"error": "Unknown or expired image token"}), 404
+    try:
+        return storage.staged.send(images.thumbnail_name(staged["_id"]))
+    except FileNotFoundError:
+        return jsonify({"error": "Unknown or expired image token"}), 404
+
+
+@api_bp.route('/container/<container_id>/media/thumbnails', methods=['POST'])
+@login_required
+def container_thumbnails(container_id):
+    """
+    Thumbnails of several images of a container in one response
+    ---
+    tags:
+      - Media
+    security:
+      - Session: []
+    description: |
+      For gallery views: one request instead of one `/media/{filename}` per item.
+      Only images of items of the container are returned, other names are
+      listed in `missing`. `sprite` returns one sheet with the position of each
+      thumbnail, `multipart` returns a `multipart/mixed` body with one
+      `image/webp` part per thumbnail (filename in `Content-Disposition`).
+    parameters:
+      - name: container_id
+        in: path
+        type: string
+        required: true
+      - in: body
+        name: body
+        required: true
+        schema:
+          type: object
+          required:
+            - names
+          properties:
+            names:
+              type: array
+              items:
+                type: string
+              maxItems: 100
+              description: Image names (`image_path` of the items)
+            size:
+              type: integer
+              enum: [64, 128, 256]
+              default: 128
+              description: Longest side of the thumbnails
+            format:
+              type: string
+              enum: [sprite, multipart]
+              default: sprite
+    responses:
+      200:
+        description: Thumbnails
+        schema:
+          type: object
+          properties:
+            sprite:
+              type: string
+              description: Base64 sprite sheet
+            mimetype:
+              type: string
+              example: "image/webp"
+            width:
+              type: integer
+            height:
+              type: integer
+            tiles:
+              type: object
+              description: "{name: {x, y, w, h}} in sprite pixels"
+            missing:
+              type: array
+              items:
+                type: string
+      400:
+        description: Invalid names, size or format
+      403:
+        description: Unauthorized access
+    """
+    container, container_id = get_container_access(container_id, current_user.id)
+    if not container:
+        return jsonify({"error": "Unauthorized access to this container!"}), 403
+
+    data = request.get_json(silent=True) or {}
+    names = data.get("names")
+    if not isinstance(names, list) or not all(isinstance(name, str) for name in names):
+        return jsonify({"error": "names must be a list of image names"}), 400
+    if len(names) > MAX_THUMBNAILS:
+        return jsonify({"error": f"Too many names (max {MAX_THUMBNAILS})"}), 400
+    size = safe_int(data.get("size"), 128)
+    if size not in images.THUMBNAIL_SIZES:
+        return jsonify({"error": f"Invalid size, expected one of: {', '.join(map(str, images.THUMBNAIL_SIZES))}"}), 400
+    output = data.get("format", "sprite")
+    if output not in ("sprite", "multipart"):
+        return jsonify({"error": "Invalid format, expected sprite or multipart"}), 400
+
+    requested = list(dict.fromkeys(names))
+    names = [name for name in requested if name and name != "not-image.png"]
+    allowed = {
+        item["image_path"]
+        for item in read_db.items.find({"container_id": container_id, "image_path": {"$in": names}}, {"image_path": 1, "_id": 0})
+    }
+    names = [name for name in names if name in allowed]
+    try:
+        found = images.thumbnails(names, size)
+    except Exception as e:
+        print(f"Error making thumbnails: {e}")
+        return jsonify({"error": "Failed to make thumbnails"}), 500
+    missing = [name for name in requested if name not in found]
+    mimetype = images.MIMETYPES[images.IMAGE_FORMAT]
+
+    if output == "multipart":
+        boundary = secrets.token_hex(16)
+
+        def generate():
+            for name, thumbnail in found.items():
+                yield (
+                    f"--{boundary}\r\nContent-Type: {mimetype}\r\n"
+                    f"Content-Disposition: inline; filename=\"{name}\"\r\n"
+                    f"Content-Length: {len(thumbnail)}\r\n\r\n"
+                ).encode() + thumbnail + b"\r\n"
+            yield f"--{boundary}--\r\n".encode()
+
+        response = Response(generate(), mimetype=f"multipart/mixed; boundary={boundary}")
+        response.headers["X-Missing-Count"] = str(len(missing))
+        return response
+
+    if not found:
+        return jsonify({"sprite": None, "tiles": {}, "missing": missing}), 200
     try:
-        image_bytes = file.read()
-        image_base64 = base64.b64encode(image_bytes).decode('utf-8')
-        
-        return jsonify({
-            "image_data": image_base64,
-            "image_extension": f".{extension}"
-        }), 200
+        sheet, width, height, tiles = images.sprite(found, size)
     except Exception as e:
-        print(f"Error converting image: {e}")
-        return jsonify({"error": "Failed to process image"}), 500
\ No newline at end of file
+        print(f"Error making sprite: {e}")
+        return jsonify({"error": "Failed to make thumbnails"}), 500
+    return jsonify({
+        "sprite": base64.b64encode(sheet).decode("ascii"),
+        "mimetype": mimetype,
+        "width": width,
+        "height": height,
+        "tiles": {name: {"x": x, "y": y, "w": w, "h": h} for name, (x, y, w, h) in tiles.items()},
+        "missing": missing,
+    }), 200
@@ -0,0 +1,278 @@
+from flask import request, jsonify
+from flask_login import login_required, current_user
+from pymongo.errors import DuplicateKeyError
+from app.api import api_bp
+from app.db import db, read_db
+from app.models.user import User
+from app.api.utils.helpers import safe_int, safe_object_id, get_container_access
+from app.api.utils import memberships
+
+MAX_MEMBERS_LIMIT = 500
+
+
+def _public_member(entry, usernames):
+    return {
+        "user_id": str(entry["user_id"]),
+        "username": usernames.get(entry["user_id"]),
+        "role": entry["role"],
+        "added_at": entry["added_at"].isoformat() if entry.get("added_at") else None,
+    }
+
+
+@api_bp.route("/container/<container_id>/members", methods=["GET"])
+@login_required
+def list_members(container_id):
+    """
+    List the members of a container
+    ---
+    tags:
+      - Members
+    security:
+      - Session: []
+    parameters:
+      - name: container_id
+        in: path
+        type: string
+        required: true
+      - name: role
+        in: query
+        type: string
+        enum: [admin, member]
+        required: false
+      - name: limit
+        in: query
+        type: integer
+        default: 100
+        maximum: 500
+    responses:
+      200:
+        description: Members (admins first) and the total matching the filter
+        schema:
+          type: object
+          properties:
+            total:
+              type: integer
+            members:
+              type: array
+              items:
+                type: object
+                properties:
+                  user_id:
+                    type: string
+                  username:
+                    type: string
+                  role:
+                    type: string
+                  added_at:
+                    type: string
+      400:
+        description: Invalid role
+      401:
+        description: Not authenticated
+      403:
+        description: Unauthorized access
+    """
+    container, container_id = get_container_access(container_id, current_user.id)
+    if not container:
+        return jsonify({"error": "Unauthorized access to this container!"}), 403
+
+    query = {"container_id": container_id}
+    role = request.args.get("role")
+    if role:
+        if role not in memberships.ROLES:
+            return jsonify({"error": f"Invalid role, expected one of: {', '.join(memberships.ROLES)}"}), 400
+        query["role"] = role
+    limit = max(1, min(safe_int(request.args.get("limit"), 100), MAX_MEMBERS_LIMIT))
+
+    # (container_id, role) index: "admin" sorts before "member"
+    entries = list(read_db.memberships.find(query, {"_id": 0, "user_id": 1, "role": 1, "added_at": 1}).sort("role", 1).limit(limit))
+    usernames = {
+        user["_id"]: user["username"]
+        for user in read_db.users.find({"_id": {"$in": [entry["user_id"] for entry in entries]}}, {"username": 1})
+    }
+    return jsonify({
+        "total": read_db.memberships.count_documents(query),
+        "members": [_public_member(entry, usernames) for entry in entries],
+    }), 200
+
+
+@api_bp.route("/container/<container_id>/members", methods=["POST"])
+@login_required
+def add_member(container_id):
+    """
+    Add a user to a container
+    ---
+    tags:
+      - Members
+    security:
+      - Session: []
+    parameters:
+      - name: container_id
+        in: path
+        type: string
+        required: true
+      - in: body
+        name: body
+        required: true
+        schema:
+          type: object
+          required:
+            - username
+          properties:
+            username:
+              type: string
+            role:
+              type: string
+              enum: [admin, member]
+              default: member
+    responses:
+      201:
+        description: Member added
+      400:
+        description: Invalid input
+      401:
+        description: Not authenticated
+      403:
+        description: Unauthorized access (container admins only)
+      404:
+        description: User not found
+      409:
+        description: Already a member
+    """
+    container, container_id = get_container_access(container_id, current_user.id, roles=[memberships.ADMIN])
+    if not container:
+        return jsonify({"error": "Unauthorized access to this container!"}), 403
+
+    data = request.get_json() or {}
+    if not data.get("username"):
+        return jsonify({"error": "Missing fields"}), 400
+    role = data.get("role", memberships.MEMBER)
+    if role not in memberships.ROLES:
+        return jsonify({"error": f"Invalid role, expected one of: {', '.join(memberships.ROLES)}"}), 400
+
+    user = User.get_by_username(str(data["username"]).strip())
+    if not user:
+        return jsonify({"error": "User not found"}), 404
+
+    try:
+        memberships.add(container_id, safe_object_id(user.id), role)
+    except DuplicateKeyError:
+        return jsonify({"error": "User is already a member of this container"}), 409
+
+    return jsonify({"message": "Member added", "user_id": user.id, "role": role}), 201
+
+
+@api_bp.route("/container/<container_id>/members/<user_id>", methods=["POST"])
+@login_required
+def update_member(container_id, user_id):
+    """
+    Change the role of a member
+    ---
+    tags:
+      - Members
+    security:
+      - Session: []
+    parameters:
+      - name: container_id
+        in: path
+        type: string
+        required: true
+      - name: user_id
+        in: path
+        type: string
+        required: true
+      - in: body
+        name: body
+        required: true
+        schema:
+          type: object
+          required:
+            - role
+          properties:
+            role:
+              type: string
+              enum: [admin, member]
+    responses:
+      200:
+        description: Role updated
+      400:
+        description: Invalid input
+      401:
+        description: Not authenticated
+      403:
+        description: Unauthorized access (container admins only)
+      404:
+        description: Member not found
+      409:
+        description: The container would be left without an admin
+    """
+    container, container_id = get_container_access(container_id, current_user.id, roles=[memberships.ADMIN])
+    if not container:
+        return jsonify({"error": "Unauthorized access to this container!"}), 403
+
+    member_id = safe_object_id(user_id)
+    if member_id is None:
+        return jsonify({"error": "Invalid user ID"}), 400
+    role = (request.get_json() or {}).get("role")
+    if role not in memberships.ROLES:
+        return jsonify({"error": f"Invalid role, expected one of: {', '.join(memberships.ROLES)}"}), 400
+
+    entry = db.memberships.find_one({"user_id": member_id, "container_id": container_id}, {"role": 1})
+    if not entry:
+        return jsonify({"error": "Member not found"}), 404
+    if role == memberships.ADMIN:
+        memberships.promote(container_id, member_id)
+    elif entry["role"] == memberships.ADMIN and not memberships.demote(container_id, member_id):
+        return jsonify({"error": "A container needs at least one admin"}), 409
+
+    return jsonify({"message": "Member updated", "role": role}), 200
+
+
+@api_bp.route("/container/<container_id>/members/<user_id>", methods=["DELETE"])
+@login_required
+def remove_member(container_id, user_id):
+    """
+    Remove a member from a container (admins), or leave it (any member, own user ID)
+    ---
+    tags:
+      - Members
+    security:
+      - Session: []
+    parameters:
+      - name: container_id
+        in: path
+        type: string
+        required: true
+      - name: user_id
+        in: path
+        type: string
+        required: true
+    responses:
+      200:
+        description: Member removed
+      400:
+        description: Invalid user ID
+      401:
+        description: Not authenticated
+      403:
+        description: Unauthorized access
+      404:
+        description: Member not found
+      409:
+        description: The container would be left without an admin
+    """
+    member_id = safe_object_id(user_id)
+    if member_id is None:
+        return jsonify({"error": "Invalid user ID"}), 400
+    leaving = user_id == current_user.id
+    container, container_id = get_container_access(container_id, current_user.id, roles=None if leaving else [memberships.ADMIN])
+    if not container:
+        return jsonify({"error": "Unauthorized access to this container!"}), 403
+
+    removed = memberships.remove(container_id, member_id)
+    if removed is None:
+        return jsonify({"error": "Member not found"}), 404
+    if not removed:
+        return jsonify({"error": "A container needs at least one admin"}), 409
+
+    return jsonify({"message": "Member removed"}), 200
@@ -0,0 +1,36 @@
+import os
+import hmac
+from flask import request, jsonify, Response
+from app.api import api_bp
+from app.extensions import limiter
+from app.metrics import render_metrics
+
+
+@api_bp.route("/metrics", methods=["GET"])
+@limiter.exempt
+def metrics():
+    """
+    Prometheus metrics
+    ---
+    tags:
+      - Monitoring
+    parameters:
+      - name: Authorization
+        in: header
+        type: string
+        required: false
+        description: "Bearer <METRICS_TOKEN>, required when METRICS_TOKEN is set"
+    responses:
+      200:
+        description: Metrics in the Prometheus text exposition format
+      401:
+        description: Missing or invalid metrics token
+    """
+    token = os.getenv("METRICS_TOKEN")
+    if token:
+        provided = request.headers.get("Authorization", "")
+        if not hmac.compare_digest(provided, f"Bearer {token}"):
+            return jsonify({"error": "Unauthorized"}), 401
+
+    payload, content_type = render_metrics()
+    return Response(payload, mimetype=content_type.split(";")[0], headers={"Content-Type": content_type})
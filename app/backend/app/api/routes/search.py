@@ -0,0 +1,103 @@
+import re
+from flask import request, jsonify
+from flask_login import login_required, current_user
+from app.api import api_bp
+from app.db import read_db
+from app.api.utils.helpers import safe_int, get_container_access
+from app.api.utils.search import normalize_text, SEARCH_FIELDS
+
+MAX_SEARCH_LIMIT = 50
+
+
+@api_bp.route("/container/<container_id>/items/search", methods=["GET"])
+@login_required
+def search_items(container_id):
+    """
+    Find items as you type (prefix search on name and/or serie)
+    ---
+    tags:
+      - Items
+    security:
+      - Session: []
+    parameters:
+      - name: container_id
+        in: path
+        type: string
+        required: true
+      - name: q
+        in: query
+        type: string
+        required: true
+        description: Prefix, case and accent insensitive
+        example: "die ha"
+      - name: field
+        in: query
+        type: string
+        enum: [name, serie, all]
+        default: name
+      - name: limit
+        in: query
+        type: integer
+        default: 10
+        maximum: 50
+    responses:
+      200:
+        description: Matching items sorted by the normalized searched field (name for all)
+        schema:
+          type: array
+          items:
+            type: object
+            properties:
+              _id:
+                type: string
+              name:
+                type: string
+              serie:
+                type: string
+              edition:
+                type: string
+              image_path:
+                type: string
+      400:
+        description: Invalid field
+      401:
+        description: Not authenticated
+      403:
+        description: Unauthorized access
+    """
+    container, container_id = get_container_access(container_id, current_user.id)
+    if not container:
+        return jsonify({"error": "Unauthorized access to this container!"}), 403
+
+    query = normalize_text(request.args.get("q", ""))
+    field = request.args.get("field", "name")
+    limit = max(1, min(safe_int(request.args.get("limit"), 10), MAX_SEARCH_LIMIT))
+    if field != "all" and field not in SEARCH_FIELDS:
+        return jsonify({"error": f"Invalid field, expected one of: {', '.join(SEARCH_FIELDS)}, all"}), 400
+    if not query:
+        return jsonify([]), 200
+
+    # Anchored regex on a normalized field: index range scan on (container_id, <field>_norm).
+    # One query per field, each in the order of its index (an $or could only be sorted in
+    # memory), merged on the matched value
+    prefix = {"$regex": "^" + re.escape(query)}
+    fields = list(SEARCH_FIELDS.values()) if field == "all" else [SEARCH_FIELDS[field]]
+    matches = []
+    for norm_field in fields:
+        cursor = read_db.items.find(
+            {"container_id": container_id, norm_field: prefix},
+            {"name": 1, "serie": 1, "edition": 1, "image_path": 1, norm_field: 1}
+        ).sort(norm_field, 1).limit(limit)
+        matches += [(item.pop(norm_field), str(item["_id"]), item) for item in cursor]
+
+    items = []
+    seen = set()
+    for _, item_id, item in sorted(matches, key=lambda match: match[:2]):
+        if item_id in seen:
+            continue
+        seen.add(item_id)
+        item["_id"] = item_id
+        items.append(item)
+        if len(items) == limit:
+            break
+    return jsonify(items), 200
@@ -0,0 +1,79 @@
+import re
+from flask import request, jsonify
+from flask_login import login_required, current_user
+from app.api import api_bp
+from app.db import read_db
+from app.api.utils.helpers import safe_int, get_container_access
+
+MAX_TAGS_LIMIT = 100
+
+
+@api_bp.route("/container/<container_id>/tags", methods=["GET"])
+@login_required
+def list_tags(container_id):
+    """
+    List distinct tags of a container with usage counts (autocomplete)
+    ---
+    tags:
+      - Items
+    security:
+      - Session: []
+    parameters:
+      - name: container_id
+        in: path
+        type: string
+        required: true
+      - name: prefix
+        in: query
+        type: string
+        required: false
+        description: Case-sensitive tag prefix
+        example: "zel"
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        default: 10
+        maximum: 100
+    responses:
+      200:
+        description: Tags sorted by usage count, then name
+        schema:
+          type: array
+          items:
+            type: object
+            properties:
+              tag:
+                type: string
+                example: "zelda"
+              count:
+                type: integer
+                example: 12
+      401:
+        description: Not authenticated
+      403:
+        description: Unauthorized access
+    """
+    container, container_id = get_container_access(container_id, current_user.id)
+    if not container:
+        return jsonify({"error": "Unauthorized access to this container!"}), 403
+
+    prefix = request.args.get("prefix", "").strip()
+    limit = max(1, min(safe_int(request.args.get("limit"), 10), MAX_TAGS_LIMIT))
+
+    # Anchored, case-sensitive regex: bounded scan of the (container_id, tags) index
+    match = {"container_id": container_id}
+    pipeline = [{"$match": match}, {"$project": {"_id": 0, "tags": 1}}, {"$unwind": "$tags"}]
+    if prefix:
+        tag_filter = {"$regex": "^" + re.escape(prefix)}
+        match["tags"] = tag_filter
+        # Items matched on one tag also carry the others, keep only matching tags
+        pipeline.append({"$match": {"tags": tag_filter}})
+    pipeline += [
+        {"$group": {"_id": "$tags", "count": {"$sum": 1}}},
+        {"$sort": {"count": -1, "_id": 1}},
+        {"$limit": limit},
+    ]
+
+    tags = [{"tag": row["_id"], "count": row["count"]} for row in read_db.items.aggregate(pipeline)]
+    return jsonify(tags), 200
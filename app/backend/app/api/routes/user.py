@@ -2,7 +2,7 @@ from flask import request, jsonify, redirect, url_for
 from flask_login import login_user, logout_user, login_required, current_user
 from app.api import api_bp
 from app.models.user import User
-from app.extensions import bcrypt
+from app.api.utils.passwords import check_password, HashingBusy
 
 
 @api_bp.route("/login", methods=["OPTIONS", "GET", "POST"])
@@ -45,6 +45,8 @@ def login():
             message:
               type: string
               example: "Invalid credentials"
+      503:
+        description: Too many logins being verified, retry after the Retry-After delay
     """
     if current_user.is_authenticated:
         return jsonify({"authenticated": True, "redirect": "/dashboard"}), 200
@@ -57,11 +59,13 @@ def login():
         if not username or not password:
             return jsonify({"message": "Missing username or password"}), 400
         
-        user = User.get_by_username(username)
-        if user:
-            from app.db import db
-            user_data = db.users.find_one({"username": username})
-            if bcrypt.check_password_hash(pw_hash=user_data["password"], password=password):
+        user, password_hash = User.get_by_username_with_hash(username)
+        if user and password_hash:
+            try:
+                valid = check_password(password_hash, password)
+            except HashingBusy:
+                return jsonify({"message": "Too many login attempts, please retry"}), 503, {"Retry-After": "1"}
+            if valid:
                 if login_user(user):
                     return jsonify({"message": "Login successful", "redirect": "/dashboard"}), 200
         
@@ -0,0 +1,96 @@
+import os
+import threading
+from collections import OrderedDict
+from pymongo import ReturnDocument
+from app.db import db
+from app.metrics import CATEGORY_CACHE_REQUESTS
+
+
+# In-process LRU of {container_id: (categories_version, {category_id: name})}.
+# Every category write bumps `categories_version` on the container document, and
+# routes always read the container document (access check), so a worker notices
+# a change made by another worker on its next request and reloads that entry.
+CACHE_SIZE = int(os.getenv("CATEGORY_CACHE_SIZE", 1024))
+
+_entries = OrderedDict()
+_lock = threading.Lock()
+
+
+def get_categories(container):
+    """Return {category_id: name} for a container document, ordered as stored"""
+    container_id = container["_id"]
+    version = container.get("categories_version", 0)
+    with _lock:
+        entry = _entries.get(container_id)
+        if entry is not None and entry[0] == version:
+            _entries.move_to_end(container_id)
+            CATEGORY_CACHE_REQUESTS.labels("hit").inc()
+            return entry[1]
+
+    CATEGORY_CACHE_REQUESTS.labels("miss").inc()
+    categories = {
+        cat["_id"]: cat["name"]
+        for cat in db.categories.find({"container_id": container_id}, {"name": 1})
+    }
+    _store(container_id, version, categories)
+    return categories
+
+
+def _store(container_id, version, categories):
+    with _lock:
+        current = _entries.get(container_id)
+        # Never replace a newer entry loaded concurrently
+        if current is None or current[0] <= version:
+            _entries[container_id] = (version, categories)
+            _entries.move_to_end(container_id)
+        while len(_entries) > CACHE_SIZE:
+            _entries.popitem(last=False)
+
+
+def _bump_version(container_id):
+    """Increment the categories version of a container, returns the new version"""
+    container = db.containers.find_one_and_update(
+        {"_id": container_id},
+        {"$inc": {"categories_version": 1}},
+        projection={"categories_version": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    return container["categories_version"] if container else None
+
+
+def _write_through(container_id, apply):
+    """Publish a category change (already written to the database)"""
+    version = _bump_version(container_id)
+    with _lock:
+        entry = _entries.get(container_id)
+        if entry is None:
+            return
+        if version is not None and entry[0] == version - 1:
+            categories = dict(entry[1])
+            apply(categories)
+            _entries[container_id] = (version, categories)
+        else:
+            # Another writer got in between, reload on next read
+            del _entries[container_id]
+
+
+def category_added(container_id, category_id, name):
+    _write_through(container_id, lambda categories: categories.__setitem__(category_id, name))
+
+
+def category_renamed(container_id, category_id, name):
+    _write_through(container_id, lambda categories: categories.__setitem__(category_id, name))
+
+
+def category_removed(container_id, category_id):
+    _write_through(container_id, lambda categories: categories.pop(category_id, None))
+
+
+def container_loaded(container_id, categories, version=0):
+    """Seed the cache for a container whose categories were just written (import)"""
+    _store(container_id, version, dict(categories))
+
+
+def container_removed(container_id):
+    with _lock:
+        _entries.pop(container_id, None)
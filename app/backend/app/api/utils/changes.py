@@ -0,0 +1,32 @@
+import datetime
+import os
+from app.db import db
+
+# Change tracking for incremental exports: items and categories carry `updated_at`,
+# deletions leave a tombstone in `deletions` (expired by a TTL index), so a delta
+# export only reads what changed since its baseline.
+TOMBSTONE_DAYS = float(os.getenv("EXPORT_TOMBSTONE_DAYS", 90))
+
+
+def now():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def record_deletions(kind, source_ids, container_id):
+    """Leave tombstones for deleted items, categories or containers"""
+    deleted_at = now()
+    tombstones = [
+        {"kind": kind, "source_id": source_id, "container_id": container_id, "deleted_at": deleted_at}
+        for source_id in source_ids
+    ]
+    if tombstones:
+        db.deletions.insert_many(tombstones, ordered=False)
+
+
+def record_deletion(kind, source_id, container_id):
+    record_deletions(kind, [source_id], container_id)
+
+
+def oldest_baseline():
+    """Deltas cannot start before the oldest tombstone still kept"""
+    return now() - datetime.timedelta(days=TOMBSTONE_DAYS)
@@ -0,0 +1,145 @@
+import random
+import re
+import zlib
+from collections import defaultdict
+from itertools import combinations
+from app.api.utils.search import normalize_text
+
+# MinHash over character 3-grams of the normalized name, serie and edition.
+# LSH splits the signature in bands: two items become candidates when one band is
+# identical, so detection never compares every pair of a container.
+DEDUP_FIELDS = ("name", "serie", "edition")
+SHINGLE_SIZE = 3
+NUM_PERM = 32
+BAND_ROWS = 2  # 16 bands, ~90% recall for a Jaccard similarity of 0.4
+MAX_BUCKET = 64  # Bands shared by more items are too common to be a signal
+DEFAULT_THRESHOLD = 0.5
+# A text almost fully contained in another one is a duplicate even with a lower Jaccard
+CONTAINMENT_THRESHOLD = 0.9
+MIN_CONTAINMENT_JACCARD = 0.3
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20240601)  # Fixed seed: signatures are stored and must stay comparable
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+_PUNCTUATION = re.compile(r"[^\w ]+")
+
+
+def dedup_text(item):
+    text = " ".join(normalize_text(item.get(field)) for field in DEDUP_FIELDS if item.get(field))
+    return " ".join(_PUNCTUATION.sub(" ", text).split())
+
+
+def shingles(text):
+    padded = f" {text} "
+    if len(padded) <= SHINGLE_SIZE:
+        return {padded}
+    return {padded[i:i + SHINGLE_SIZE] for i in range(len(padded) - SHINGLE_SIZE + 1)}
+
+
+def signature(shingle_set):
+    hashes = [zlib.crc32(s.encode()) for s in shingle_set]
+    return [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def dedup_fields(item):
+    """Signature fields to store on an item document ({} when no text field is present)"""
+    if not any(field in item for field in DEDUP_FIELDS):
+        return {}
+    text = dedup_text(item)
+    if not text:
+        return {"dedup_sig": [], "dedup_size": 0}
+    shingle_set = shingles(text)
+    return {"dedup_sig": signature(shingle_set), "dedup_size": len(shingle_set)}
+
+
+def band_keys(sig):
+    return [hash((band, tuple(sig[band * BAND_ROWS:(band + 1) * BAND_ROWS]))) for band in range(len(sig) // BAND_ROWS)]
+
+
+def similarity(sig_a, size_a, sig_b, size_b):
+    """Estimated (jaccard, containment) of two signatures
+
+    Containment (share of the smaller text found in the larger one) catches
+    "Die Hard 3" vs "Die hard 3 - Retour en enfer" whose Jaccard is low.
+    """
+    equal = sum(1 for a, b in zip(sig_a, sig_b) if a == b)
+    jaccard = equal / len(sig_a)
+    smaller = min(size_a, size_b)
+    if not smaller:
+        return jaccard, 0.0
+    intersection = jaccard * (size_a + size_b) / (1 + jaccard)
+    return jaccard, min(1.0, intersection / smaller)
+
+
+def likely_duplicate(sig_a, size_a, sig_b, size_b, threshold=DEFAULT_THRESHOLD):
+    """(jaccard, containment) when the two signatures look like duplicates, else None"""
+    jaccard, containment = similarity(sig_a, size_a, sig_b, size_b)
+    if jaccard >= threshold or (containment >= CONTAINMENT_THRESHOLD and jaccard >= MIN_CONTAINMENT_JACCARD):
+        return jaccard, containment
+    return None
+
+
+class DuplicateIndex:
+    """In-memory LSH index over stored item signatures"""
+
+    def __init__(self, max_bucket=MAX_BUCKET):
+        self.max_bucket = max_bucket
+        self.buckets = defaultdict(list)
+        self.entries = {}
+
+    def add(self, key, sig, size):
+        if not sig:
+            return
+        self.entries[key] = (sig, size)
+        for band in band_keys(sig):
+            self.buckets[band].append(key)
+
+    def _score(self, key_a, key_b, threshold):
+        sig_a, size_a = self.entries[key_a]
+        sig_b, size_b = self.entries[key_b]
+        return likely_duplicate(sig_a, size_a, sig_b, size_b, threshold)
+
+    def pairs(self, threshold=DEFAULT_THRESHOLD):
+        """Likely duplicate pairs inside the index: [(key_a, key_b, jaccard, containment)]"""
+        seen = set()
+        results = []
+        for keys in self.buckets.values():
+            if len(keys) < 2 or len(keys) > self.max_bucket:
+                continue
+            for key_a, key_b in combinations(keys, 2):
+                pair = (key_a, key_b) if str(key_a) < str(key_b) else (key_b, key_a)
+                if pair in seen:
+                    continue
+                seen.add(pair)
+                scores = self._score(*pair, threshold)
+                if scores:
+                    results.append((*pair, *scores))
+        return results
+
+    def matches(self, sig, size, threshold=DEFAULT_THRESHOLD):
+        """Indexed items likely duplicating a signature: [(key, jaccard, containment)]"""
+        if not sig:
+            return []
+        candidates = set()
+        for band in band_keys(sig):
+            keys = self.buckets.get(band, ())
+            if len(keys) <= self.max_bucket:
+                candidates.update(keys)
+        results = []
+        for key in candidates:
+            indexed_sig, indexed_size = self.entries[key]
+            scores = likely_duplicate(sig, size, indexed_sig, indexed_size, threshold)
+            if scores:
+                results.append((key, *scores))
+        return results
+
+
+def load_index(db, container_id, projection=None):
+    """Build the index of a container with one query, returns (index, {item_id: item})"""
+    fields = {"dedup_sig": 1, "dedup_size": 1, **(projection or {})}
+    index = DuplicateIndex()
+    items = {}
+    for item in db.items.find({"container_id": container_id, "dedup_sig.0": {"$exists": True}}, fields):
+        index.add(item["_id"], item.pop("dedup_sig"), item.pop("dedup_size", 0))
+        items[item["_id"]] = item
+    return index, items
@@ -0,0 +1,103 @@
+import datetime
+from app.db import db
+from app.api.utils import changes
+from app.api.utils.helpers import safe_object_id
+
+
+def _utc(value):
+    return value if value.tzinfo else value.replace(tzinfo=datetime.timezone.utc)
+
+
+def resolve_baseline(since, user_id):
+    """Baseline of a differential export, returns (baseline or None, error or None)
+
+    `since` is the id of a previous export of the user or an ISO 8601 timestamp.
+    Only an export id knows which containers the baseline held, so only then are
+    new containers exported in full and deleted containers listed.
+    """
+    if not since:
+        return None, None
+    export_id = safe_object_id(since)
+    if export_id is not None:
+        previous = db.exports.find_one({"_id": export_id, "user_id": user_id}, {"created_at": 1, "container_ids": 1})
+        if not previous:
+            return None, "Unknown baseline export"
+        baseline = {
+            "export_id": str(export_id),
+            "since": _utc(previous["created_at"]),
+            "container_ids": previous.get("container_ids", []),
+        }
+    else:
+        try:
+            timestamp = _utc(datetime.datetime.fromisoformat(str(since)))
+        except ValueError:
+            return None, "Invalid baseline, expected an export id or an ISO 8601 timestamp"
+        baseline = {"export_id": None, "since": timestamp, "container_ids": None}
+    if baseline["since"] < changes.oldest_baseline():
+        return None, f"Baseline older than {changes.TOMBSTONE_DAYS:g} days, deletions are no longer known: make a full export"
+    return baseline, None
+
+
+def _by_key(entries, key):
+    return {entry[key]: entry for entry in entries}
+
+
+def apply_delta(base, delta):
+    """Merge a differential export into a full export, returns a new full export"""
+    if delta.get("kind") != "delta":
+        raise ValueError("Not a differential export")
+    if not base.get("export_id"):
+        raise ValueError("The base export predates differential exports, make a new full export")
+    if delta.get("base_export_id") and delta["base_export_id"] != base["export_id"]:
+        raise ValueError(f"Delta {delta.get('export_id')} follows export {delta['base_export_id']}, not {base['export_id']}")
+
+    containers = _by_key(base.get("containers", []), "temp_id")
+    for container_id in delta.get("deleted_containers", []):
+        containers.pop(container_id, None)
+
+    for changed in delta.get("containers", []):
+        current = containers.get(changed["temp_id"])
+        if current is None or changed.get("full"):
+            containers[changed["temp_id"]] = {
+                "temp_id": changed["temp_id"],
+                "name": changed["name"],
+                "categories": changed.get("categories", []),
+                "items": changed.get("items", []),
+            }
+            continue
+
+        categories = _by_key(current.get("categories", []), "temp_id")
+        categories.update(_by_key(changed.get("categories", []), "temp_id"))
+        deleted_categories = set(changed.get("deleted_categories", []))
+        for category_id in deleted_categories:
+            categories.pop(category_id, None)
+
+        items = _by_key(current.get("items", []), "source_id")
+        items.update(_by_key(changed.get("items", []), "source_id"))
+        for item_id in changed.get("deleted_items", []):
+            items.pop(item_id, None)
+
+        containers[changed["temp_id"]] = {
+            "temp_id": changed["temp_id"],
+            "name": changed["name"],
+            "categories": list(categories.values()),
+            # Deleting a category deletes its items
+            "items": [item for item in items.values() if item.get("category_temp_id") not in deleted_categories],
+        }
+
+    return {
+        **base,
+        "export_id": delta.get("export_id"),
+        "export_date": delta.get("export_date"),
+        "kind": "full",
+        "containers": list(containers.values()),
+    }
+
+
+def apply_chain(base, deltas):
+    """Apply differential exports, oldest first, on top of a full export"""
+    if base.get("kind") == "delta":
+        raise ValueError("The first file must be a full export")
+    for delta in deltas:
+        base = apply_delta(base, delta)
+    return base
@@ -2,6 +2,7 @@ from bson import ObjectId
 from bson.errors import InvalidId
 from flask_login import current_user
 from app.db import db
+from app.api.utils import memberships
 
 
 def safe_object_id(id_string):
@@ -29,20 +30,20 @@ def safe_int(value, default=0):
     except (ValueError, TypeError):
         return default
 
-def get_container_access(container_id: str, user_id):
-    """Check if user has access to container"""
+def get_container_access(container_id: str, user_id, roles=None):
+    """Check if user has access to container (with one of `roles` when given)"""
     container_id = safe_object_id(container_id)
     if container_id is None:
         print(f"Unknown container ID: {container_id}!")
         return None, None
     
-    container = db.containers.find_one({"_id": container_id})
-    if not container:
-        return None, None
-    
     user_id = safe_object_id(current_user.id)
-    if user_id != container["admin_id"] and user_id not in container["member_ids"]:
+    if not memberships.has_access(container_id, user_id, roles):
         print(f"Unauthorized access detected from user ID: {user_id}!")
         return None, None
     
+    container = db.containers.find_one({"_id": container_id})
+    if not container:
+        return None, None
+    
     return container, container_id
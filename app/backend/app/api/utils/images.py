@@ -0,0 +1,390 @@
+"""Image ingest
+
+Uploaded images are decoded to check their real type, rotated upright from their
+EXIF orientation, stripped of metadata (EXIF, GPS, ICC, XMP), downscaled to
+IMAGE_MAX_DIMENSION and re-encoded to IMAGE_FORMAT before they are stored. Decoding
+and encoding are CPU bound, so they run in a process pool, along with the
+perceptual hash used to find similar images (app.api.utils.phash).
+"""
+import base64
+import datetime
+import io
+import multiprocessing
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from PIL import Image, ImageOps
+from app import storage
+from app.api.utils import pipeline
+from app.db import db
+from app.metrics import IMAGE_INGEST_DURATION, IMAGE_INGEST_BYTES
+
+IMAGE_MAX_DIMENSION = int(os.getenv("IMAGE_MAX_DIMENSION", 1600))
+IMAGE_FORMAT = os.getenv("IMAGE_FORMAT", "WEBP").upper()
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", 80))
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", 2))
+IMAGE_TIMEOUT = float(os.getenv("IMAGE_TIMEOUT", 30))
+# Decompression bomb guard: larger images are refused before being decoded
+IMAGE_MAX_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", 50_000_000))
+IMAGE_THUMBNAIL_SIZE = int(os.getenv("IMAGE_THUMBNAIL_SIZE", 256))
+IMAGE_STAGING_TTL_MINUTES = float(os.getenv("IMAGE_STAGING_TTL_MINUTES", 60))
+THUMBNAIL_SIZES = (64, 128, 256)
+SPRITE_COLUMNS = 10
+HASH_SIZE = 8  # dHash of 8 x 8 gradients: 64 bits
+
+ACCEPTED_FORMATS = {"PNG", "JPEG", "GIF", "WEBP"}
+EXTENSIONS = {"WEBP": ".webp", "JPEG": ".jpg", "PNG": ".png"}
+MIMETYPES = {"WEBP": "image/webp", "JPEG": "image/jpeg", "PNG": "image/png"}
+
+_pool = None
+_pool_pid = None
+_lock = threading.Lock()
+
+
+class InvalidImage(ValueError):
+    """The data is not an image of an accepted type"""
+
+
+class UnknownImageToken(ValueError):
+    """The staged image token is unknown, expired or already used"""
+
+
+class ImageProcessingUnavailable(RuntimeError):
+    """The image pool timed out or failed (retry later)"""
+
+
+def _get_pool():
+    """Per-process executor (a worker must not share the pool of its parent)"""
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _lock:
+            if _pool is None or _pool_pid != pid:
+                # spawn: forking a threaded server process is unsafe
+                _pool = ProcessPoolExecutor(max_workers=IMAGE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+                _pool_pid = pid
+    return _pool
+
+
+def _reset_pool(broken):
+    global _pool
+    with _lock:
+        if _pool is broken:
+            _pool = None
+
+
+def _gevent_threadpool():
+    """gevent hub threadpool when the worker is monkey patched, else None"""
+    try:
+        from gevent import monkey, get_hub
+    except ImportError:
+        return None
+    if monkey.is_module_patched("threading"):
+        return get_hub().threadpool
+    return None
+
+
+def _is_normalized(image):
+    """Already in the stored format, within bounds and without metadata (e.g. re-imported exports)"""
+    return (
+        image.format == IMAGE_FORMAT
+        and max(image.size) <= IMAGE_MAX_DIMENSION
+        and not any(key in image.info for key in ("exif", "icc_profile", "xmp"))
+    )
+
+
+def normalize(data):
+    """Validate, strip, downscale and re-encode image bytes, returns (bytes, extension)
+
+    Raises InvalidImage when the bytes are not a PNG, JPEG, GIF or WebP image.
+    """
+    Image.MAX_IMAGE_PIXELS = IMAGE_MAX_PIXELS
+    try:
+        with Image.open(io.BytesIO(data)) as probe:
+            if probe.format not in ACCEPTED_FORMATS:
+                raise InvalidImage(f"Unsupported image type {probe.format}")
+            # Checked here: Pillow only warns up to twice MAX_IMAGE_PIXELS
+            if probe.size[0] * probe.size[1] > IMAGE_MAX_PIXELS:
+                raise InvalidImage("Image too large")
+            probe.verify()
+        # verify() leaves the image unusable, open it again to decode it
+        image = Image.open(io.BytesIO(data))
+        if _is_normalized(image):
+            return data, EXTENSIONS[IMAGE_FORMAT]
+        image.load()
+    except InvalidImage:
+        raise
+    except (Image.DecompressionBombError, Image.DecompressionBombWarning):
+        raise InvalidImage("Image too large")
+    except Exception:
+        raise InvalidImage("Invalid image, expected a PNG, JPEG, GIF or WebP file")
+
+    image = ImageOps.exif_transpose(image)  # Only the first frame of animations is kept
+    has_alpha = image.mode in ("RGBA", "LA", "PA") or (image.mode == "P" and "transparency" in image.info)
+    image = image.convert("RGBA" if has_alpha and IMAGE_FORMAT != "JPEG" else "RGB")
+    image.thumbnail((IMAGE_MAX_DIMENSION, IMAGE_MAX_DIMENSION), Image.Resampling.LANCZOS)
+
+    out = io.BytesIO()
+    # No exif / icc_profile passed: the metadata is dropped
+    image.save(out, IMAGE_FORMAT, quality=IMAGE_QUALITY, optimize=True)
+    return out.getvalue(), EXTENSIONS[IMAGE_FORMAT]
+
+
+def dhash(image):
+    """Difference hash of a PIL image as 16 hex digits
+
+    Each bit tells whether a pixel of the greyscale 9 x 8 reduction is brighter
+    than its right neighbour: resizing, re-encoding and small edits flip few bits.
+    """
+    pixels = image.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.Resampling.BOX).tobytes()
+    value = 0
+    for row in range(HASH_SIZE):
+        for column in range(HASH_SIZE):
+            offset = row * (HASH_SIZE + 1) + column
+            value = (value << 1) | (pixels[offset] > pixels[offset + 1])
+    return f"{value:016x}"
+
+
+def image_hash(data):
+    """dhash() of image bytes, None when they cannot be decoded"""
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            return dhash(image)
+    except Exception:
+        return None
+
+
+def normalize_with_hash(data):
+    """normalize() plus the perceptual hash of the result, returns (bytes, extension, hash)"""
+    image_bytes, extension = normalize(data)
+    return image_bytes, extension, image_hash(image_bytes)
+
+
+def make_thumbnail(data, size=IMAGE_THUMBNAIL_SIZE):
+    """Thumbnail of a stored image, longest side `size`, returns bytes"""
+    with Image.open(io.BytesIO(data)) as image:
+        image.thumbnail((size, size), Image.Resampling.LANCZOS)
+        out = io.BytesIO()
+        image.save(out, IMAGE_FORMAT, quality=IMAGE_QUALITY)
+    return out.getvalue()
+
+
+def normalize_with_thumbnail(data):
+    """normalize_with_hash() plus a IMAGE_THUMBNAIL_SIZE thumbnail, returns (bytes, extension, hash, thumbnail bytes)"""
+    image_bytes, extension, hash_ = normalize_with_hash(data)
+    return image_bytes, extension, hash_, make_thumbnail(image_bytes)
+
+
+def make_sprite(thumbnails, cell):
+    """Sprite sheet of thumbnails in `cell` x `cell` slots, returns (bytes, width, height, [(x, y, w, h)])"""
+    columns = max(1, min(len(thumbnails), SPRITE_COLUMNS))
+    rows = max(1, -(-len(thumbnails) // columns))
+    sheet = Image.new("RGBA", (columns * cell, rows * cell), (0, 0, 0, 0))
+    tiles = []
+    for index, data in enumerate(thumbnails):
+        x, y = (index % columns) * cell, (index // columns) * cell
+        with Image.open(io.BytesIO(data)) as tile:
+            tile.thumbnail((cell, cell), Image.Resampling.LANCZOS)
+            sheet.paste(tile.convert("RGBA"), (x, y))
+            tiles.append((x, y, tile.width, tile.height))
+    if IMAGE_FORMAT == "JPEG":
+        sheet = sheet.convert("RGB")
+    out = io.BytesIO()
+    sheet.save(out, IMAGE_FORMAT, quality=IMAGE_QUALITY)
+    return out.getvalue(), sheet.width, sheet.height, tiles
+
+
+def _run(calls):
+    """Run (fn, *args) calls off the request thread, concurrently, returns the results in order"""
+    threadpool = _gevent_threadpool()
+    if threadpool is not None:
+        from gevent import Timeout
+        # Pillow releases the GIL while decoding, resizing and encoding
+        pending = [threadpool.spawn(fn, *args) for fn, *args in calls]
+        try:
+            return [result.get(timeout=IMAGE_TIMEOUT) for result in pending]
+        except Timeout as e:
+            raise ImageProcessingUnavailable("Image processing timed out") from e
+    pool = _get_pool()
+    try:
+        futures = [pool.submit(fn, *args) for fn, *args in calls]
+        return [future.result(timeout=IMAGE_TIMEOUT) for future in futures]
+    except TimeoutError as e:
+        raise ImageProcessingUnavailable("Image processing timed out") from e
+    except BrokenProcessPool as e:
+        # A process died (out of memory...), the next image gets a new pool
+        _reset_pool(pool)
+        raise ImageProcessingUnavailable("Image processing pool failed") from e
+
+
+def _process(fn, data):
+    """Run an ingest function fn(data) off the request thread"""
+    start = time.perf_counter()
+    try:
+        result = _run([(fn, data)])[0]
+    finally:
+        IMAGE_INGEST_DURATION.observe(time.perf_counter() - start)
+    IMAGE_INGEST_BYTES.labels("received").inc(len(data))
+    IMAGE_INGEST_BYTES.labels("stored").inc(len(result[0]))
+    return result
+
+
+def ingest(data):
+    """normalize_with_hash() in the process pool, returns (bytes, extension, hash)"""
+    return _process(normalize_with_hash, data)
+
+
+def save(data):
+    """Ingest image bytes into the media storage, returns (new file name, perceptual hash)"""
+    image_bytes, extension, hash_ = ingest(data)
+    filename = secrets.token_hex(16) + extension
+    storage.media.save(filename, image_bytes)
+    return filename, hash_
+
+
+def stored_hashes(names):
+    """Perceptual hashes of stored images, returns {name: hash} (missing or undecodable images are left out)"""
+    contents = pipeline.ordered_map(_read, [(storage.media, name) for name in names])
+    found = [(name, data) for name, data in zip(names, contents) if data is not None]
+    hashes = _run([(image_hash, data) for _, data in found]) if found else []
+    return {name: hash_ for (name, _), hash_ in zip(found, hashes) if hash_}
+
+
+# ========== STAGED UPLOADS ==========
+# The upload preview ingests the image once and stages it under a token; item
+# create/update then reference the token instead of sending the image again.
+def staged_name(token, extension):
+    return token + extension
+
+
+def thumbnail_name(token):
+    return token + ".thumb" + EXTENSIONS[IMAGE_FORMAT]
+
+
+def stage(data, user_id):
+    """Ingest image bytes into the staged storage, returns the staged_images document"""
+    image_bytes, extension, hash_, thumbnail = _process(normalize_with_thumbnail, data)
+    token = secrets.token_hex(16)
+    storage.staged.save(staged_name(token, extension), image_bytes)
+    storage.staged.save(thumbnail_name(token), thumbnail)
+    staged = {
+        "_id": token,
+        "user_id": user_id,
+        "extension": extension,
+        "size": len(image_bytes),
+        "image_hash": hash_,
+        "expires_at": datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(minutes=IMAGE_STAGING_TTL_MINUTES),
+    }
+    db.staged_images.insert_one(staged)
+    return staged
+
+
+def get_staged(token, user_id):
+    """Staged image of the user still valid, or None"""
+    return db.staged_images.find_one({
+        "_id": str(token),
+        "user_id": user_id,
+        "expires_at": {"$gt": datetime.datetime.now(datetime.timezone.utc)},
+    })
+
+
+def claim(token, user_id):
+    """Move a staged image into the media storage, returns (new file name, perceptual hash)
+
+    A token can be claimed once. Raises UnknownImageToken when it is unknown,
+    expired or belongs to another user.
+    """
+    staged = get_staged(token, user_id)
+    if not staged or not db.staged_images.delete_one({"_id": staged["_id"]}).deleted_count:
+        raise UnknownImageToken("Unknown or expired image token")
+    # The stored name differs from the token: media files are served without authentication
+    filename = secrets.token_hex(16) + staged["extension"]
+    try:
+        storage.staged.move(staged_name(staged["_id"], staged["extension"]), storage.media, filename)
+    except FileNotFoundError:
+        raise UnknownImageToken("Unknown or expired image token")
+    storage.staged.delete(thumbnail_name(staged["_id"]))
+    return filename, staged.get("image_hash")
+
+
+def store_from_payload(data, user_id):
+    """Store the image of an item add/update payload, returns (file name, perceptual hash) or (None, None)
+
+    `image_token` (staged by the upload preview) is preferred over the legacy
+    base64 `image_data`.
+    """
+    if data.get("image_token"):
+        return claim(data["image_token"], user_id)
+    if data.get("image_data"):
+        return save(base64.b64decode(data["image_data"]))
+    return None, None
+
+
+# ========== THUMBNAILS ==========
+# Gallery thumbnails are made on first request and kept in the thumbnails
+# storage as "<size>_<image name>"; app.media_gc removes those of deleted images.
+def thumbnail_key(name, size):
+    return f"{size}_{name}"
+
+
+def source_name(key):
+    """Image name of a thumbnail key (other names are returned unchanged)"""
+    size, separator, name = key.partition("_")
+    if not separator or not size.isdigit():
+        return key
+    return name
+
+
+def delete_thumbnails(name):
+    for size in THUMBNAIL_SIZES:
+        storage.thumbnails.delete(thumbnail_key(name, size))
+
+
+def _read(args):
+    store, name = args
+    try:
+        return store.read(name)
+    except FileNotFoundError:
+        return None
+
+
+def thumbnails(names, size):
+    """Thumbnails of stored images, returns {name: bytes} (names without a stored image are left out)"""
+    keys = {name: thumbnail_key(name, size) for name in names}
+    cached = storage.thumbnails.sizes(keys.values())
+    result = {}
+    # Storage reads wait on the disk / MongoDB: overlapped in the I/O pool
+    to_read = [(storage.thumbnails, keys[name]) if keys[name] in cached else (storage.media, name) for name in names]
+    missing = []
+    for name, data in zip(names, pipeline.ordered_map(_read, to_read)):
+        if data is None:
+            continue
+        if keys[name] in cached:
+            result[name] = data
+        else:
+            missing.append((name, data))
+    if missing:
+        made = _run([(make_thumbnail, data, size) for _, data in missing])
+        for (name, _), thumbnail in zip(missing, made):
+            storage.thumbnails.save(keys[name], thumbnail)
+            result[name] = thumbnail
+    return result
+
+
+def sprite(thumbnails_by_name, cell):
+    """Sprite sheet of {name: thumbnail bytes}, returns (bytes, width, height, {name: (x, y, w, h)})"""
+    names = list(thumbnails_by_name)
+    data, width, height, tiles = _run([(make_sprite, [thumbnails_by_name[name] for name in names], cell)])[0]
+    return data, width, height, dict(zip(names, tiles))
+
+
+def purge_staged():
+    """Delete staged files never claimed (their document already expired), returns the freed bytes"""
+    freed = 0
+    for name, size in list(storage.staged.iter_files(time.time() - IMAGE_STAGING_TTL_MINUTES * 60)):
+        if storage.staged.delete(name):  # False when purged by another worker
+            freed += size
+    return freed
@@ -0,0 +1,338 @@
+import base64
+import datetime
+import os
+from collections.abc import Iterator
+from bson import ObjectId
+from app.db import db, bulk_db, checkpoint
+from app.utils import MAX_SIZE_NAME
+from app.api.utils import category_cache, changes, images, memberships, jsonstream
+from app.api.utils.validators import validate_item_data
+from app.api.utils.search import search_fields
+from app.api.utils.dedup import dedup_fields, load_index, DuplicateIndex
+from app.api.utils.phash import image_hash_fields
+
+EXPORT_VERSION = "1.0"
+CONFLICT_STRATEGIES = ("skip", "rename", "replace")
+# Items inserted per round-trip by apply_import
+IMPORT_WRITE_BATCH = int(os.getenv("IMPORT_WRITE_BATCH", 500))
+
+
+def _free_name(name, taken):
+    counter = 1
+    candidate = f"{name} ({counter})"
+    while candidate in taken:
+        counter += 1
+        candidate = f"{name} ({counter})"
+    return candidate
+
+
+def _plan_categories(categories):
+    """Return ({temp_id}, skipped) for the categories of one container"""
+    temp_ids = set()
+    # Category names are unique per container, case-insensitively (collation of the index)
+    names = set()
+    skipped = []
+    for index, category in enumerate(categories):
+        name = category.get("name") if isinstance(category, dict) else None
+        temp_id = category.get("temp_id") if isinstance(category, dict) else None
+        reason = None
+        if not isinstance(name, str) or not name.strip() or len(name) > MAX_SIZE_NAME:
+            reason = f"Invalid category name ({MAX_SIZE_NAME} characters maximum)"
+        elif temp_id is None:
+            reason = "Missing temp_id"
+        elif temp_id in temp_ids:
+            reason = "Duplicate temp_id"
+        elif name.casefold() in names:
+            reason = "Duplicate category name"
+        if reason:
+            skipped.append({"index": index, "name": name, "reason": reason})
+        else:
+            temp_ids.add(temp_id)
+            names.add(name.casefold())
+    return temp_ids, skipped
+
+
+def _plan_items(items, temp_ids):
+    """Return (imported count, skipped) for the items of one container"""
+    skipped = []
+    total = 0
+    for index, item in enumerate(items):
+        total += 1
+        if not isinstance(item, dict):
+            skipped.append({"index": index, "name": None, "reason": "Item must be an object"})
+            continue
+        if item.get("category_temp_id") not in temp_ids:
+            reason = "Unknown category"
+        else:
+            reason = validate_item_data({**item, "name": item.get("name") or ""})
+        if reason:
+            skipped.append({"index": index, "name": item.get("name"), "reason": reason})
+    return total - len(skipped), skipped
+
+
+def _stream_containers(reader):
+    for _ in reader.elements():
+        if reader.peek() != "{":
+            yield reader.value()
+            continue
+        container = {}
+        fields = reader.fields()
+        for key in fields:
+            if key == "items" and "name" in container and "categories" in container and reader.peek() == "[":
+                # Exports write the items last: stream them, whatever the caller did not read is skipped
+                items = (reader.value() for _ in reader.elements())
+                container["items"] = items
+                yield container
+                for _ in items:
+                    pass
+                container = None
+            elif container is not None:
+                container[key] = reader.value()
+            else:
+                reader.value()
+        if container is not None:
+            yield container
+
+
+def read_export(fileobj):
+    """Return (header, containers) of an export file, read incrementally
+
+    The header holds the fields written before `containers`. Containers are
+    decoded one at a time when iterated, and the items of a container (written
+    after its name and categories) one at a time when its `items` is iterated:
+    memory does not grow with the size of the file. Each container must be used
+    before the next one is read.
+    """
+    reader = jsonstream.Reader(fileobj)
+    header = {}
+    for key in reader.fields():
+        if key == "containers":
+            return header, _stream_containers(reader)
+        header[key] = reader.value()
+    return header, iter(())
+
+
+def plan_import(import_data, user_id, conflict_strategy="rename"):
+    """Resolve every container name and validate every category and item, without writing
+
+    The user's container names are read once and conflicts are resolved in memory,
+    including conflicts between containers of the same file. The plan is JSON ready
+    and `apply_import` writes it as is. `containers` may also be an iterator (see
+    `read_export`).
+    """
+    if conflict_strategy not in CONFLICT_STRATEGIES:
+        raise ValueError(f"Invalid conflict strategy, expected one of: {', '.join(CONFLICT_STRATEGIES)}")
+    containers = import_data.get("containers", [])
+    if not isinstance(containers, (list, Iterator)):
+        raise ValueError("containers must be a list")
+
+    # Only containers the user administers can be replaced (`admin_id` is the creator, not an access right)
+    existing = {
+        container["name"]: str(container["_id"])
+        for container in db.containers.find({"_id": {"$in": memberships.admin_container_ids(user_id)}}, {"name": 1})
+    }
+    # Name -> index of the container of this file planned under that name
+    planned = {}
+    entries = []
+
+    for index, container_data in enumerate(containers):
+        source_name = container_data.get("name") if isinstance(container_data, dict) else None
+        entry = {
+            "index": index,
+            "source_name": source_name,
+            "name": source_name,
+            "action": "create",
+            "conflicts_with": existing.get(source_name),
+            "replaces": None,
+            "categories": 0,
+            "items": 0,
+            "skipped_categories": [],
+            "skipped_items": [],
+        }
+        entries.append(entry)
+        if not isinstance(source_name, str) or not source_name.strip() or len(source_name) > MAX_SIZE_NAME:
+            entry.update(action="skip", reason=f"Invalid container name ({MAX_SIZE_NAME} characters maximum)")
+            continue
+
+        taken = source_name in existing or source_name in planned
+        if taken and conflict_strategy == "skip":
+            entry.update(action="skip", reason="A container with this name already exists")
+            continue
+        if taken and conflict_strategy == "rename":
+            entry.update(action="rename", name=_free_name(source_name, existing.keys() | planned.keys()))
+        elif taken and conflict_strategy == "replace":
+            if source_name in planned:
+                # Only the last container of the file with this name survives, do not write the others
+                previous = entries[planned[source_name]]
+                entry["replaces"] = previous["replaces"]
+                previous.update(action="skip", replaces=None, reason="Replaced by a later container of the file")
+            else:
+                entry["replaces"] = existing[source_name]
+            if entry["replaces"]:
+                entry["action"] = "replace"
+        planned[entry["name"]] = index
+
+        temp_ids, entry["skipped_categories"] = _plan_categories(container_data.get("categories", []))
+        entry["categories"] = len(temp_ids)
+        entry["items"], entry["skipped_items"] = _plan_items(container_data.get("items", []), temp_ids)
+
+    summary = {action: 0 for action in ("create", "rename", "replace", "skip")}
+    for entry in entries:
+        summary[entry["action"]] += 1
+    written = [entry for entry in entries if entry["action"] != "skip"]
+    summary["categories"] = sum(entry["categories"] for entry in written)
+    summary["items"] = sum(entry["items"] for entry in written)
+    summary["skipped_items"] = sum(len(entry["skipped_items"]) for entry in written)
+
+    return {"conflict_strategy": conflict_strategy, "containers": entries, "summary": summary}
+
+
+def apply_import(import_data, plan, user_id, username, detect_duplicates=False, batch_size=IMPORT_WRITE_BATCH):
+    """Write a plan returned by `plan_import`, returns the imported containers
+
+    Documents are written in batches with the bulk write concern, the import
+    returns once a final checkpoint is acknowledged by the majority.
+    """
+    imported_containers = []
+
+    # Apply the plan: names are already resolved, invalid categories and items are skipped
+    for container_data, entry in zip(import_data["containers"], plan["containers"]):
+        if entry["action"] == "skip":
+            continue
+        container_name = entry["name"]
+        skipped_categories = {skipped["index"] for skipped in entry["skipped_categories"]}
+        skipped_items = {skipped["index"] for skipped in entry["skipped_items"]}
+
+        # Index the items of the container being imported again, before a replace deletes it
+        duplicate_index, known_items = DuplicateIndex(), {}
+        if detect_duplicates and entry["conflicts_with"]:
+            duplicate_index, known_items = load_index(db, ObjectId(entry["conflicts_with"]), {"name": 1})
+        possible_duplicates = []
+        imported_keys = set()
+
+        if entry["action"] == "replace":
+            # Delete existing container and all its data
+            existing_id = ObjectId(entry["replaces"])
+            bulk_db.items.delete_many({"container_id": existing_id})
+            bulk_db.categories.delete_many({"container_id": existing_id})
+            bulk_db.containers.delete_one({"_id": existing_id})
+            memberships.remove_container(existing_id, bulk_db)
+            category_cache.container_removed(existing_id)
+            changes.record_deletion("container", existing_id, existing_id)
+
+        # Create new container
+        new_container = {
+            "name": container_name,
+            "admin_id": user_id,
+            "admin_count": 1,
+        }
+        container_result = bulk_db.containers.insert_one(new_container)
+        new_container_id = container_result.inserted_id
+        bulk_db.memberships.insert_one(memberships.membership(new_container_id, user_id, memberships.ADMIN))
+
+        # Map temp_id to real ObjectId for categories
+        category_id_map = {}
+        category_names = {}
+
+        # Import categories
+        new_categories = []
+        for position, category_data in enumerate(container_data.get("categories", [])):
+            if position in skipped_categories:
+                continue
+            new_category = {
+                "_id": ObjectId(),
+                "name": category_data["name"],
+                "container_id": new_container_id,
+                "updated_at": changes.now()
+            }
+            new_categories.append(new_category)
+            category_id_map[category_data["temp_id"]] = new_category["_id"]
+            category_names[new_category["_id"]] = category_data["name"]
+        if new_categories:
+            bulk_db.categories.insert_many(new_categories)
+        category_cache.container_loaded(new_container_id, category_names)
+
+        # Import items
+        pending_items = []
+        invalid_images = []
+        for position, item_data in enumerate(container_data.get("items", [])):
+            if position in skipped_items:
+                continue
+            category_id = category_id_map[item_data["category_temp_id"]]
+
+            # Handle image import: an unavailable image pool fails the import (it can be run again),
+            # an invalid image is reported and the item kept without it (its image_path names a
+            # file of the exporting server)
+            image_path, image_hash = None, None
+            if item_data.get("image_data"):
+                try:
+                    image_path, image_hash = images.save(base64.b64decode(item_data["image_data"]))
+                except ValueError as e:
+                    invalid_images.append({"index": position, "name": item_data.get("name"), "error": str(e)})
+                    image_path = "not-image.png"
+            else:
+                image_path = item_data.get("image_path", "not-image.png")
+
+            # Create new item
+            new_item = {
+                "_id": ObjectId(),
+                "container_id": new_container_id,
+                "category_id": category_id,
+                "name": item_data.get("name"),
+                "owner": item_data.get("owner"),
+                "serie": item_data.get("serie", ""),
+                "description": item_data.get("description", ""),
+                "value": item_data.get("value", 0.0),
+                "date_created": item_data.get("date_created", ""),
+                "date_added": datetime.datetime.now(datetime.timezone.utc),
+                "location": item_data.get("location", ""),
+                "creator": username,
+                "tags": item_data.get("tags", []),
+                "image_path": image_path,
+                "comment": item_data.get("comment", ""),
+                "condition": item_data.get("condition", ""),
+                "number": item_data.get("number", 1),
+                "edition": item_data.get("edition", "")
+            }
+            new_item["updated_at"] = new_item["date_added"]
+            new_item.update(search_fields(new_item))
+            new_item.update(dedup_fields(new_item))
+            new_item.update(image_hash_fields(image_hash))
+            pending_items.append(new_item)
+            if len(pending_items) >= batch_size:
+                bulk_db.items.insert_many(pending_items, ordered=False)
+                pending_items = []
+
+            if detect_duplicates and new_item.get("dedup_sig"):
+                sig, size = new_item["dedup_sig"], new_item["dedup_size"]
+                matches = duplicate_index.matches(sig, size)
+                if matches:
+                    possible_duplicates.append({
+                        "name": new_item["name"],
+                        "id": str(new_item["_id"]),
+                        "similar_to": [
+                            {"name": known_items[key]["name"], "existing": key not in imported_keys, "jaccard": round(jaccard, 2)}
+                            for key, jaccard, _ in matches
+                        ]
+                    })
+                key = ("import", position)
+                known_items[key] = {"name": new_item["name"]}
+                imported_keys.add(key)
+                duplicate_index.add(key, sig, size)
+        if pending_items:
+            bulk_db.items.insert_many(pending_items, ordered=False)
+
+        imported_container = {
+            "name": container_name,
+            "id": str(new_container_id),
+            "categories_count": entry["categories"],
+            "items_count": entry["items"],
+            "skipped_items": len(skipped_items),
+            "invalid_images": invalid_images
+        }
+        if detect_duplicates:
+            imported_container["possible_duplicates"] = possible_duplicates
+        imported_containers.append(imported_container)
+
+    checkpoint("import")
+    return imported_containers
@@ -0,0 +1,95 @@
+import io
+import json
+
+# Incremental JSON reading for files too large to load at once: the caller walks
+# objects and arrays with `fields()` / `elements()` and decodes the values it
+# needs with `value()`. Only the value being decoded is held in memory.
+READ_SIZE = 64 * 1024
+WHITESPACE = " \t\n\r"
+DELIMITERS = WHITESPACE + ",]}:"
+_decoder = json.JSONDecoder()
+
+
+class Reader:
+    def __init__(self, fileobj, read_size=READ_SIZE):
+        self._stream = io.TextIOWrapper(fileobj, encoding="utf-8")
+        self._read_size = read_size
+        self._buffer = ""
+        self._position = 0
+        self._eof = False
+
+    def _fill(self, size):
+        data = self._stream.read(size)
+        if not data:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._position:] + data
+        self._position = 0
+        return True
+
+    def peek(self):
+        """Next significant character"""
+        while True:
+            while self._position < len(self._buffer) and self._buffer[self._position] in WHITESPACE:
+                self._position += 1
+            if self._position < len(self._buffer):
+                return self._buffer[self._position]
+            if not self._fill(self._read_size):
+                raise ValueError("Invalid JSON file: unexpected end of file")
+
+    def _expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Invalid JSON file: expected '{char}'")
+        self._position += 1
+
+    def value(self):
+        """Decode the next value"""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self._buffer, self._position)
+                # A number cut by the end of the buffer ("1." or "12e") may continue in the next read
+                if self._eof or end < len(self._buffer) and self._buffer[end] in DELIMITERS:
+                    self._position = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise ValueError("Invalid JSON file") from None
+            # Read as much again as buffered: a large value is decoded a bounded number of times
+            self._fill(max(self._read_size, len(self._buffer) - self._position))
+
+    def _separator(self, closing):
+        """True after ',', False after the closing character"""
+        char = self.peek()
+        self._position += 1
+        if char == closing:
+            return False
+        if char != ",":
+            raise ValueError(f"Invalid JSON file: expected ',' or '{closing}'")
+        return True
+
+    def elements(self):
+        """Walk an array: the caller reads each element (with `value()`, or walking it) before the next step"""
+        self._expect("[")
+        if self.peek() == "]":
+            self._position += 1
+            return
+        while True:
+            yield
+            if not self._separator("]"):
+                return
+
+    def fields(self):
+        """Walk an object, yields the keys: the caller reads each value before the next step"""
+        self._expect("{")
+        if self.peek() == "}":
+            self._position += 1
+            return
+        while True:
+            key = self.value()
+            if not isinstance(key, str):
+                raise ValueError("Invalid JSON file: object keys must be strings")
+            self._expect(":")
+            yield key
+            if not self._separator("}"):
+                return
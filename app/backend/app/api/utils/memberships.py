@@ -0,0 +1,161 @@
+import datetime
+from itertools import islice
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from app.db import db
+
+# One document per (user, container) in the `memberships` collection. Access checks
+# only read the (user_id, container_id) index, member listings use the
+# (container_id, role) index: container documents stay small whatever the number
+# of members. Containers keep an `admin_count`, decremented (conditionally) before
+# an admin is demoted or removed so that a container never loses its last admin.
+ADMIN = "admin"
+MEMBER = "member"
+ROLES = (ADMIN, MEMBER)
+
+
+def membership(container_id, user_id, role=MEMBER):
+    return {
+        "user_id": user_id,
+        "container_id": container_id,
+        "role": role,
+        "added_at": datetime.datetime.now(datetime.timezone.utc),
+    }
+
+
+def has_access(container_id, user_id, roles=None):
+    """The user is a member of the container (with one of `roles` when given)"""
+    query = {"user_id": user_id, "container_id": container_id}
+    if roles:
+        query["role"] = {"$in": list(roles)}
+    # Without roles the projection only holds indexed fields: covered by the index
+    return db.memberships.find_one(query, {"_id": 0, "container_id": 1}) is not None
+
+
+def user_roles(user_id, database=db):
+    """{container_id: role} of the containers of a user"""
+    return {
+        entry["container_id"]: entry["role"]
+        for entry in database.memberships.find({"user_id": user_id}, {"_id": 0, "container_id": 1, "role": 1})
+    }
+
+
+def admin_container_ids(user_id, database=db):
+    """Containers the user administers (replaced by imports, cleared by benchmarks)"""
+    return [
+        entry["container_id"]
+        for entry in database.memberships.find({"user_id": user_id, "role": ADMIN}, {"_id": 0, "container_id": 1})
+    ]
+
+
+def add(container_id, user_id, role=MEMBER):
+    """Add a member, raises DuplicateKeyError when the user already is one"""
+    db.memberships.insert_one(membership(container_id, user_id, role))
+    if role == ADMIN:
+        db.containers.update_one({"_id": container_id}, {"$inc": {"admin_count": 1}})
+
+
+def _release_admin(container_id):
+    """Take one admin off the count unless it is the last one"""
+    return db.containers.update_one(
+        {"_id": container_id, "admin_count": {"$gt": 1}},
+        {"$inc": {"admin_count": -1}}
+    ).modified_count == 1
+
+
+def promote(container_id, user_id):
+    if db.memberships.update_one(
+        {"user_id": user_id, "container_id": container_id, "role": MEMBER},
+        {"$set": {"role": ADMIN}}
+    ).modified_count:
+        db.containers.update_one({"_id": container_id}, {"$inc": {"admin_count": 1}})
+
+
+def demote(container_id, user_id):
+    """Make an admin a member, returns False when it is the last admin"""
+    if not _release_admin(container_id):
+        return False
+    if not db.memberships.update_one(
+        {"user_id": user_id, "container_id": container_id, "role": ADMIN},
+        {"$set": {"role": MEMBER}}
+    ).modified_count:
+        # Demoted or removed in the meantime: give the count back
+        db.containers.update_one({"_id": container_id}, {"$inc": {"admin_count": 1}})
+    return True
+
+
+def remove(container_id, user_id):
+    """Remove a member, returns False when it is the last admin, None when not a member"""
+    query = {"user_id": user_id, "container_id": container_id}
+    if db.memberships.delete_one({**query, "role": MEMBER}).deleted_count:
+        return True
+    if not db.memberships.find_one({**query, "role": ADMIN}, {"_id": 0, "container_id": 1}):
+        return None
+    if not _release_admin(container_id):
+        return False
+    if not db.memberships.delete_one({**query, "role": ADMIN}).deleted_count:
+        db.containers.update_one({"_id": container_id}, {"$inc": {"admin_count": 1}})
+        return None
+    return True
+
+
+def remove_container(container_id, database=db):
+    database.memberships.delete_many({"container_id": container_id})
+
+
+def _upsert(database, operations):
+    try:
+        return database.memberships.bulk_write(operations, ordered=False).upserted_count
+    except BulkWriteError as error:
+        # Another process migrating at the same time inserted some memberships first
+        if any(write_error["code"] != 11000 for write_error in error.details["writeErrors"]):
+            raise
+        return error.details["nUpserted"]
+
+
+def migrate(database, batch_size=1000):
+    """Move the `member_ids` of containers written before the memberships collection
+
+    `admin_id` (the creator) becomes admin, other members member, and the
+    `admin_count` of the container is set. Existing memberships are kept.
+    Returns (migrated containers, created memberships).
+    """
+    migrated = created = 0
+    cursor = database.containers.find(
+        {"$or": [{"member_ids": {"$exists": True}}, {"admin_count": {"$exists": False}}]},
+        {"admin_id": 1, "member_ids": 1}
+    )
+    while batch := list(islice(cursor, batch_size)):
+        operations = []
+        for container in batch:
+            roles = {user_id: MEMBER for user_id in container.get("member_ids") or []}
+            if container.get("admin_id"):
+                roles[container["admin_id"]] = ADMIN
+            operations += [
+                UpdateOne(
+                    {"user_id": user_id, "container_id": container["_id"]},
+                    {"$setOnInsert": membership(container["_id"], user_id, role)},
+                    upsert=True
+                )
+                for user_id, role in roles.items()
+            ]
+        if operations:
+            created += _upsert(database, operations)
+
+        container_ids = [container["_id"] for container in batch]
+        admin_counts = {
+            count["_id"]: count["admins"]
+            for count in database.memberships.aggregate([
+                {"$match": {"container_id": {"$in": container_ids}, "role": ADMIN}},
+                {"$group": {"_id": "$container_id", "admins": {"$sum": 1}}},
+            ])
+        }
+        # Left for the next run when `member_ids` changed since it was read
+        migrated += database.containers.bulk_write([
+            UpdateOne(
+                {"_id": container["_id"], "member_ids": container.get("member_ids")},
+                {"$set": {"admin_count": admin_counts.get(container["_id"], 0)}, "$unset": {"member_ids": ""}}
+            )
+            for container in batch
+        ], ordered=False).modified_count
+    return migrated, created
@@ -0,0 +1,70 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app.extensions import bcrypt
+from app.metrics import LOGIN_HASH_DURATION, LOGIN_HASH_REJECTED, LOGIN_HASH_IN_FLIGHT
+
+
+# Hashing pool: bcrypt releases the GIL, so a few threads keep the cores busy while
+# the admission semaphore bounds how many logins may be hashing or waiting at once.
+HASH_WORKERS = int(os.getenv("LOGIN_HASH_WORKERS", 2))
+HASH_QUEUE = int(os.getenv("LOGIN_HASH_QUEUE", 8))
+HASH_ADMISSION_TIMEOUT = float(os.getenv("LOGIN_HASH_ADMISSION_TIMEOUT", 0.1))
+
+_pool = None
+_pool_pid = None
+_slots = threading.BoundedSemaphore(HASH_WORKERS + HASH_QUEUE)
+_lock = threading.Lock()
+
+
+class HashingBusy(Exception):
+    """Every hashing slot is taken, the login should be retried later"""
+
+
+def _get_pool():
+    """Per-process executor (threads do not survive a fork)"""
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _lock:
+            if _pool is None or _pool_pid != pid:
+                _pool = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="login-hash")
+                _pool_pid = pid
+    return _pool
+
+
+def _gevent_threadpool():
+    """gevent hub threadpool when the worker is monkey patched, else None"""
+    try:
+        from gevent import monkey, get_hub
+    except ImportError:
+        return None
+    if monkey.is_module_patched("threading"):
+        return get_hub().threadpool
+    return None
+
+
+def _timed_check(pw_hash, password):
+    start = time.perf_counter()
+    try:
+        return bcrypt.check_password_hash(pw_hash=pw_hash, password=password)
+    finally:
+        LOGIN_HASH_DURATION.observe(time.perf_counter() - start)
+
+
+def check_password(pw_hash, password):
+    """Verify a bcrypt hash off the request thread, raises HashingBusy when saturated"""
+    if not _slots.acquire(timeout=HASH_ADMISSION_TIMEOUT):
+        LOGIN_HASH_REJECTED.inc()
+        raise HashingBusy()
+    LOGIN_HASH_IN_FLIGHT.inc()
+    try:
+        threadpool = _gevent_threadpool()
+        if threadpool is not None:
+            # Real OS thread, the greenlet yields to the hub while waiting
+            return threadpool.apply(_timed_check, (pw_hash, password))
+        return _get_pool().submit(_timed_check, pw_hash, password).result()
+    finally:
+        LOGIN_HASH_IN_FLIGHT.dec()
+        _slots.release()
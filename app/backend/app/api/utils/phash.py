@@ -0,0 +1,92 @@
+from collections import defaultdict
+
+# 64-bit difference hash of the stored image (computed in app.api.utils.images).
+# The hash is split in 4 bands of 16 bits stored as "<band>:<hex>": two hashes at
+# a Hamming distance d share a band within d // 4 bits (pigeonhole), so candidates
+# are found by probing the band values within that radius on a multikey index
+# (multi-index hashing) instead of comparing every pair of images of a container.
+HASH_BITS = 64
+BANDS = 4
+BAND_BITS = HASH_BITS // BANDS
+BAND_MASK = (1 << BAND_BITS) - 1
+DEFAULT_MAX_DISTANCE = 6
+MAX_DISTANCE = 11  # Probing radius 2: 137 values per band
+NO_IMAGE = ("", "not-image.png", None)
+
+
+def distance(hash_a, hash_b):
+    return (int(hash_a, 16) ^ int(hash_b, 16)).bit_count()
+
+
+def _band_key(band, value):
+    return f"{band}:{value:04x}"
+
+
+def band_keys(image_hash):
+    value = int(image_hash, 16)
+    return [_band_key(band, (value >> (band * BAND_BITS)) & BAND_MASK) for band in range(BANDS)]
+
+
+def _flips(value, radius, start=0):
+    """Band values within `radius` flipped bits of `value`"""
+    yield value
+    if radius:
+        for bit in range(start, BAND_BITS):
+            yield from _flips(value ^ (1 << bit), radius - 1, bit + 1)
+
+
+def probe_keys(image_hash, max_distance=DEFAULT_MAX_DISTANCE):
+    """Band keys shared with every hash within `max_distance`"""
+    value = int(image_hash, 16)
+    radius = max_distance // BANDS
+    return [
+        _band_key(band, probe)
+        for band in range(BANDS)
+        for probe in _flips((value >> (band * BAND_BITS)) & BAND_MASK, radius)
+    ]
+
+
+def image_hash_fields(image_hash):
+    """Hash fields to store on an item document when its image changes (None when it could not be hashed)"""
+    if not image_hash:
+        return {"image_hash": None, "image_hash_bands": []}
+    return {"image_hash": image_hash, "image_hash_bands": band_keys(image_hash)}
+
+
+def similar_items(db, container_id, image_hash, max_distance=DEFAULT_MAX_DISTANCE, projection=None, exclude=None):
+    """Items of a container whose image is within `max_distance`, returns [(item, distance)] closest first"""
+    fields = {"image_hash": 1, **(projection or {})}
+    query = {"container_id": container_id, "image_hash_bands": {"$in": probe_keys(image_hash, max_distance)}}
+    if exclude is not None:
+        query["_id"] = {"$ne": exclude}
+    results = []
+    for item in db.items.find(query, fields):
+        item_distance = distance(image_hash, item.pop("image_hash"))
+        if item_distance <= max_distance:
+            results.append((item, item_distance))
+    return sorted(results, key=lambda result: result[1])
+
+
+def similar_pairs(db, container_id, max_distance=DEFAULT_MAX_DISTANCE, projection=None):
+    """Pairs of items of a container with similar images, returns ([(key_a, key_b, distance)], {item_id: item})"""
+    fields = {"image_hash": 1, "image_hash_bands": 1, **(projection or {})}
+    buckets = defaultdict(list)
+    hashes = {}
+    items = {}
+    for item in db.items.find({"container_id": container_id, "image_hash_bands.0": {"$exists": True}}, fields):
+        hashes[item["_id"]] = item.pop("image_hash")
+        for key in item.pop("image_hash_bands"):
+            buckets[key].append(item["_id"])
+        items[item["_id"]] = item
+
+    pairs = {}
+    for key, image_hash in hashes.items():
+        for probe in probe_keys(image_hash, max_distance):
+            for other in buckets.get(probe, ()):
+                pair = (key, other) if str(key) < str(other) else (other, key)
+                if other == key or pair in pairs:
+                    continue
+                pair_distance = distance(image_hash, hashes[other])
+                pairs[pair] = pair_distance if pair_distance <= max_distance else None
+    return sorted(((*pair, d) for pair, d in pairs.items() if d is not None), key=lambda pair: pair[2]), items
+
@@ -0,0 +1,50 @@
+import contextvars
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Shared I/O pool of the export (container reads and image read + base64 encoding
+# overlap with the streaming of the response) and of gallery thumbnail reads. File reads and MongoDB calls release
+# the GIL, so a few threads are enough to keep the disk busy.
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", 4))
+EXPORT_WINDOW = int(os.getenv("EXPORT_WINDOW", 16))
+
+_pool = None
+_pool_pid = None
+_lock = threading.Lock()
+
+
+def get_pool():
+    """Per-process executor (threads do not survive a fork)"""
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _lock:
+            if _pool is None or _pool_pid != pid:
+                _pool = ThreadPoolExecutor(max_workers=EXPORT_WORKERS, thread_name_prefix="export")
+                _pool_pid = pid
+    return _pool
+
+
+def ordered_map(fn, iterable, window=EXPORT_WINDOW):
+    """Like map(), running `fn` in the pool with at most `window` calls ahead of the consumer
+
+    Results are yielded in input order. Pending calls are cancelled when the
+    consumer stops early (client disconnected). Each call runs in a copy of the
+    consumer's context, so its MongoDB commands count for the request (metrics,
+    query budget).
+    """
+    pool = get_pool()
+    pending = deque()
+    try:
+        for value in iterable:
+            pending.append(pool.submit(contextvars.copy_context().run, fn, value))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
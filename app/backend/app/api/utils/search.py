@@ -0,0 +1,25 @@
+import unicodedata
+
+# Fields indexed for prefix (typeahead) search, stored normalized next to the original
+SEARCH_FIELDS = {"name": "name_norm", "serie": "serie_norm"}
+
+# Derived fields kept out of API responses
+INTERNAL_ITEM_PROJECTION = {"name_norm": 0, "serie_norm": 0, "dedup_sig": 0, "dedup_size": 0, "image_hash_bands": 0}
+
+
+def normalize_text(value):
+    """Case-folded, accent-free, single-spaced form of a text used for prefix search"""
+    if not value:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", str(value))
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.casefold().split())
+
+
+def search_fields(item):
+    """Normalized fields to store on an item document (only for the fields present)"""
+    return {
+        norm_field: normalize_text(item.get(field))
+        for field, norm_field in SEARCH_FIELDS.items()
+        if field in item and item.get(field) is not None
+    }
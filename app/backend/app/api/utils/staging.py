@@ -0,0 +1,218 @@
+import datetime
+import hashlib
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pymongo import ReturnDocument
+from app.db import db
+from app.compression import decompressing_reader
+from app.utils import STAGING_FOLDER
+from app.api.utils.importer import read_export, plan_import, apply_import, EXPORT_VERSION
+
+
+# Resumable import uploads: chunks are staged as <STAGING_FOLDER>/<upload_id>/<index>.part,
+# state lives in the `import_uploads` collection (TTL index on expires_at) so any
+# worker of the host can receive a chunk or report the status.
+CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", 8 * 1024 * 1024))
+MAX_IMPORT_SIZE = int(os.getenv("IMPORT_MAX_SIZE", 10 * 1024 * 1024 * 1024))
+UPLOAD_TTL_HOURS = float(os.getenv("IMPORT_UPLOAD_TTL_HOURS", 24))
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", 1))
+# A running import refreshes heartbeat_at, an import without heartbeat for
+# IMPORT_STALE_SECONDS (worker killed or restarted) is reported as failed
+HEARTBEAT_SECONDS = 30
+STALE_SECONDS = float(os.getenv("IMPORT_STALE_SECONDS", 300))
+ASSEMBLED_NAME = "upload"
+COPY_BUFFER = 1024 * 1024
+
+_pool = None
+_pool_pid = None
+_lock = threading.Lock()
+
+
+class ChecksumMismatch(Exception):
+    """The assembled file does not match the size or sha256 declared at init"""
+
+
+def _get_pool():
+    """Per-process executor running the imports of finalized uploads"""
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _lock:
+            if _pool is None or _pool_pid != pid:
+                _pool = ThreadPoolExecutor(max_workers=IMPORT_WORKERS, thread_name_prefix="import")
+                _pool_pid = pid
+    return _pool
+
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def expires_at():
+    return _now() + datetime.timedelta(hours=UPLOAD_TTL_HOURS)
+
+
+def fail_stale(upload):
+    """Mark an import whose worker stopped as failed, returns the current upload document"""
+    if upload["status"] != "importing":
+        return upload
+    failed = db.import_uploads.find_one_and_update(
+        {
+            "_id": upload["_id"],
+            "status": "importing",
+            "heartbeat_at": {"$not": {"$gte": _now() - datetime.timedelta(seconds=STALE_SECONDS)}},
+        },
+        {"$set": {"status": "failed", "error": "Import interrupted, finalize the upload again"}},
+        return_document=ReturnDocument.AFTER
+    )
+    return failed or upload
+
+
+def _heartbeat(upload_id, stop):
+    while not stop.wait(HEARTBEAT_SECONDS):
+        try:
+            db.import_uploads.update_one(
+                {"_id": upload_id, "status": "importing"},
+                {"$set": {"heartbeat_at": _now(), "expires_at": expires_at()}}
+            )
+        except Exception as e:
+            print(f"Import heartbeat error for upload {upload_id}: {e}")
+
+
+def upload_dir(upload_id):
+    return STAGING_FOLDER / str(upload_id)
+
+
+def expected_chunk_size(upload, index):
+    if index == upload["total_chunks"] - 1:
+        return upload["size"] - upload["chunk_size"] * index
+    return upload["chunk_size"]
+
+
+def received_chunks(upload):
+    """Indexes of the chunks already staged"""
+    folder = upload_dir(upload["_id"])
+    if not folder.is_dir():
+        return set()
+    return {int(name[:-len(".part")]) for name in os.listdir(folder) if name.endswith(".part")}
+
+
+def missing_chunks(upload):
+    if (upload_dir(upload["_id"]) / ASSEMBLED_NAME).is_file():
+        return []
+    received = received_chunks(upload)
+    return [index for index in range(upload["total_chunks"]) if index not in received]
+
+
+def write_chunk(upload, index, stream, sha256=None):
+    """Stage one chunk atomically (a retried chunk replaces the previous copy)"""
+    folder = upload_dir(upload["_id"])
+    folder.mkdir(parents=True, exist_ok=True)
+    tmp_path = folder / f"{index}.tmp"
+    digest = hashlib.sha256()
+    written = 0
+    with open(tmp_path, "wb") as f:
+        while True:
+            block = stream.read(COPY_BUFFER)
+            if not block:
+                break
+            digest.update(block)
+            f.write(block)
+            written += len(block)
+    if written != expected_chunk_size(upload, index):
+        tmp_path.unlink()
+        raise ChecksumMismatch(f"Chunk {index} has {written} bytes, expected {expected_chunk_size(upload, index)}")
+    if sha256 and digest.hexdigest() != sha256.lower():
+        tmp_path.unlink()
+        raise ChecksumMismatch(f"Chunk {index} sha256 mismatch")
+    os.replace(tmp_path, folder / f"{index}.part")
+
+
+def assemble(upload):
+    """Concatenate the chunks into one file, verifying the declared size and sha256"""
+    folder = upload_dir(upload["_id"])
+    path = folder / ASSEMBLED_NAME
+    if path.is_file():
+        return path
+    digest = hashlib.sha256()
+    tmp_path = folder / (ASSEMBLED_NAME + ".tmp")
+    with open(tmp_path, "wb") as out:
+        for index in range(upload["total_chunks"]):
+            with open(folder / f"{index}.part", "rb") as part:
+                while block := part.read(COPY_BUFFER):
+                    digest.update(block)
+                    out.write(block)
+    if tmp_path.stat().st_size != upload["size"] or digest.hexdigest() != upload["sha256"]:
+        tmp_path.unlink()
+        raise ChecksumMismatch("Assembled file does not match the declared size and sha256")
+    os.replace(tmp_path, path)
+    for index in range(upload["total_chunks"]):
+        (folder / f"{index}.part").unlink(missing_ok=True)
+    return path
+
+
+def remove(upload_id):
+    shutil.rmtree(upload_dir(upload_id), ignore_errors=True)
+    db.import_uploads.delete_one({"_id": upload_id})
+
+
+def purge_expired():
+    """Delete staging folders left by abandoned uploads (their document already expired)"""
+    if not STAGING_FOLDER.is_dir():
+        return
+    cutoff = time.time() - UPLOAD_TTL_HOURS * 3600
+    with os.scandir(STAGING_FOLDER) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False) and entry.stat().st_mtime < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def _run_import(upload, username, options):
+    """Assemble the chunks, then plan and apply the file, each pass streaming it (see `read_export`)"""
+    upload_id = upload["_id"]
+    stop = threading.Event()
+    threading.Thread(target=_heartbeat, args=(upload_id, stop), name=f"import-heartbeat-{upload_id}", daemon=True).start()
+    try:
+        # Hashing a file of several GB outlasts a request: done here, under the heartbeat
+        path = assemble(upload)
+        with open(path, "rb") as f:
+            header, containers = read_export(decompressing_reader(f))
+            if header.get("version") != EXPORT_VERSION:
+                raise ValueError(f"Unsupported export version. Expected {EXPORT_VERSION}")
+            plan = plan_import({"containers": containers}, upload["user_id"], options["conflict_strategy"])
+        if options["dry_run"]:
+            # Keep the staged file: the same upload can be finalized again for real
+            db.import_uploads.update_one({"_id": upload_id}, {"$set": {"status": "planned", "result": plan}})
+            return
+        with open(path, "rb") as f:
+            _, containers = read_export(decompressing_reader(f))
+            imported = apply_import({"containers": containers}, plan, upload["user_id"], username, options["detect_duplicates"])
+        db.import_uploads.update_one(
+            {"_id": upload_id},
+            {"$set": {"status": "done", "result": {"imported_containers": imported}}}
+        )
+        shutil.rmtree(upload_dir(upload_id), ignore_errors=True)
+    except Exception as e:
+        print(f"Import error for upload {upload_id}: {e}")
+        db.import_uploads.update_one({"_id": upload_id}, {"$set": {"status": "failed", "error": str(e)}})
+    finally:
+        stop.set()
+
+
+def start_import(upload, username, options):
+    """Run the import in the background, a file not matching its sha256 fails it
+
+    Returns False when another request already finalized this upload.
+    """
+    claimed = db.import_uploads.update_one(
+        {"_id": upload["_id"], "status": {"$in": ["uploading", "planned", "failed"]}},
+        {"$set": {"status": "importing", "options": options, "expires_at": expires_at(), "heartbeat_at": _now()},
+         "$unset": {"result": "", "error": ""}}
+    )
+    if not claimed.modified_count:
+        return False
+    _get_pool().submit(_run_import, upload, username, options)
+    return True
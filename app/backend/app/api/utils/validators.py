@@ -7,7 +7,10 @@ KEY_SIZE_CHECKS = ['owner', 'name', 'serie', 'description', 'location', 'tags',
 def validate_item_data(data):
     """Validate item data fields - returns error message or None"""
     # Validate name specifically
-    item_name = data.get('name', '').strip()
+    item_name = data.get('name', '')
+    if not isinstance(item_name, str):
+        return "Item name must be a string"
+    item_name = item_name.strip()
     if not item_name or len(item_name) > MAX_SIZE_NAME:
         return f"Invalid item name length ({MAX_SIZE_NAME} characters maximum)"
     
@@ -0,0 +1,99 @@
+"""Backfill derived fields for documents written before they existed
+
+    python -m app.backfill {search,dedup,image_hash,memberships} [--all] [--batch-size 1000]
+"""
+import json
+from argparse import ArgumentParser
+from itertools import islice
+from pymongo import UpdateOne
+from app.db import db, bulk_db, checkpoint
+from app.api.utils import images, memberships
+from app.api.utils.search import search_fields, SEARCH_FIELDS
+from app.api.utils.dedup import dedup_fields, DEDUP_FIELDS
+from app.api.utils.phash import image_hash_fields, NO_IMAGE
+
+
+def backfill(name, mongo_filter, projection, compute, batch_size=1000):
+    """Apply `compute(item) -> {field: value}` to matching items in bulk batches (bulk write concern)"""
+    updated = 0
+    operations = []
+    for item in db.items.find(mongo_filter, projection):
+        fields = compute(item)
+        if fields:
+            operations.append(UpdateOne({"_id": item["_id"]}, {"$set": fields}))
+        if len(operations) >= batch_size:
+            updated += bulk_db.items.bulk_write(operations, ordered=False).modified_count
+            operations = []
+    if operations:
+        updated += bulk_db.items.bulk_write(operations, ordered=False).modified_count
+    checkpoint(f"backfill_{name}")
+    return {"backfill": name, "updated": updated}
+
+
+def backfill_search(all_items=False, batch_size=1000):
+    """Normalized name / serie used by the typeahead search"""
+    mongo_filter = {} if all_items else {"name_norm": {"$exists": False}}
+    projection = {field: 1 for field in SEARCH_FIELDS}
+    return backfill("search", mongo_filter, projection, search_fields, batch_size)
+
+
+def backfill_dedup(all_items=False, batch_size=1000):
+    """MinHash signatures used by the near-duplicate detection"""
+    mongo_filter = {} if all_items else {"dedup_sig": {"$exists": False}}
+    projection = {field: 1 for field in DEDUP_FIELDS}
+    return backfill("dedup", mongo_filter, projection, lambda item: dedup_fields({f: item.get(f, "") for f in DEDUP_FIELDS}), batch_size)
+
+
+def backfill_image_hash(all_items=False, batch_size=1000):
+    """Perceptual hashes used by the similar images query
+
+    Images are read in the I/O pool and hashed in the image process pool a batch
+    at a time. Missing or undecodable images are skipped (and retried next run).
+    """
+    mongo_filter = {"image_path": {"$nin": list(NO_IMAGE)}}
+    if not all_items:
+        mongo_filter["image_hash"] = None
+    updated = skipped = 0
+    cursor = db.items.find(mongo_filter, {"image_path": 1})
+    while batch := list(islice(cursor, batch_size)):
+        hashes = images.stored_hashes(list({item["image_path"] for item in batch}))
+        operations = [
+            UpdateOne({"_id": item["_id"]}, {"$set": image_hash_fields(hashes[item["image_path"]])})
+            for item in batch if item["image_path"] in hashes
+        ]
+        skipped += len(batch) - len(operations)
+        if operations:
+            updated += bulk_db.items.bulk_write(operations, ordered=False).modified_count
+    checkpoint("backfill_image_hash")
+    return {"backfill": "image_hash", "updated": updated, "skipped": skipped}
+
+
+def backfill_memberships(all_items=False, batch_size=1000):
+    """Move the `member_ids` of containers to the memberships collection
+
+    Also run by every process on its first database access.
+    """
+    migrated, created = memberships.migrate(bulk_db, batch_size)
+    checkpoint("backfill_memberships")
+    return {"backfill": "memberships", "containers": migrated, "created": created}
+
+
+BACKFILLS = {
+    "search": backfill_search,
+    "dedup": backfill_dedup,
+    "image_hash": backfill_image_hash,
+    "memberships": backfill_memberships,
+}
+
+
+def main():
+    parser = ArgumentParser(description="Backfill derived fields")
+    parser.add_argument("name", choices=sorted(BACKFILLS))
+    parser.add_argument("--all", action="store_true", help="Recompute every item, not only the missing ones (item backfills)")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+    print(json.dumps(BACKFILLS[args.name](all_items=args.all, batch_size=args.batch_size)))
+
+
+if __name__ == "__main__":
+    main()
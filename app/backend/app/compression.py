@@ -0,0 +1,99 @@
+"""Negotiated response compression
+
+JSON responses larger than COMPRESS_MIN_SIZE are compressed with zstd when the
+client accepts it and `zstandard` is installed, else gzip. The same compressors
+are used to stream compressed exports and to read compressed import files.
+"""
+import gzip
+import os
+import zlib
+from flask import request
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", 1024))
+GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", 6))
+ZSTD_LEVEL = int(os.getenv("COMPRESS_ZSTD_LEVEL", 3))
+COMPRESSED_MIMETYPES = {"application/json"}
+
+EXTENSIONS = {"gzip": ".gz", "zstd": ".zst"}
+MIMETYPES = {"gzip": "application/gzip", "zstd": "application/zstd"}
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+def available_encodings():
+    """Supported encodings, preferred first"""
+    return ("zstd", "gzip") if zstandard else ("gzip",)
+
+
+def negotiate(accept_encodings):
+    """Best encoding accepted by the client (werkzeug Accept header), or None"""
+    best, best_quality = None, 0
+    for encoding in available_encodings():
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compressor(encoding):
+    """Incremental compressor exposing compress() / flush()"""
+    if encoding == "zstd" and zstandard:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+    if encoding == "gzip":
+        return zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    raise ValueError(f"Unsupported encoding {encoding!r}")
+
+
+def compress(data, encoding):
+    stream = compressor(encoding)
+    return stream.compress(data) + stream.flush()
+
+
+def compress_stream(chunks, encoding):
+    """Compress an iterable of bytes as it is produced"""
+    stream = compressor(encoding)
+    for chunk in chunks:
+        compressed = stream.compress(chunk)
+        if compressed:
+            yield compressed
+    yield stream.flush()
+
+
+def decompressing_reader(fileobj):
+    """Readable file object, transparently decompressing gzip / zstd input"""
+    magic = fileobj.read(4)
+    fileobj.seek(0)
+    if magic.startswith(GZIP_MAGIC):
+        return gzip.GzipFile(fileobj=fileobj, mode="rb")
+    if magic.startswith(ZSTD_MAGIC):
+        if not zstandard:
+            raise ValueError("zstd compressed file, but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().stream_reader(fileobj, read_across_frames=True)
+    return fileobj
+
+
+def init_app(app):
+    @app.after_request
+    def compress_response(response):
+        if (
+            response.mimetype not in COMPRESSED_MIMETYPES
+            or response.direct_passthrough
+            or response.is_streamed
+            or response.status_code < 200 or response.status_code in (204, 304)
+            or "Content-Encoding" in response.headers
+        ):
+            return response
+        response.vary.add("Accept-Encoding")
+        if response.content_length is not None and response.content_length < COMPRESS_MIN_SIZE:
+            return response
+        encoding = negotiate(request.accept_encodings)
+        if not encoding:
+            return response
+        response.set_data(compress(response.get_data(), encoding))
+        response.headers["Content-Encoding"] = encoding
+        return response
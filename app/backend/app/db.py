@@ -1,18 +1,97 @@
 import os
 import sys
+import datetime
+import threading
+import time
+from flask import has_request_context, session
+from flask_login import current_user
 from pymongo import MongoClient
-from dotenv import load_dotenv
+from pymongo.read_concern import ReadConcern
+from pymongo.write_concern import WriteConcern
+from pymongo.read_preferences import Primary, PrimaryPreferred, Secondary, SecondaryPreferred, Nearest
+from app.metrics import CommandMetrics, MONGO_READ_ROUTING, current_request_stats
+from app.query_budget import QueryShapeListener
+from app.utils import load_env
+
+
+def _env_int(name, default):
+    """Read an integer setting from the environment"""
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        print(f"Error: {name} must be an integer (got {value!r})")
+        sys.exit(1)
+
+
+def get_client_options():
+    """Connection pool and timeout settings, configurable from env"""
+    options = {
+        "maxPoolSize": _env_int("MONGO_MAX_POOL_SIZE", 100),
+        "minPoolSize": _env_int("MONGO_MIN_POOL_SIZE", 0),
+        "maxIdleTimeMS": _env_int("MONGO_MAX_IDLE_TIME_MS", 60000),
+        "connectTimeoutMS": _env_int("MONGO_CONNECT_TIMEOUT_MS", 5000),
+        "serverSelectionTimeoutMS": _env_int("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000),
+        "waitQueueTimeoutMS": _env_int("MONGO_WAIT_QUEUE_TIMEOUT_MS", 5000),
+    }
+    # No socket timeout by default (pymongo behaviour), long exports may take a while
+    socket_timeout = _env_int("MONGO_SOCKET_TIMEOUT_MS", 0)
+    if socket_timeout:
+        options["socketTimeoutMS"] = socket_timeout
+    return options
+
+
+# Read preferences of the read-only routes (MONGO_READ_PREFERENCE)
+READ_PREFERENCES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+READ_CONCERNS = ("local", "available", "majority")
+MIN_MAX_STALENESS_SECONDS = 90  # Smallest bound accepted by MongoDB
+HEARTBEAT_SECONDS = 10  # Staleness is estimated from heartbeats (pymongo default frequency)
+
+
+def get_read_options():
+    """Read preference / concern of the read-only routes, configurable from env"""
+    mode = os.getenv("MONGO_READ_PREFERENCE", "primary")
+    if mode not in READ_PREFERENCES:
+        print(f"Error: MONGO_READ_PREFERENCE must be one of {', '.join(READ_PREFERENCES)} (got {mode!r})")
+        sys.exit(1)
+    options = {}
+    if mode == "primary":
+        options["read_preference"] = Primary()
+    else:
+        max_staleness = _env_int("MONGO_MAX_STALENESS_SECONDS", MIN_MAX_STALENESS_SECONDS)
+        if max_staleness < MIN_MAX_STALENESS_SECONDS:
+            print(f"Error: MONGO_MAX_STALENESS_SECONDS must be at least {MIN_MAX_STALENESS_SECONDS} (got {max_staleness})")
+            sys.exit(1)
+        options["read_preference"] = READ_PREFERENCES[mode](max_staleness=max_staleness)
+    read_concern = os.getenv("MONGO_READ_CONCERN")
+    if read_concern:
+        if read_concern not in READ_CONCERNS:
+            print(f"Error: MONGO_READ_CONCERN must be one of {', '.join(READ_CONCERNS)} (got {read_concern!r})")
+            sys.exit(1)
+        options["read_concern"] = ReadConcern(read_concern)
+    return options
 
 
 # MongoDB setup
 def get_mongo_client():
     # Load env variables
-    load_dotenv()
+    load_env()
 
     client = None
+    # connect=False: sockets are only opened on first operation, never in the gunicorn master
+    options = get_client_options()
+    options["event_listeners"] = [CommandMetrics(), QueryShapeListener()]
     MONGO_URI = os.getenv("MONGO_URI")
     if MONGO_URI:
-        client = MongoClient(MONGO_URI)
+        client = MongoClient(MONGO_URI, connect=False, **options)
     else:
         MONGO_HOST = os.getenv("MONGO_HOST")
         MONGO_PORT = os.getenv("MONGO_PORT")
@@ -20,15 +99,225 @@ def get_mongo_client():
         if None in [MONGO_HOST, MONGO_PORT, MONGO_SECRET]:
             print("Error: cannot load the environment variables")
             sys.exit(1)
-        client = MongoClient(f'mongodb://{MONGO_SECRET}@{MONGO_HOST}/?authSource=admin&retryWrites=true&w=majority', port=int(MONGO_PORT))
+        client = MongoClient(f'mongodb://{MONGO_SECRET}@{MONGO_HOST}/?authSource=admin&retryWrites=true&w=majority', port=int(MONGO_PORT), connect=False, **options)
     return client
 
-client = get_mongo_client()
-db = client["app"]
-# Make sure categories collection is unique on name
-db.categories.create_index(
-    [("name", 1), ("container_id", 1)],
-    unique=True,
-    name="unique_category_per_container",
-    collation={"locale": "en", "strength": 2}
-)
+
+# Indexes the application relies on: (collection, keys, options)
+INDEXES = [
+    # Make sure categories collection is unique on name
+    ("categories", [("name", 1), ("container_id", 1)], {
+        "unique": True,
+        "name": "unique_category_per_container",
+        "collation": {"locale": "en", "strength": 2},
+    }),
+    # Container access: covered (user_id, container_id) lookups, members by role
+    ("memberships", [("user_id", 1), ("container_id", 1)], {"name": "unique_membership", "unique": True}),
+    ("memberships", [("container_id", 1), ("role", 1)], {"name": "membership_container_role"}),
+    # Orphaned image collection looks files up by name
+    ("items", [("image_path", 1)], {"name": "item_image_path"}),
+    # Tag autocomplete (multikey)
+    ("items", [("container_id", 1), ("tags", 1)], {"name": "item_container_tags"}),
+    # Typeahead on normalized name / serie
+    ("items", [("container_id", 1), ("name_norm", 1)], {"name": "item_container_name_norm"}),
+    ("items", [("container_id", 1), ("serie_norm", 1)], {"name": "item_container_serie_norm"}),
+    # Similar images: band values of the perceptual hash (multikey)
+    ("items", [("container_id", 1), ("image_hash_bands", 1)], {"name": "item_container_image_hash_bands"}),
+    # Incremental exports read what changed since a baseline
+    ("items", [("container_id", 1), ("updated_at", 1)], {"name": "item_container_updated_at"}),
+    ("categories", [("container_id", 1), ("updated_at", 1)], {"name": "category_container_updated_at"}),
+    ("deletions", [("container_id", 1), ("deleted_at", 1)], {"name": "deletion_container_deleted_at"}),
+    # Abandoned chunked import uploads expire
+    ("import_uploads", [("expires_at", 1)], {"name": "import_upload_expiry", "expireAfterSeconds": 0}),
+    # Staged images never referenced by an item expire
+    ("staged_images", [("expires_at", 1)], {"name": "staged_image_expiry", "expireAfterSeconds": 0}),
+]
+
+
+def _retention_indexes():
+    """TTL indexes of the deletion tombstones and of the exports (app.api.utils.changes imports this module)
+
+    An export older than the tombstones can no longer be a delta baseline.
+    """
+    from app.api.utils.changes import TOMBSTONE_DAYS
+    seconds = int(TOMBSTONE_DAYS * 86400)
+    return [
+        ("deletions", [("deleted_at", 1)], {"name": "deletion_expiry", "expireAfterSeconds": seconds}),
+        ("exports", [("created_at", 1)], {"name": "export_expiry", "expireAfterSeconds": seconds}),
+    ]
+
+
+def ensure_indexes(database):
+    """Create the missing indexes (one listIndexes per collection when all exist)"""
+    existing = {}
+    for collection, keys, options in INDEXES + _retention_indexes():
+        if collection not in existing:
+            existing[collection] = {index["name"] for index in database[collection].list_indexes()}
+        if options["name"] not in existing[collection]:
+            database[collection].create_index(keys, **options)
+
+
+# Per-process client: MongoClient is not fork-safe, so a client created before
+# gunicorn forks its workers must never be reused in a child process.
+_client = None
+_client_pid = None
+_indexes_ready = False
+_lock = threading.Lock()
+
+
+def get_client():
+    """Return the MongoClient of the current process, creating it on first use"""
+    global _client, _client_pid, _indexes_ready
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _lock:
+            if _client is None or _client_pid != pid:
+                _client = get_mongo_client()
+                _client_pid = pid
+                _indexes_ready = False
+    return _client
+
+
+def get_db():
+    """Return the application database of the current process"""
+    global _indexes_ready
+    database = get_client()["app"]
+    if not _indexes_ready:
+        with _lock:
+            if not _indexes_ready:
+                ensure_indexes(database)
+                # Containers written before the memberships collection keep access
+                from app.api.utils import memberships
+                memberships.migrate(database)
+                _indexes_ready = True
+    return database
+
+
+def reset_client():
+    """Drop the client of the current process (next access reconnects)"""
+    global _client, _client_pid, _indexes_ready
+    with _lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.close()
+        _client = None
+        _client_pid = None
+        _indexes_ready = False
+
+
+# ========== READ ROUTING ==========
+# Read-only routes (listings, stats, exports, media metadata) read through `read_db`,
+# which follows MONGO_READ_PREFERENCE: with secondaryPreferred their queries are
+# spread over the secondaries of a replica set, at most MONGO_MAX_STALENESS_SECONDS
+# behind the primary. For MONGO_READ_YOUR_WRITES_SECONDS after a request of a user
+# wrote to the database, the reads of this user stay on the primary so that they
+# always see their own changes. Access checks and writes always use `db` (primary).
+_read_database = None
+
+
+def read_routing_enabled():
+    return os.getenv("MONGO_READ_PREFERENCE", "primary") != "primary"
+
+
+def _wrote_recently():
+    """The current user wrote within MONGO_READ_YOUR_WRITES_SECONDS (session cookie, any worker)"""
+    if not has_request_context():
+        return False
+    last_write = session.get("last_write_at")
+    return last_write is not None and time.time() - last_write < _env_int("MONGO_READ_YOUR_WRITES_SECONDS", 120)
+
+
+def get_read_db():
+    """Database of the read-only routes of the current process"""
+    global _read_database
+    database = get_db()
+    if not read_routing_enabled():
+        return database
+    if _wrote_recently():
+        MONGO_READ_ROUTING.labels("primary").inc()
+        return database
+    MONGO_READ_ROUTING.labels("preference").inc()
+    if _read_database is None or _read_database.client is not database.client:
+        _read_database = database.with_options(**get_read_options())
+    return _read_database
+
+
+def max_read_lag():
+    """Seconds the reads of `read_db` may lag behind the primary for the current request (0 on the primary)"""
+    if not read_routing_enabled() or _wrote_recently():
+        return 0
+    return _env_int("MONGO_MAX_STALENESS_SECONDS", MIN_MAX_STALENESS_SECONDS) + HEARTBEAT_SECONDS
+
+
+def init_app(app):
+    """Remember when a user last wrote, so that their next reads go to the primary"""
+
+    @app.after_request
+    def remember_write(response):
+        stats = current_request_stats()
+        if (
+            stats is not None and stats.writes
+            and read_routing_enabled()
+            and current_user.is_authenticated
+        ):
+            session["last_write_at"] = time.time()
+        return response
+
+
+# ========== WRITE CONCERN PROFILES ==========
+# Interactive writes (routes editing a few documents) use the write concern of the
+# connection string: w=majority. Bulk jobs (imports, backfills) write batches
+# through `bulk_db` with the lighter MONGO_BULK_WRITE_CONCERN (w=1: acknowledged by
+# the primary alone), then call `checkpoint()`. Secondaries apply the oplog in
+# order, so once the majority acknowledges the checkpoint every earlier write of
+# the job is majority committed as well.
+_bulk_database = None
+
+
+def get_bulk_write_concern():
+    """Write concern of the bulk jobs, configurable from env (a node count or majority)"""
+    w = os.getenv("MONGO_BULK_WRITE_CONCERN", "1")
+    if w != "majority":
+        try:
+            w = int(w)
+        except ValueError:
+            print(f"Error: MONGO_BULK_WRITE_CONCERN must be a number of nodes or majority (got {w!r})")
+            sys.exit(1)
+    return WriteConcern(w=w)
+
+
+def get_bulk_db():
+    """Database of the bulk jobs of the current process"""
+    global _bulk_database
+    database = get_db()
+    if _bulk_database is None or _bulk_database.client is not database.client:
+        _bulk_database = database.with_options(write_concern=get_bulk_write_concern())
+    return _bulk_database
+
+
+def checkpoint(job):
+    """Majority acknowledged write closing a bulk job, raises when the job's writes could not be replicated in time"""
+    write_concern = WriteConcern(w="majority", wtimeout=_env_int("MONGO_CHECKPOINT_TIMEOUT_MS", 60000))
+    get_db().with_options(write_concern=write_concern).checkpoints.update_one(
+        {"_id": job},
+        {"$set": {"at": datetime.datetime.now(datetime.timezone.utc)}},
+        upsert=True
+    )
+
+
+class LazyDatabase:
+    """Stand-in for the `Database` resolved on attribute access, so importing
+    this module never connects and each worker process gets its own client"""
+
+    def __init__(self, resolve=get_db):
+        self._resolve = resolve
+
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
+
+    def __getitem__(self, name):
+        return self._resolve()[name]
+
+
+db = LazyDatabase()
+read_db = LazyDatabase(get_read_db)
+bulk_db = LazyDatabase(get_bulk_db)
@@ -2,7 +2,6 @@ from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from flask_login import LoginManager
 from flask_bcrypt import Bcrypt
-from flasgger import Swagger
 import os
 
 
@@ -18,9 +17,11 @@ limiter = Limiter(
     enabled=os.getenv("FLASK_ENV") == "production"
 )
 
-# Swagger configuration
-from app.swagger_config import swagger_template, swagger_config
-swagger = Swagger(template=swagger_template, config=swagger_config)
+# Swagger configuration (flasgger is only imported when the API docs are enabled)
+def init_swagger(app):
+    from flasgger import Swagger
+    from app.swagger_config import swagger_template, swagger_config
+    return Swagger(app, template=swagger_template, config=swagger_config)
 
 # User loader for Flask-Login
 @login_manager.user_loader
@@ -0,0 +1,121 @@
+"""Orphaned image garbage collector
+
+Streams the media storage, checks the files older than the grace period against
+the `image_path` values referenced by items (in batches) and quarantines or
+deletes the unreferenced ones, then deletes expired staged images and the
+thumbnails of unreferenced images. Meant to run from cron:
+
+    python -m app.media_gc --grace-hours 24 --mode quarantine
+"""
+import json
+import time
+from argparse import ArgumentParser
+from pathlib import PurePath
+from app import storage
+from app.db import db
+from app.api.utils import images
+
+MODES = ("report", "quarantine", "delete")
+
+
+def referenced_names(names):
+    """Subset of `names` referenced by at least one item"""
+    cursor = db.items.find({"image_path": {"$in": names}}, {"image_path": 1, "_id": 0})
+    return {item["image_path"] for item in cursor}
+
+
+def quarantine_name(quarantine, name):
+    """`name`, or `<stem>-<n><suffix>` when a file of the quarantine already has it"""
+    if not quarantine.exists(name):
+        return name
+    path = PurePath(name)
+    counter = 1
+    while quarantine.exists(f"{path.stem}-{counter}{path.suffix}"):
+        counter += 1
+    return f"{path.stem}-{counter}{path.suffix}"
+
+
+def collect(media=None, grace_hours=24, mode="report", batch_size=500, quarantine=None, image_name=None):
+    """Run one collection pass, returns a report
+
+    `image_name` maps a stored file name to the image name items reference
+    (thumbnails), by default they are the same.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode {mode!r}")
+    media = media or storage.media
+    image_name = image_name or (lambda name: name)
+    quarantine = quarantine or storage.quarantine
+    report = {"mode": mode, "scanned": 0, "orphans": 0, "reclaimed_bytes": 0, "errors": 0}
+
+    cutoff = time.time() - grace_hours * 3600
+    batch = []
+
+    def flush():
+        referenced = referenced_names([image_name(name) for name, _ in batch])
+        for name, size in batch:
+            if image_name(name) in referenced:
+                continue
+            # Re-check the age: the file may have been replaced since it was listed
+            try:
+                modified_at = media.modified_at(name)
+                if modified_at is None or modified_at >= cutoff:
+                    continue
+                if mode == "quarantine":
+                    media.move(name, quarantine, quarantine_name(quarantine, name))
+                elif mode == "delete":
+                    media.delete(name)
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                print(f"Failed to collect {name}: {e}")
+                report["errors"] += 1
+                continue
+            report["orphans"] += 1
+            report["reclaimed_bytes"] += size
+        batch.clear()
+
+    for name, size in media.iter_files(cutoff):
+        report["scanned"] += 1
+        batch.append((name, size))
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return report
+
+
+def purge_quarantine(days, quarantine=None):
+    """Delete files quarantined more than `days` ago, returns the freed bytes"""
+    quarantine = quarantine or storage.quarantine
+    freed = 0
+    for name, size in list(quarantine.iter_files(time.time() - days * 86400)):
+        try:
+            if quarantine.delete(name):
+                freed += size
+        except OSError as e:
+            print(f"Failed to purge {name}: {e}")
+    return freed
+
+
+def main():
+    parser = ArgumentParser(description="Remove images no item references anymore")
+    parser.add_argument("--mode", choices=MODES, default="quarantine", help="report only, move to quarantine or delete")
+    parser.add_argument("--grace-hours", type=float, default=24, help="Ignore files modified more recently (uploads in flight)")
+    parser.add_argument("--batch-size", type=int, default=500, help="File names checked per database query")
+    parser.add_argument("--purge-quarantine-days", type=float, default=None, help="Also delete quarantined files older than this")
+    args = parser.parse_args()
+
+    report = collect(grace_hours=args.grace_hours, mode=args.mode, batch_size=args.batch_size)
+    if args.purge_quarantine_days is not None:
+        report["purged_quarantine_bytes"] = purge_quarantine(args.purge_quarantine_days)
+    if args.mode != "report":
+        report["purged_staged_bytes"] = images.purge_staged()
+        # Thumbnails are made again on demand: those of unreferenced images are deleted
+        thumbnails = collect(storage.thumbnails, args.grace_hours, "delete", args.batch_size, image_name=images.source_name)
+        report["purged_thumbnail_bytes"] = thumbnails["reclaimed_bytes"]
+    print(json.dumps(report))
+
+
+if __name__ == "__main__":
+    main()
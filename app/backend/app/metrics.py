@@ -0,0 +1,228 @@
+import os
+import threading
+import time
+from contextvars import ContextVar, copy_context
+from flask import request
+from pymongo import monitoring
+from prometheus_client import Counter, Gauge, Histogram
+
+
+# ========== METRICS ==========
+REQUEST_COUNT = Counter(
+    "libstock_http_requests_total",
+    "HTTP requests handled",
+    ["method", "route", "status"]
+)
+REQUEST_LATENCY = Histogram(
+    "libstock_http_request_duration_seconds",
+    "HTTP request latency",
+    ["method", "route"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+REQUEST_EXCEPTIONS = Counter(
+    "libstock_http_request_exceptions_total",
+    "Unhandled exceptions raised by routes",
+    ["route"]
+)
+MONGO_COMMANDS_PER_REQUEST = Histogram(
+    "libstock_mongo_commands_per_request",
+    "MongoDB commands issued while handling one request",
+    ["route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144, 233)
+)
+MONGO_TIME_PER_REQUEST = Histogram(
+    "libstock_mongo_time_per_request_seconds",
+    "Time spent in MongoDB commands while handling one request",
+    ["route"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+MONGO_COMMAND_DURATION = Histogram(
+    "libstock_mongo_command_duration_seconds",
+    "MongoDB command latency",
+    ["command", "collection"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+)
+MONGO_COMMAND_FAILURES = Counter(
+    "libstock_mongo_command_failures_total",
+    "MongoDB commands that failed",
+    ["command", "collection"]
+)
+CATEGORY_CACHE_REQUESTS = Counter(
+    "libstock_category_cache_requests_total",
+    "Category cache lookups",
+    ["result"]
+)
+LOGIN_HASH_DURATION = Histogram(
+    "libstock_login_hash_seconds",
+    "bcrypt password verification time",
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1, 2, 5)
+)
+LOGIN_HASH_REJECTED = Counter(
+    "libstock_login_hash_rejected_total",
+    "Logins rejected because every hashing slot was taken"
+)
+LOGIN_HASH_IN_FLIGHT = Gauge(
+    "libstock_login_hash_in_flight",
+    "Logins hashing or waiting for a hashing worker",
+    multiprocess_mode="livesum"
+)
+MONGO_READ_ROUTING = Counter(
+    "libstock_mongo_read_routing_total",
+    "Read-only route database lookups, following the read preference or kept on the primary after a write",
+    ["target"]
+)
+IMAGE_INGEST_DURATION = Histogram(
+    "libstock_image_ingest_seconds",
+    "Image validation, downscaling and re-encoding time",
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30)
+)
+IMAGE_INGEST_BYTES = Counter(
+    "libstock_image_ingest_bytes_total",
+    "Image bytes received and stored after re-encoding",
+    ["stage"]
+)
+
+
+# ========== PER-REQUEST MONGO ACCOUNTING ==========
+class RequestStats:
+    """MongoDB commands issued by the current request (and the pool threads working for it)"""
+    __slots__ = ("commands", "duration", "writes", "_lock")
+
+    def __init__(self):
+        self.commands = 0
+        self.duration = 0.0
+        self.writes = 0
+        self._lock = threading.Lock()
+
+    def record(self, duration, write):
+        with self._lock:
+            self.commands += 1
+            self.duration += duration
+            if write:
+                self.writes += 1
+
+
+WRITE_COMMANDS = {"insert", "update", "delete", "findAndModify"}
+
+# Context variables follow threads and greenlets, so each request only sees its own commands
+_request_stats = ContextVar("libstock_request_stats", default=None)
+_collections = ContextVar("libstock_command_collections", default=None)
+
+
+def current_request_stats():
+    """Stats of the request being handled (None outside of a request)"""
+    return _request_stats.get()
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """pymongo listener recording the count and duration of each command"""
+
+    def started(self, event):
+        # The collection is only known on the started event, keep it for the result event
+        collections = _collections.get()
+        if collections is None:
+            collections = {}
+            _collections.set(collections)
+        collections[event.request_id] = _collection_name(event)
+
+    def succeeded(self, event):
+        self._record(event, failed=False)
+
+    def failed(self, event):
+        self._record(event, failed=True)
+
+    def _record(self, event, failed):
+        collections = _collections.get() or {}
+        collection = collections.pop(event.request_id, "")
+        duration = event.duration_micros / 1_000_000
+        MONGO_COMMAND_DURATION.labels(event.command_name, collection).observe(duration)
+        if failed:
+            MONGO_COMMAND_FAILURES.labels(event.command_name, collection).inc()
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.record(duration, event.command_name in WRITE_COMMANDS and not failed)
+
+
+def _collection_name(event):
+    value = event.command.get(event.command_name) if event.command else None
+    return value if isinstance(value, str) else ""
+
+
+# ========== FLASK HOOKS ==========
+def streams_body(response):
+    """The body is produced while it is sent (exports), after the request hooks ran"""
+    return response.is_streamed and not response.direct_passthrough
+
+
+def _in_context(iterable, context):
+    """Iterate (and close) `iterable` in `context`"""
+    iterator = iter(iterable)
+    try:
+        while True:
+            try:
+                chunk = context.run(next, iterator)
+            except StopIteration:
+                return
+            yield chunk
+    finally:
+        if hasattr(iterator, "close"):
+            context.run(iterator.close)
+
+
+def route_label():
+    """Bounded label for the current request (endpoint name, not the raw path)"""
+    return request.endpoint or "unmatched"
+
+
+def init_app(app):
+    """Time every request and record its MongoDB usage"""
+
+    @app.before_request
+    def start_request_metrics():
+        request.environ["libstock.start_time"] = time.perf_counter()
+        request.environ["libstock.stats_token"] = _request_stats.set(RequestStats())
+
+    @app.after_request
+    def record_request_metrics(response):
+        start = request.environ.get("libstock.start_time")
+        if start is None:
+            return response
+        route = route_label()
+        REQUEST_COUNT.labels(request.method, route, str(response.status_code)).inc()
+        stats = _request_stats.get()
+        method = request.method
+
+        def record():
+            REQUEST_LATENCY.labels(method, route).observe(time.perf_counter() - start)
+            if stats is not None:
+                MONGO_COMMANDS_PER_REQUEST.labels(route).observe(stats.commands)
+                MONGO_TIME_PER_REQUEST.labels(route).observe(stats.duration)
+
+        if streams_body(response):
+            # The request context is torn down before the body is sent: the body runs in a copy
+            # of it, so its commands reach this request's stats (and query log), recorded on close
+            response.response = _in_context(response.response, copy_context())
+            response.call_on_close(record)
+        else:
+            record()
+        return response
+
+    @app.teardown_request
+    def reset_request_metrics(exc):
+        if exc is not None:
+            REQUEST_EXCEPTIONS.labels(route_label()).inc()
+        token = request.environ.pop("libstock.stats_token", None)
+        if token is not None:
+            _request_stats.reset(token)
+
+
+def render_metrics():
+    """Exposition payload, aggregated over workers when gunicorn runs in multiprocess mode"""
+    from prometheus_client import CollectorRegistry, generate_latest, CONTENT_TYPE_LATEST
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    from prometheus_client import REGISTRY
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -23,4 +23,12 @@ class User(UserMixin):
         user_data = db.users.find_one({"username": username})
         if user_data:
             return User(user_data)
-        return None
\ No newline at end of file
+        return None
+
+    @staticmethod
+    def get_by_username_with_hash(username):
+        """Get user by username along with its password hash (single query)"""
+        user_data = db.users.find_one({"username": username}, {"username": 1, "password": 1})
+        if user_data:
+            return User(user_data), user_data.get("password")
+        return None, None
\ No newline at end of file
@@ -0,0 +1,62 @@
+"""Prebuilt OpenAPI spec
+
+Renders the spec from `swagger_config.py` and the route docstrings once, at build
+time, into a static file served with caching headers:
+
+    python -m app.openapi [--output PATH]
+"""
+import json
+import os
+from argparse import ArgumentParser
+from pathlib import Path
+from flask import send_file, jsonify
+from app.utils import BASE_DIR
+
+SPEC_PATH = Path(os.getenv("OPENAPI_SPEC_PATH", BASE_DIR / "static" / "apispec.json"))
+SPEC_MAX_AGE = 3600
+
+
+def build_spec():
+    """Render the spec with flasgger on a throwaway app (no database access)"""
+    from flask import Flask
+    from app.api import api_bp
+    from app.extensions import init_swagger
+
+    app = Flask(__name__)
+    app.register_blueprint(api_bp, url_prefix="/api")
+    swagger = init_swagger(app)
+    with app.test_request_context():
+        return swagger.get_apispecs("apispec")
+
+
+def write_spec(path=SPEC_PATH):
+    spec = build_spec()
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(spec, f, separators=(",", ":"), sort_keys=True)
+    os.replace(tmp_path, path)
+    return path, len(spec.get("paths", {}))
+
+
+def init_app(app):
+    """Serve the prebuilt spec on /api/apispec.json (ETag + Cache-Control)"""
+
+    @app.route("/api/apispec.json")
+    def prebuilt_apispec():
+        if not SPEC_PATH.is_file():
+            return jsonify({"error": "API spec not built, run `python -m app.openapi`"}), 404
+        return send_file(SPEC_PATH, mimetype="application/json", conditional=True, etag=True, max_age=SPEC_MAX_AGE)
+
+
+def main():
+    parser = ArgumentParser(description="Render the OpenAPI spec to a static file")
+    parser.add_argument("--output", default=str(SPEC_PATH))
+    args = parser.parse_args()
+    path, count = write_spec(args.output)
+    print(f"OpenAPI spec with {count} paths written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+import os
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from flask import request, current_app
+from pymongo import monitoring
+from app.metrics import streams_body
+
+
+# Round-trips driven by the result size (cursor batches) or by the driver, not by the route code
+UNCOUNTED_COMMANDS = {"getMore", "killCursors", "endSessions"}
+
+
+class QueryBudgetExceeded(Exception):
+    """A request issued more MongoDB commands than its budget allows"""
+
+
+class QueryLog:
+    """Shapes of the MongoDB commands issued inside a block or a request"""
+
+    def __init__(self):
+        self.shapes = []
+
+    @property
+    def count(self):
+        return len(self.shapes)
+
+    def repeated(self, threshold):
+        """Identical query shapes issued at least `threshold` times (N+1 candidates)"""
+        return [(shape, n) for shape, n in Counter(self.shapes).most_common() if n >= threshold]
+
+    def problems(self, max_commands=None, max_repeats=None):
+        """Human readable budget violations (empty list when within budget)"""
+        problems = []
+        if max_commands is not None and self.count > max_commands:
+            problems.append(f"{self.count} MongoDB commands (budget {max_commands})")
+        if max_repeats is not None:
+            for shape, n in self.repeated(max_repeats + 1):
+                problems.append(f"{n}x identical query {shape}")
+        return problems
+
+
+# Every active log receives the commands: the per-request log and any enclosing test block
+_active_logs = ContextVar("libstock_query_logs", default=())
+
+
+@contextmanager
+def record_queries():
+    """Record the shapes of the MongoDB commands issued in this context"""
+    log = QueryLog()
+    token = _active_logs.set(_active_logs.get() + (log,))
+    try:
+        yield log
+    finally:
+        _active_logs.reset(token)
+
+
+class QueryShapeListener(monitoring.CommandListener):
+    """pymongo listener feeding the active query logs (no-op when none is active)"""
+
+    def started(self, event):
+        logs = _active_logs.get()
+        if not logs or event.command_name in UNCOUNTED_COMMANDS:
+            return
+        shape = command_shape(event.command_name, event.command)
+        for log in logs:
+            log.shapes.append(shape)
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def command_shape(command_name, command):
+    """Command, collection and filter structure with every value replaced by `?`"""
+    collection = command.get(command_name, "")
+    if command_name in ("find", "count", "distinct"):
+        query = command.get("filter", command.get("query"))
+    elif command_name == "findAndModify":
+        query = command.get("query")
+    elif command_name == "aggregate":
+        stages = ", ".join(_shape(stage) for stage in command.get("pipeline", []))
+        return f"aggregate {collection} [{stages}]"
+    elif command_name in ("update", "delete"):
+        statements = command.get("updates" if command_name == "update" else "deletes") or [{}]
+        query = statements[0].get("q")
+    else:
+        query = None
+    return f"{command_name} {collection} {_shape(query) if query is not None else ''}".strip()
+
+
+def _shape(value):
+    if isinstance(value, dict):
+        return "{" + ", ".join(f"{k}: {_shape(v)}" for k, v in value.items()) + "}"
+    if isinstance(value, (list, tuple)):
+        return f"[{_shape(value[0])}]" if value and isinstance(value[0], dict) else "[?]"
+    return "?"
+
+
+def query_budget(max_commands):
+    """Route decorator overriding the default MongoDB command budget"""
+    def decorator(view):
+        view.query_budget = max_commands
+        return view
+    return decorator
+
+
+def init_app(app):
+    """Count MongoDB commands per request and log or raise when over budget
+
+    Config: QUERY_BUDGET (commands per request), QUERY_BUDGETS ({endpoint: budget}),
+    QUERY_BUDGET_MAX_REPEATS (identical query shapes allowed) and
+    QUERY_BUDGET_MODE ("log" or "raise").
+    """
+    app.config.setdefault("QUERY_BUDGET", int(os.getenv("QUERY_BUDGET", 10)))
+    app.config.setdefault("QUERY_BUDGETS", {})
+    app.config.setdefault("QUERY_BUDGET_MAX_REPEATS", int(os.getenv("QUERY_BUDGET_MAX_REPEATS", 2)))
+    app.config.setdefault("QUERY_BUDGET_MODE", os.getenv("QUERY_BUDGET_MODE", "log"))
+
+    @app.before_request
+    def start_query_log():
+        log = QueryLog()
+        request.environ["libstock.query_log"] = log
+        request.environ["libstock.query_log_token"] = _active_logs.set(_active_logs.get() + (log,))
+
+    @app.after_request
+    def check_query_budget(response):
+        log = request.environ.get("libstock.query_log")
+        if log is None:
+            return response
+        check = _budget_check(log, request.endpoint, f"{request.method} {request.path}")
+        if streams_body(response):
+            # A streamed body (export) queries while it is sent, in the request context kept by
+            # app.metrics: checked once the stream is closed, and only logged (the response is gone)
+            response.call_on_close(lambda: check(raise_error=False))
+            return response
+        response.headers["X-Query-Count"] = str(log.count)
+        check(raise_error=current_app.config["QUERY_BUDGET_MODE"] == "raise")
+        return response
+
+    @app.teardown_request
+    def stop_query_log(exc):
+        token = request.environ.pop("libstock.query_log_token", None)
+        if token is not None:
+            _active_logs.reset(token)
+
+
+def _budget_check(log, endpoint, description):
+    """check(raise_error) of a request log against the budget of its endpoint"""
+    budget = endpoint_budget(endpoint)
+    max_repeats = current_app.config["QUERY_BUDGET_MAX_REPEATS"]
+    logger = current_app.logger
+
+    def check(raise_error):
+        problems = log.problems(budget, max_repeats)
+        if not problems:
+            return
+        message = f"Query budget exceeded by {description} ({endpoint}): " + "; ".join(problems)
+        if raise_error:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+    return check
+
+
+def endpoint_budget(endpoint):
+    """Budget of an endpoint: config override, then route decorator, then default"""
+    budgets = current_app.config["QUERY_BUDGETS"]
+    if endpoint in budgets:
+        return budgets[endpoint]
+    view = current_app.view_functions.get(endpoint)
+    return getattr(view, "query_budget", current_app.config["QUERY_BUDGET"])
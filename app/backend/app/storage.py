@@ -0,0 +1,295 @@
+"""Media storage backends
+
+Images go through a MediaStorage: the local filesystem (default, media tied to
+the host) or GridFS in the application database, so that any number of backend
+replicas serve the same media. MEDIA_STORAGE selects the backend:
+
+    MEDIA_STORAGE=local   UPLOAD_FOLDER, uploads/staged, uploads/quarantine and uploads/thumbnails
+    MEDIA_STORAGE=gridfs  buckets media, media_staged, media_quarantine and media_thumbnails
+
+Existing local files are copied to GridFS with:
+
+    python -m app.storage copy --from local --to gridfs
+"""
+import datetime
+import json
+import mimetypes
+import os
+import shutil
+import threading
+from abc import ABC, abstractmethod
+from argparse import ArgumentParser
+from pathlib import Path
+import gridfs
+from flask import current_app, request, send_from_directory
+from werkzeug.wsgi import wrap_file
+from app.utils import UPLOAD_FOLDER, IMAGE_STAGING_FOLDER, QUARANTINE_FOLDER, THUMBNAIL_FOLDER
+
+MEDIA_STORAGE = os.getenv("MEDIA_STORAGE", "local").lower()
+MEDIA_GRIDFS_BUCKET = os.getenv("MEDIA_GRIDFS_BUCKET", "media")
+BACKENDS = ("local", "gridfs")
+COPY_BUFFER = 1024 * 1024
+
+
+def _mimetype(name):
+    return mimetypes.guess_type(name)[0] or "application/octet-stream"
+
+
+class MediaStorage(ABC):
+    """Flat namespace of files addressed by name"""
+
+    @abstractmethod
+    def save(self, name, data):
+        """Store bytes or a readable file object under `name`"""
+
+    @abstractmethod
+    def open(self, name):
+        """Readable file object, raises FileNotFoundError"""
+
+    @abstractmethod
+    def delete(self, name):
+        """Delete a file, returns False when it did not exist"""
+
+    @abstractmethod
+    def sizes(self, names):
+        """{name: size in bytes} of the existing files among `names`"""
+
+    @abstractmethod
+    def modified_at(self, name):
+        """Last modification as a timestamp, or None when the file does not exist"""
+
+    @abstractmethod
+    def iter_files(self, cutoff=None):
+        """Yield (name, size) of the files last modified before the `cutoff` timestamp (all without one)"""
+
+    @abstractmethod
+    def send(self, name):
+        """Flask response streaming the file, raises FileNotFoundError"""
+
+    def read(self, name):
+        with self.open(name) as f:
+            return f.read()
+
+    def exists(self, name):
+        return name in self.sizes([name])
+
+    def move(self, name, target, new_name=None):
+        """Move a file to another storage (streamed copy, then delete)"""
+        with self.open(name) as f:
+            target.save(new_name or name, f)
+        self.delete(name)
+
+
+class LocalStorage(MediaStorage):
+    """Files of one folder of the local filesystem"""
+
+    def __init__(self, folder):
+        self.folder = Path(folder)
+
+    def path(self, name):
+        return self.folder / name
+
+    def save(self, name, data):
+        self.folder.mkdir(parents=True, exist_ok=True)
+        with open(self.path(name), "wb") as f:
+            if isinstance(data, (bytes, bytearray, memoryview)):
+                f.write(data)
+            else:
+                shutil.copyfileobj(data, f, COPY_BUFFER)
+
+    def open(self, name):
+        return open(self.path(name), "rb")
+
+    def delete(self, name):
+        try:
+            self.path(name).unlink()
+            return True
+        except FileNotFoundError:
+            return False
+
+    def sizes(self, names):
+        sizes = {}
+        for name in names:
+            try:
+                stat = self.path(name).stat()
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+            sizes[name] = stat.st_size
+        return sizes
+
+    def modified_at(self, name):
+        try:
+            return self.path(name).stat().st_mtime
+        except FileNotFoundError:
+            return None
+
+    def iter_files(self, cutoff=None):
+        if not self.folder.is_dir():
+            return
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                if entry.name.startswith(".") or not entry.is_file(follow_symlinks=False):
+                    continue
+                stat = entry.stat(follow_symlinks=False)
+                if cutoff is None or stat.st_mtime < cutoff:
+                    yield entry.name, stat.st_size
+
+    def send(self, name):
+        if not self.path(name).is_file():
+            raise FileNotFoundError(name)
+        return send_from_directory(str(self.folder), name)
+
+    def move(self, name, target, new_name=None):
+        if isinstance(target, LocalStorage):
+            target.folder.mkdir(parents=True, exist_ok=True)
+            path = target.path(new_name or name)
+            shutil.move(str(self.path(name)), str(path))
+            # Dated by the move, as a copy would be (quarantine purges by age)
+            os.utime(path)
+            return
+        super().move(name, target, new_name)
+
+
+class GridFSStorage(MediaStorage):
+    """Files of a GridFS bucket of the application database, streamed in chunks"""
+
+    def __init__(self, bucket_name):
+        self.bucket_name = bucket_name
+        self._bucket = None
+        self._bucket_pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def bucket(self):
+        """Per-process bucket (bound to the MongoClient of the process)"""
+        from app.db import get_db
+        pid = os.getpid()
+        if self._bucket is None or self._bucket_pid != pid:
+            with self._lock:
+                if self._bucket is None or self._bucket_pid != pid:
+                    self._bucket = gridfs.GridFSBucket(get_db(), bucket_name=self.bucket_name)
+                    self._bucket_pid = pid
+        return self._bucket
+
+    @property
+    def files(self):
+        from app.db import db
+        return db[f"{self.bucket_name}.files"]
+
+    @property
+    def read_files(self):
+        """Files collection following the read preference of the read-only routes (metadata only)"""
+        from app.db import read_db
+        return read_db[f"{self.bucket_name}.files"]
+
+    def save(self, name, data):
+        self.bucket.upload_from_stream(name, data, metadata={"contentType": _mimetype(name)})
+        # Uploaded first: a failed upload keeps the previous file. Then only the newest
+        # revision (the one reads open) is kept, concurrent saves keep the same one
+        revisions = self.files.find({"filename": name}, {"_id": 1}, sort=[("uploadDate", -1), ("_id", -1)])
+        for file in list(revisions)[1:]:
+            try:
+                self.bucket.delete(file["_id"])
+            except gridfs.errors.NoFile:
+                continue  # Deleted concurrently
+
+    def open(self, name):
+        try:
+            return self.bucket.open_download_stream_by_name(name)
+        except gridfs.errors.NoFile:
+            raise FileNotFoundError(name)
+
+    def delete(self, name):
+        deleted = False
+        for file in self.files.find({"filename": name}, {"_id": 1}):
+            try:
+                self.bucket.delete(file["_id"])
+                deleted = True
+            except gridfs.errors.NoFile:
+                continue  # Deleted concurrently
+        return deleted
+
+    def sizes(self, names):
+        cursor = self.read_files.find({"filename": {"$in": list(names)}}, {"filename": 1, "length": 1, "_id": 0})
+        return {file["filename"]: file["length"] for file in cursor}
+
+    def modified_at(self, name):
+        file = self.files.find_one({"filename": name}, {"uploadDate": 1}, sort=[("uploadDate", -1)])
+        if not file:
+            return None
+        return file["uploadDate"].replace(tzinfo=datetime.timezone.utc).timestamp()
+
+    def iter_files(self, cutoff=None):
+        query = {}
+        if cutoff is not None:
+            query["uploadDate"] = {"$lt": datetime.datetime.fromtimestamp(cutoff, datetime.timezone.utc)}
+        cursor = self.files.find(query, {"filename": 1, "length": 1, "_id": 0})
+        for file in cursor:
+            yield file["filename"], file["length"]
+
+    def send(self, name):
+        grid_out = self.open(name)
+        response = current_app.response_class(
+            wrap_file(request.environ, grid_out),
+            mimetype=_mimetype(name),
+            direct_passthrough=True,
+        )
+        response.content_length = grid_out.length
+        response.last_modified = grid_out.upload_date
+        response.set_etag(str(grid_out._id))
+        response.cache_control.no_cache = True  # Revalidated with the ETag, as files sent from disk
+        return response.make_conditional(request.environ, accept_ranges=True, complete_length=grid_out.length)
+
+
+def create_storage(backend, area):
+    if backend == "local":
+        return LocalStorage({
+            "media": UPLOAD_FOLDER,
+            "staged": IMAGE_STAGING_FOLDER,
+            "quarantine": QUARANTINE_FOLDER,
+            "thumbnails": THUMBNAIL_FOLDER,
+        }[area])
+    if backend == "gridfs":
+        return GridFSStorage(MEDIA_GRIDFS_BUCKET if area == "media" else f"{MEDIA_GRIDFS_BUCKET}_{area}")
+    raise ValueError(f"Unknown media storage {backend!r}, expected one of: {', '.join(BACKENDS)}")
+
+
+# Stored images, images staged by the upload preview, images set aside by app.media_gc,
+# gallery thumbnails of stored images
+media = create_storage(MEDIA_STORAGE, "media")
+staged = create_storage(MEDIA_STORAGE, "staged")
+quarantine = create_storage(MEDIA_STORAGE, "quarantine")
+thumbnails = create_storage(MEDIA_STORAGE, "thumbnails")
+
+
+def copy(source, target):
+    """Copy the files of `source` missing from `target`, returns a report"""
+    report = {"copied": 0, "skipped": 0, "bytes": 0}
+    names = list(source.iter_files())
+    for start in range(0, len(names), 500):
+        batch = names[start:start + 500]
+        existing = target.sizes([name for name, _ in batch])
+        for name, size in batch:
+            if name in existing:
+                report["skipped"] += 1
+                continue
+            with source.open(name) as f:
+                target.save(name, f)
+            report["copied"] += 1
+            report["bytes"] += size
+    return report
+
+
+def main():
+    parser = ArgumentParser(description="Copy stored images between media storage backends")
+    parser.add_argument("command", choices=["copy"])
+    parser.add_argument("--from", dest="source", choices=BACKENDS, required=True)
+    parser.add_argument("--to", dest="target", choices=BACKENDS, required=True)
+    args = parser.parse_args()
+    if args.source == args.target:
+        parser.error("--from and --to must differ")
+    print(json.dumps(copy(create_storage(args.source, "media"), create_storage(args.target, "media"))))
+
+
+if __name__ == "__main__":
+    main()
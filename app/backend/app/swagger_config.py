@@ -39,6 +39,10 @@ swagger_template = {
             "name": "Containers",
             "description": "Container management"
         },
+        {
+            "name": "Members",
+            "description": "Users sharing a container and their roles"
+        },
         {
             "name": "Categories",
             "description": "Category management within containers"
@@ -50,6 +54,10 @@ swagger_template = {
         {
             "name": "Media",
             "description": "File upload and retrieval"
+        },
+        {
+            "name": "Monitoring",
+            "description": "Prometheus metrics"
         }
     ]
 }
@@ -0,0 +1,23 @@
+"""pytest helpers, enable with `pytest_plugins = ["app.testing"]` in a conftest.py"""
+from contextlib import contextmanager
+import pytest
+from app.query_budget import record_queries
+
+
+@pytest.fixture
+def query_budget():
+    """Assert the MongoDB command budget of the requests made inside a block
+
+        def test_list_items(client, query_budget):
+            with query_budget(max_commands=4, max_repeats=1):
+                client.get(f"/api/container/{container_id}/items")
+    """
+    @contextmanager
+    def check(max_commands=None, max_repeats=None):
+        with record_queries() as log:
+            yield log
+        problems = log.problems(max_commands, max_repeats)
+        if problems:
+            shapes = "\n  ".join(log.shapes)
+            pytest.fail("Query budget exceeded: " + "; ".join(problems) + f"\nCommands:\n  {shapes}")
+    return check
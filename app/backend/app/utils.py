@@ -1,8 +1,22 @@
 from pathlib import Path
+from dotenv import load_dotenv
 
 
 BASE_DIR = Path(__file__).parent
 UPLOAD_FOLDER = BASE_DIR / "uploads" / "image"
+STAGING_FOLDER = BASE_DIR / "uploads" / "staging"
+IMAGE_STAGING_FOLDER = BASE_DIR / "uploads" / "staged"
+QUARANTINE_FOLDER = BASE_DIR / "uploads" / "quarantine"
+THUMBNAIL_FOLDER = BASE_DIR / "uploads" / "thumbnails"
 MAX_SIZE_NAME = 256
 MAX_SIZE_TEXT = 4096
-MAX_SIZE_TAGS_LIST = 10
\ No newline at end of file
+MAX_SIZE_TAGS_LIST = 10
+
+
+_env_loaded = False
+def load_env():
+    """Load the .env file once per process"""
+    global _env_loaded
+    if not _env_loaded:
+        load_dotenv()
+        _env_loaded = True
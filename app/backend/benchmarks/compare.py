@@ -0,0 +1,52 @@
+"""Compare two benchmark result files route by route
+
+    python -m benchmarks.compare baseline.json candidate.json --threshold 10
+"""
+import json
+import sys
+from argparse import ArgumentParser
+
+
+def change(old, new):
+    if not old or new is None:
+        return None
+    return (new - old) / old * 100
+
+
+def main():
+    parser = ArgumentParser(description="Compare two http_bench result files")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Regression threshold in percent")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    print(f"baseline  {baseline['meta'].get('commit')}\ncandidate {candidate['meta'].get('commit')}\n")
+    print(f"{'route':45s} {'req/s':>10} {'Δ%':>8} {'p95 ms':>10} {'Δ%':>8}")
+    regressions = []
+    for name, new in candidate["routes"].items():
+        old = baseline["routes"].get(name)
+        if old is None:
+            print(f"{name:45s} {new['requests_per_second']:>10} {'new':>8}")
+            continue
+        rps_change = change(old["requests_per_second"], new["requests_per_second"])
+        p95_change = change(old["latency_ms"]["p95"], new["latency_ms"]["p95"])
+        print(f"{name:45s} {new['requests_per_second']:>10} {fmt(rps_change):>8} {new['latency_ms']['p95']:>10} {fmt(p95_change):>8}")
+        if (rps_change is not None and rps_change < -args.threshold) or (p95_change is not None and p95_change > args.threshold):
+            regressions.append(name)
+
+    if regressions:
+        print(f"\nRegressions over {args.threshold}%: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+def fmt(value):
+    return "-" if value is None else f"{value:+.1f}"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+"""End-to-end HTTP benchmark of the backend routes
+
+Seeds the local MongoDB with synthetic data for a dedicated `bench` user, then
+drives every API route with concurrent clients against a running backend and
+writes throughput and latency percentiles per route as JSON.
+
+    python -m benchmarks.http_bench --containers 2 --categories 5 --items 200 \
+        --concurrency 8 --duration 10 --output bench.json
+"""
+import json
+import math
+import os
+import random
+import secrets
+import subprocess
+import sys
+import threading
+import time
+import datetime
+from argparse import ArgumentParser
+from benchmarks.http_client import Client, multipart
+from benchmarks.seed import seed, make_png, BENCH_USERNAME, BENCH_PASSWORD
+
+
+# ========== SCENARIOS ==========
+# Each scenario prepares (untimed) and returns the request to time:
+#   (method, path, body, headers, cookies)
+
+def s_login(client, ctx, rng):
+    return "POST", "/login", {"username": BENCH_USERNAME, "password": BENCH_PASSWORD}, None, {}
+
+def s_logout(client, ctx, rng):
+    jar = {}
+    client.login(BENCH_USERNAME, BENCH_PASSWORD, cookies=jar)
+    return "POST", "/logout", None, None, jar
+
+def s_user(client, ctx, rng):
+    return "GET", "/user", None, None, None
+
+def s_list_containers(client, ctx, rng):
+    return "GET", "/containers", None, None, None
+
+def s_get_container(client, ctx, rng):
+    return "GET", f"/container/{pick(ctx, rng)['id']}", None, None, None
+
+def s_add_container(client, ctx, rng):
+    return "POST", "/container/add", {"name": f"Bench tmp {secrets.token_hex(6)}"}, None, None
+
+def s_update_container(client, ctx, rng):
+    return "POST", f"/container/update/{ctx['scratch']['container_id']}", {"name": f"Bench scratch {secrets.token_hex(4)}"}, None, None
+
+def s_delete_container(client, ctx, rng):
+    _, body = client.json("POST", "/container/add", {"name": f"Bench tmp {secrets.token_hex(6)}"})
+    return "DELETE", f"/container/delete/{body['id']}", None, None, None
+
+def s_list_categories(client, ctx, rng):
+    return "GET", f"/container/{pick(ctx, rng)['id']}/categories", None, None, None
+
+def s_add_category(client, ctx, rng):
+    return "POST", f"/container/{ctx['scratch']['container_id']}/category/add", {"name": f"tmp {secrets.token_hex(6)}"}, None, None
+
+def s_update_category(client, ctx, rng):
+    scratch = ctx["scratch"]
+    return "POST", f"/container/{scratch['container_id']}/category/update/{scratch['category_id']}", {"name": f"SCRATCH {secrets.token_hex(4)}"}, None, None
+
+def s_delete_category(client, ctx, rng):
+    container_id = ctx["scratch"]["container_id"]
+    _, body = client.json("POST", f"/container/{container_id}/category/add", {"name": f"tmp {secrets.token_hex(6)}"})
+    return "DELETE", f"/container/{container_id}/category/delete/{body['id']}", None, None, None
+
+def s_list_items(client, ctx, rng):
+    return "GET", f"/container/{pick(ctx, rng)['id']}/items", None, None, None
+
+def s_item_template(client, ctx, rng):
+    return "GET", f"/container/{pick(ctx, rng)['id']}/item/add", None, None, None
+
+def s_add_item(client, ctx, rng):
+    scratch = ctx["scratch"]
+    return "POST", f"/container/{scratch['container_id']}/item/add", new_item(scratch["category_id"], rng), None, None
+
+def s_get_item(client, ctx, rng):
+    container = pick(ctx, rng)
+    return "GET", f"/container/{container['id']}/item/update/{rng.choice(container['item_ids'])}", None, None, None
+
+def s_update_item(client, ctx, rng):
+    scratch = ctx["scratch"]
+    return "POST", f"/container/{scratch['container_id']}/item/update/{scratch['item_id']}", new_item(scratch["category_id"], rng), None, None
+
+def s_delete_item(client, ctx, rng):
+    scratch = ctx["scratch"]
+    _, body = client.json("POST", f"/container/{scratch['container_id']}/item/add", new_item(scratch["category_id"], rng))
+    return "DELETE", f"/container/{scratch['container_id']}/item/delete/{body['id']}", None, None, None
+
+def s_media(client, ctx, rng):
+    names = [name for c in ctx["dataset"]["containers"] for name in c["image_names"]] or ["not-image.png"]
+    return "GET", f"/media/{rng.choice(names)}", None, None, None
+
+def s_preview_image(client, ctx, rng):
+    body, content_type = multipart({}, {"image": ("bench.png", ctx["image"], "image/png")})
+    return "POST", "/upload/image/preview", body, {"Content-Type": content_type}, None
+
+def s_export(client, ctx, rng):
+    return "POST", "/export/containers", {"container_ids": [pick(ctx, rng)["id"]], "include_images": ctx["images"]}, None, None
+
+def s_export_preview(client, ctx, rng):
+    return "POST", "/export/preview", {"container_ids": [c["id"] for c in ctx["dataset"]["containers"]]}, None, None
+
+def s_import(client, ctx, rng):
+    body, content_type = multipart(
+        {"conflict_strategy": "replace"},
+        {"file": ("bench_export.json", ctx["export_file"], "application/json")}
+    )
+    return "POST", "/import/containers", body, {"Content-Type": content_type}, None
+
+
+SCENARIOS = [
+    ("user.login", s_login),
+    ("user.logout", s_logout),
+    ("user.get_current_user", s_user),
+    ("containers.list_containers", s_list_containers),
+    ("containers.get_container", s_get_container),
+    ("containers.add_container", s_add_container),
+    ("containers.update_container", s_update_container),
+    ("containers.delete_container", s_delete_container),
+    ("categories.list_categories", s_list_categories),
+    ("categories.add_category", s_add_category),
+    ("categories.update_category", s_update_category),
+    ("categories.delete_category", s_delete_category),
+    ("items.list_items_for_container", s_list_items),
+    ("items.add_item_template", s_item_template),
+    ("items.add_item", s_add_item),
+    ("items.get_item_by_id", s_get_item),
+    ("items.update_item", s_update_item),
+    ("items.delete_item", s_delete_item),
+    ("media.media", s_media),
+    ("media.preview_image", s_preview_image),
+    ("export_import.export_containers", s_export),
+    ("export_import.preview_export", s_export_preview),
+    ("export_import.import_containers", s_import),
+]
+
+
+def pick(ctx, rng):
+    return rng.choice(ctx["dataset"]["containers"])
+
+
+def new_item(category_id, rng):
+    return {
+        "owner": BENCH_USERNAME,
+        "name": f"Bench item {rng.randint(0, 10**6)}",
+        "value": round(rng.uniform(0, 100), 2),
+        "category": category_id,
+        "description": "benchmark item",
+        "tags": ["bench"],
+        "number": 1,
+    }
+
+
+# ========== RUNNER ==========
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def run_scenario(clients, ctx, scenario, duration, max_requests):
+    """Run one scenario with one thread per client, returns the route statistics"""
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+    budget = [max_requests]
+
+    def worker(client, seed_value):
+        rng = random.Random(seed_value)
+        local_latencies = []
+        local_statuses = {}
+        while time.perf_counter() < deadline:
+            if max_requests:
+                with lock:
+                    if budget[0] <= 0:
+                        break
+                    budget[0] -= 1
+            start = time.perf_counter()
+            try:
+                # A failing scenario (its setup request got an error) counts as an error, not a dead client
+                method, path, body, headers, cookies = scenario(client, ctx, rng)
+                start = time.perf_counter()
+                status, _, _ = client.request(method, path, body=body, headers=headers, cookies=cookies)
+            except Exception:
+                status = "error"
+            local_latencies.append(time.perf_counter() - start)
+            local_statuses[status] = local_statuses.get(status, 0) + 1
+        with lock:
+            latencies.extend(local_latencies)
+            for status, count in local_statuses.items():
+                statuses[status] = statuses.get(status, 0) + count
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(client, idx)) for idx, client in enumerate(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    errors = sum(count for status, count in statuses.items() if status == "error" or status >= 400)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "status_codes": {str(k): v for k, v in sorted(statuses.items(), key=lambda kv: str(kv[0]))},
+        "elapsed_s": round(elapsed, 3),
+        "requests_per_second": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else None,
+            "p50": ms(percentile(latencies, 50)),
+            "p95": ms(percentile(latencies, 95)),
+            "p99": ms(percentile(latencies, 99)),
+            "max": ms(latencies[-1] if latencies else None),
+        },
+    }
+
+
+def ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 3)
+
+
+def prepare_context(base_url, dataset, images):
+    """Create scratch data used by mutating scenarios and an export file for the import scenario"""
+    client = Client(base_url)
+    client.login(BENCH_USERNAME, BENCH_PASSWORD)
+    _, container = client.json("POST", "/container/add", {"name": f"Bench scratch {secrets.token_hex(4)}"})
+    _, category = client.json("POST", f"/container/{container['id']}/category/add", {"name": f"SCRATCH {secrets.token_hex(4)}"})
+    _, item = client.json("POST", f"/container/{container['id']}/item/add", new_item(category["id"], random.Random(0)))
+    status, _, export_file = client.request("POST", "/export/containers", {"container_ids": [container["id"]], "include_images": images})
+    if status != 200:
+        raise RuntimeError(f"Export for the import scenario failed (HTTP {status})")
+    client.close()
+    return {
+        "dataset": dataset,
+        "images": images,
+        "image": make_png(256, 256, 0),
+        "export_file": export_file,
+        "scratch": {"container_id": container["id"], "category_id": category["id"], "item_id": item["id"]},
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = ArgumentParser(description="HTTP benchmark of the LibStock API")
+    parser.add_argument("--base-url", default=os.getenv("BENCH_BASE_URL", "http://localhost:8000/api"))
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI", "mongodb://localhost:27017"))
+    parser.add_argument("--containers", type=int, default=2, help="N containers to seed")
+    parser.add_argument("--categories", type=int, default=5, help="M categories per container")
+    parser.add_argument("--items", type=int, default=100, help="K items per category")
+    parser.add_argument("--images", action="store_true", help="Seed an image per item")
+    parser.add_argument("--image-size", type=int, default=64, help="Seeded image width/height in pixels")
+    parser.add_argument("--no-seed", action="store_true", help="Reuse the dataset of a previous run (--dataset)")
+    parser.add_argument("--dataset", default="bench_dataset.json", help="Where the seeded identifiers are stored")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent clients")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per route")
+    parser.add_argument("--requests", type=int, default=0, help="Max requests per route (0: duration only)")
+    parser.add_argument("--routes", default="", help="Comma separated substrings of route names to run")
+    parser.add_argument("--output", default="-", help="JSON result file ('-' for stdout)")
+    args = parser.parse_args()
+
+    if args.no_seed:
+        with open(args.dataset) as f:
+            dataset = json.load(f)
+    else:
+        dataset = seed(args.mongo_uri, args.containers, args.categories, args.items, args.images, args.image_size)
+        with open(args.dataset, "w") as f:
+            json.dump(dataset, f)
+
+    ctx = prepare_context(args.base_url, dataset, args.images)
+    clients = [Client(args.base_url) for _ in range(args.concurrency)]
+    for client in clients:
+        client.login(BENCH_USERNAME, BENCH_PASSWORD)
+
+    selected = [s.strip() for s in args.routes.split(",") if s.strip()]
+    routes = {}
+    for name, scenario in SCENARIOS:
+        if selected and not any(s in name for s in selected):
+            continue
+        routes[name] = run_scenario(clients, ctx, scenario, args.duration, args.requests)
+        print(f"{name:45s} {routes[name]['requests_per_second']:>10} req/s  p95 {routes[name]['latency_ms']['p95']} ms", file=sys.stderr, flush=True)
+
+    for client in clients:
+        client.close()
+
+    result = {
+        "meta": {
+            "commit": git_commit(),
+            "date": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "base_url": args.base_url,
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "dataset": {
+                "containers": args.containers,
+                "categories": args.categories,
+                "items_per_category": args.items,
+                "images": args.images,
+                "image_size": args.image_size,
+            },
+        },
+        "routes": routes,
+    }
+    if args.output == "-":
+        print(json.dumps(result, indent=2))
+    else:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
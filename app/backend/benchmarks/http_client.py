@@ -0,0 +1,91 @@
+import http.client
+import json
+import secrets
+from http.cookies import SimpleCookie
+from urllib.parse import urlsplit
+
+
+class Client:
+    """Minimal keep-alive HTTP client with a cookie jar (one per benchmark thread)"""
+
+    def __init__(self, base_url, timeout=30):
+        url = urlsplit(base_url)
+        self.scheme = url.scheme
+        self.host = url.hostname
+        self.port = url.port
+        self.prefix = url.path.rstrip("/")
+        self.timeout = timeout
+        self.cookies = {}
+        self.conn = None
+
+    def _connect(self):
+        if self.scheme == "https":
+            import ssl
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout, context=ssl._create_unverified_context())
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def request(self, method, path, body=None, headers=None, cookies=None):
+        """Send a request, returns (status, headers, body bytes)"""
+        headers = dict(headers or {})
+        jar = self.cookies if cookies is None else cookies
+        if jar:
+            headers["Cookie"] = "; ".join(f"{k}={v}" for k, v in jar.items())
+        if body is not None and not isinstance(body, (bytes, str)):
+            body = json.dumps(body)
+            headers.setdefault("Content-Type", "application/json")
+
+        for attempt in range(2):
+            if self.conn is None:
+                self.conn = self._connect()
+            try:
+                self.conn.request(method, self.prefix + path, body=body, headers=headers)
+                response = self.conn.getresponse()
+                data = response.read()
+                break
+            except (http.client.HTTPException, ConnectionError):
+                # Server closed the keep-alive connection, reconnect once
+                self.conn.close()
+                self.conn = None
+                if attempt:
+                    raise
+
+        for header in response.msg.get_all("Set-Cookie") or []:
+            cookie = SimpleCookie()
+            cookie.load(header)
+            for key, morsel in cookie.items():
+                jar[key] = morsel.value
+        return response.status, response.msg, data
+
+    def json(self, method, path, body=None, cookies=None):
+        status, _, data = self.request(method, path, body=body, cookies=cookies)
+        try:
+            return status, json.loads(data) if data else None
+        except ValueError:
+            return status, None
+
+    def login(self, username, password, cookies=None):
+        status, _ = self.json("POST", "/login", {"username": username, "password": password}, cookies=cookies)
+        if status != 200:
+            raise RuntimeError(f"Login failed for {username!r} (HTTP {status})")
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+def multipart(fields, files):
+    """Encode form fields and files as multipart/form-data, returns (body, content type)"""
+    boundary = secrets.token_hex(16)
+    parts = []
+    for name, value in fields.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        )
+    for name, (filename, content, content_type) in files.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f'Content-Type: {content_type}\r\n\r\n'.encode() + content + b"\r\n"
+        )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
@@ -0,0 +1,130 @@
+"""Import write throughput per write concern profile
+
+Imports the same synthetic export file (one container, replacing the previous
+run's copy) for the `bench` user with each profile `<w>:<batch size>`, where
+`w` is MONGO_BULK_WRITE_CONCERN and the batch size the items per insert. Every
+run ends with the majority acknowledged checkpoint of `apply_import`.
+
+    python -m benchmarks.import_bench --items 5000 --runs 3 --output import.json
+"""
+import datetime
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from argparse import ArgumentParser
+from pymongo import ReturnDocument
+from app.db import db, reset_client
+from app.api.utils.importer import plan_import, apply_import
+from benchmarks.http_bench import git_commit
+from benchmarks.seed import clear_bench_data, random_text, BENCH_USERNAME, CONDITIONS, WORDS
+
+# Per-document majority writes (the previous import), majority batches, w=1 batches
+DEFAULT_PROFILES = "majority:1,majority:500,1:500"
+
+
+def make_import(categories, items, seed_value=0):
+    """Export file with one container of `categories` x `items` items"""
+    rng = random.Random(seed_value)
+    category_ids = [f"c{index}" for index in range(categories)]
+    return {
+        "version": "1.0",
+        "containers": [{
+            "temp_id": "bench",
+            "name": "Import bench",
+            "categories": [{"temp_id": temp_id, "name": f"IMPORT CATEGORY {index + 1}"} for index, temp_id in enumerate(category_ids)],
+            "items": [
+                {
+                    "category_temp_id": category_id,
+                    "name": random_text(rng, 3).title(),
+                    "owner": BENCH_USERNAME,
+                    "serie": random_text(rng, 2),
+                    "description": random_text(rng, 40),
+                    "value": round(rng.uniform(0, 500), 2),
+                    "location": random_text(rng, 2),
+                    "tags": rng.sample(WORDS, 3),
+                    "condition": rng.choice(CONDITIONS),
+                    "number": rng.randint(1, 5),
+                    "edition": random_text(rng, 1),
+                }
+                for category_id in category_ids
+                for _ in range(items)
+            ],
+        }],
+    }
+
+
+def run_profile(import_data, user_id, w, batch_size, runs):
+    os.environ["MONGO_BULK_WRITE_CONCERN"] = w
+    reset_client()  # The bulk database is rebuilt with the new write concern
+
+    def run():
+        # Replaces the container imported by the previous run (purge + load)
+        plan = plan_import(import_data, user_id, "replace")
+        apply_import(import_data, plan, user_id, BENCH_USERNAME, batch_size=batch_size)
+
+    run()  # Warm up: connections, first container
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        run()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def main():
+    parser = ArgumentParser(description="Import write throughput per write concern profile")
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI", "mongodb://localhost:27017"))
+    parser.add_argument("--categories", type=int, default=5)
+    parser.add_argument("--items", type=int, default=1000, help="Items per category")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--profiles", default=DEFAULT_PROFILES, help="Comma separated <w>:<batch size>")
+    parser.add_argument("--output", default="-", help="JSON result file ('-' for stdout)")
+    args = parser.parse_args()
+
+    # Before the first query: the backend connects to MONGO_URI
+    os.environ["MONGO_URI"] = args.mongo_uri
+
+    user = db.users.find_one_and_update(
+        {"username": BENCH_USERNAME},
+        {"$setOnInsert": {"username": BENCH_USERNAME, "role": "user"}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    import_data = make_import(args.categories, args.items)
+    total_items = args.categories * args.items
+
+    profiles = {}
+    try:
+        for profile in args.profiles.split(","):
+            w, batch_size = profile.split(":")
+            durations = run_profile(import_data, user["_id"], w, int(batch_size), args.runs)
+            median = statistics.median(durations)
+            profiles[f"w={w} batch={batch_size}"] = {
+                "seconds": {"min": round(min(durations), 3), "median": round(median, 3), "max": round(max(durations), 3)},
+                "items_per_second": round(total_items / median, 1),
+            }
+    finally:
+        clear_bench_data(db, user["_id"])
+
+    result = {
+        "meta": {
+            "commit": git_commit(),
+            "date": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "python": sys.version.split()[0],
+            "runs": args.runs,
+            "items": total_items,
+        },
+        "profiles": profiles,
+    }
+    if args.output == "-":
+        print(json.dumps(result, indent=2))
+    else:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
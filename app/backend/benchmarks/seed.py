@@ -0,0 +1,125 @@
+import datetime
+import random
+import secrets
+import struct
+import zlib
+import bcrypt
+from pymongo import MongoClient
+from app.db import ensure_indexes
+from app import storage
+from app.api.utils import memberships
+
+BENCH_USERNAME = "bench"
+BENCH_PASSWORD = "bench-password"
+CONDITIONS = ["New", "Very Good", "Good", "Used", "Damaged", "Heavily Damaged"]
+WORDS = [
+    "die", "hard", "retour", "enfer", "zelda", "mario", "kart", "switch", "atlas", "carte",
+    "volume", "edition", "collector", "deluxe", "gold", "blue", "red", "green", "box", "tome",
+    "saga", "legend", "star", "wars", "guide", "manual", "vinyl", "poster", "figure", "card",
+]
+
+
+def make_png(width=64, height=64, seed=None):
+    """Build a random RGB PNG without any imaging dependency"""
+    rng = random.Random(seed)
+    rows = b"".join(b"\x00" + bytes(rng.getrandbits(8) for _ in range(width * 3)) for _ in range(height))
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(rows)) + chunk(b"IEND", b"")
+
+
+def random_text(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def clear_bench_data(db, user_id):
+    """Remove every container (and its content) administered by the bench user"""
+    container_ids = memberships.admin_container_ids(user_id, db)
+    images = [
+        item["image_path"]
+        for item in db.items.find({"container_id": {"$in": container_ids}, "image_path": {"$ne": "not-image.png"}}, {"image_path": 1})
+        if item.get("image_path")
+    ]
+    for name in images:
+        storage.media.delete(name)
+    db.items.delete_many({"container_id": {"$in": container_ids}})
+    db.categories.delete_many({"container_id": {"$in": container_ids}})
+    db.containers.delete_many({"_id": {"$in": container_ids}})
+    db.memberships.delete_many({"container_id": {"$in": container_ids}})
+
+
+def seed(mongo_uri, containers=2, categories=5, items=100, images=False, image_size=64, seed_value=0):
+    """Seed the bench user with containers x categories x items synthetic data
+
+    Returns the identifiers the HTTP scenarios need.
+    """
+    rng = random.Random(seed_value)
+    client = MongoClient(mongo_uri)
+    db = client["app"]
+    ensure_indexes(db)
+
+    password_hash = bcrypt.hashpw(BENCH_PASSWORD.encode(), bcrypt.gensalt()).decode()
+    db.users.update_one(
+        {"username": BENCH_USERNAME},
+        {"$set": {"password": password_hash, "role": "user"}},
+        upsert=True
+    )
+    user_id = db.users.find_one({"username": BENCH_USERNAME})["_id"]
+    clear_bench_data(db, user_id)
+
+    dataset = {"containers": []}
+    now = datetime.datetime.now(datetime.timezone.utc)
+    for c_idx in range(containers):
+        container_id = db.containers.insert_one({
+            "name": f"Bench container {c_idx + 1}",
+            "admin_id": user_id,
+            "admin_count": 1,
+        }).inserted_id
+        db.memberships.insert_one(memberships.membership(container_id, user_id, memberships.ADMIN))
+        category_ids = db.categories.insert_many([
+            {"name": f"BENCH CATEGORY {cat_idx + 1}", "container_id": container_id}
+            for cat_idx in range(categories)
+        ]).inserted_ids
+
+        docs = []
+        image_names = []
+        for category_id in category_ids:
+            for _ in range(items):
+                image_path = "not-image.png"
+                if images:
+                    image_path = secrets.token_hex(16) + ".png"
+                    storage.media.save(image_path, make_png(image_size, image_size, rng.random()))
+                    image_names.append(image_path)
+                docs.append({
+                    "container_id": container_id,
+                    "category_id": category_id,
+                    "owner": BENCH_USERNAME,
+                    "name": random_text(rng, 3).title(),
+                    "serie": random_text(rng, 2),
+                    "description": random_text(rng, 40),
+                    "value": round(rng.uniform(0, 500), 2),
+                    "date_created": "2024-01-15",
+                    "date_added": now,
+                    "location": random_text(rng, 2),
+                    "creator": BENCH_USERNAME,
+                    "tags": rng.sample(WORDS, 3),
+                    "image_path": image_path,
+                    "comment": random_text(rng, 10),
+                    "condition": rng.choice(CONDITIONS),
+                    "number": rng.randint(1, 5),
+                    "edition": random_text(rng, 1),
+                })
+        item_ids = db.items.insert_many(docs).inserted_ids if docs else []
+
+        dataset["containers"].append({
+            "id": str(container_id),
+            "category_ids": [str(cid) for cid in category_ids],
+            "item_ids": [str(iid) for iid in item_ids],
+            "image_names": image_names,
+        })
+
+    client.close()
+    return dataset
@@ -0,0 +1,110 @@
+"""Startup cost of the backend: `import app` and `create_app()`
+
+Each sample runs in a fresh interpreter with an unreachable MongoDB, so the
+numbers also prove that starting a worker does not touch the database.
+
+    python -m benchmarks.startup_bench --runs 10 --output startup.json
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import datetime
+from argparse import ArgumentParser
+from pathlib import Path
+from benchmarks.http_bench import git_commit
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+PROBE = """
+import json, time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+application = app.create_app(debug={debug})
+t2 = time.perf_counter()
+import app.db
+print(json.dumps({{
+    "import_ms": (t1 - t0) * 1000,
+    "create_app_ms": (t2 - t1) * 1000,
+    "mongo_client_created": app.db._client is not None,
+    "flasgger_imported": "flasgger" in __import__("sys").modules,
+}}))
+"""
+
+
+def sample(debug, env):
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE.format(debug=debug)],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def summary(values):
+    return {
+        "min": round(min(values), 2),
+        "median": round(statistics.median(values), 2),
+        "max": round(max(values), 2),
+    }
+
+
+def import_profile(env, top):
+    """Slowest modules by cumulative import time (python -X importtime)"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app; app.create_app()"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append({
+            "module": name.strip(),
+            "cumulative_ms": round(int(cumulative_us) / 1000, 2),
+            "self_ms": round(int(self_us) / 1000, 2),
+        })
+    rows.sort(key=lambda row: row["cumulative_ms"], reverse=True)
+    return rows[:top]
+
+
+def main():
+    parser = ArgumentParser(description="Startup benchmark of the LibStock backend")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--debug", action="store_true", help="Measure create_app(debug=True)")
+    parser.add_argument("--top", type=int, default=15, help="Slowest imports to report")
+    parser.add_argument("--output", default="-", help="JSON result file ('-' for stdout)")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    # Unroutable database: a connection attempt at startup would hang or fail the probe
+    env["MONGO_URI"] = "mongodb://192.0.2.1:27017/?serverSelectionTimeoutMS=1"
+    env.setdefault("REACT_HOST_ORIGIN", "http://localhost:3000")
+    env.setdefault("APP_SECRET_KEY", "startup-bench")
+
+    samples = [sample(args.debug, env) for _ in range(args.runs)]
+    result = {
+        "meta": {
+            "commit": git_commit(),
+            "date": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "python": sys.version.split()[0],
+            "runs": args.runs,
+            "debug": args.debug,
+        },
+        "import_ms": summary([s["import_ms"] for s in samples]),
+        "create_app_ms": summary([s["create_app_ms"] for s in samples]),
+        "mongo_client_created": any(s["mongo_client_created"] for s in samples),
+        "flasgger_imported": any(s["flasgger_imported"] for s in samples),
+        "slowest_imports": import_profile(env, args.top),
+    }
+    if args.output == "-":
+        print(json.dumps(result, indent=2))
+    else:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
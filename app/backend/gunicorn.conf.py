@@ -0,0 +1,44 @@
+import multiprocessing
+import os
+import sys
+
+# Gunicorn configuration, server profile is selected with GUNICORN_PROFILE:
+#   sync     - one request at a time per worker process (default)
+#   threaded - gthread workers, GUNICORN_THREADS requests per worker process
+#   gevent   - cooperative greenlets, GUNICORN_WORKER_CONNECTIONS per worker process
+# The MongoClient is created lazily in each worker (see app/db.py), keep
+# MONGO_MAX_POOL_SIZE >= the per-worker concurrency of the chosen profile.
+
+PROFILES = ("sync", "threaded", "gevent")
+
+profile = os.getenv("GUNICORN_PROFILE", "sync")
+if profile not in PROFILES:
+    print(f"Error: unknown GUNICORN_PROFILE {profile!r} (expected one of {', '.join(PROFILES)})")
+    sys.exit(1)
+
+cores = multiprocessing.cpu_count()
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+capture_output = True
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 60))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+
+if profile == "sync":
+    worker_class = "sync"
+    workers = int(os.getenv("GUNICORN_WORKERS", cores * 2 + 1))
+elif profile == "threaded":
+    worker_class = "gthread"
+    workers = int(os.getenv("GUNICORN_WORKERS", cores + 1))
+    threads = int(os.getenv("GUNICORN_THREADS", 8))
+elif profile == "gevent":
+    worker_class = "gevent"
+    workers = int(os.getenv("GUNICORN_WORKERS", cores))
+    worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", 100))
+
+
+def child_exit(server, worker):
+    # Prometheus multiprocess mode: drop the live gauges of the exited worker
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,79 @@
+import os
+
+os.environ.setdefault("APP_SECRET_KEY", "test-secret")
+os.environ.setdefault("REACT_HOST_ORIGIN", "http://localhost:3000")
+
+import bcrypt
+import pytest
+from app import create_app, storage
+from app import db as app_db
+from app.storage import LocalStorage
+
+pytest_plugins = ["app.testing"]
+
+# MONGO_TEST_URI: disposable MongoDB (its `app` database is dropped by every test).
+# Without it the tests run on mongomock, and those needing a real server are skipped.
+MONGO_TEST_URI = os.getenv("MONGO_TEST_URI")
+PASSWORD = "password"
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "requires_mongod: needs MONGO_TEST_URI (bulk write concerns, bulk_write, command monitoring)")
+
+
+def pytest_collection_modifyitems(config, items):
+    if MONGO_TEST_URI:
+        return
+    skip = pytest.mark.skip(reason="MONGO_TEST_URI not set (mongomock)")
+    for item in items:
+        if "requires_mongod" in item.keywords:
+            item.add_marker(skip)
+
+
+@pytest.fixture
+def database(monkeypatch):
+    """Empty application database"""
+    if MONGO_TEST_URI:
+        monkeypatch.setenv("MONGO_URI", MONGO_TEST_URI)
+    else:
+        mongomock = pytest.importorskip("mongomock")
+        client = mongomock.MongoClient()
+        monkeypatch.setattr(app_db, "get_mongo_client", lambda: client)
+    app_db.reset_client()
+    app_db.get_client().drop_database("app")
+    yield app_db.get_db()
+    app_db.reset_client()
+
+
+@pytest.fixture
+def media(tmp_path, monkeypatch):
+    """Local media storages in a temporary folder"""
+    for area in ("media", "staged", "quarantine", "thumbnails"):
+        monkeypatch.setattr(storage, area, LocalStorage(tmp_path / area))
+    return storage
+
+
+@pytest.fixture
+def app(database, media):
+    return create_app(debug=True)
+
+
+@pytest.fixture
+def make_user(database):
+    hashed = bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt(4)).decode()
+
+    def make(username):
+        return database.users.insert_one({"username": username, "password": hashed}).inserted_id
+    return make
+
+
+@pytest.fixture
+def login(app, make_user):
+    """login(username) -> (test client of a new user logged in, user id)"""
+    def log_in(username):
+        user_id = make_user(username)
+        client = app.test_client()
+        response = client.post("/api/login", json={"username": username, "password": PASSWORD})
+        assert response.status_code == 200, response.get_json()
+        return client, user_id
+    return log_in
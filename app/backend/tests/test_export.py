@@ -0,0 +1,76 @@
+import datetime
+import json
+import pytest
+from app.api.utils import changes
+
+
+def export(client, container_id, since=None):
+    response = client.post("/api/export/containers", json={"container_ids": [container_id], "include_images": False, "since": since})
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return json.loads(response.get_data())
+
+
+@pytest.fixture
+def films(login):
+    client, _ = login("alice")
+    container_id = client.post("/api/container/add", json={"name": "Films"}).get_json()["id"]
+    category_id = client.post(f"/api/container/{container_id}/category/add", json={"name": "DVD"}).get_json()["id"]
+
+    def add_item(name):
+        response = client.post(f"/api/container/{container_id}/item/add", json={"owner": "alice", "name": name, "value": 1, "category": category_id})
+        return response.get_json()["id"]
+    return client, container_id, add_item
+
+
+def backdate(database, minutes):
+    """Move the changes made so far before the next export"""
+    delta = datetime.timedelta(minutes=minutes)
+    for item in database.items.find({}, {"updated_at": 1}):
+        database.items.update_one({"_id": item["_id"]}, {"$set": {"updated_at": item["updated_at"] - delta}})
+    for tombstone in database.deletions.find({}, {"deleted_at": 1}):
+        database.deletions.update_one({"_id": tombstone["_id"]}, {"$set": {"deleted_at": tombstone["deleted_at"] - delta}})
+
+
+def test_delta_exports_chain_the_changes(films, database):
+    client, container_id, add_item = films
+    alien, heat = add_item("Alien"), add_item("Heat")
+    backdate(database, 10)
+    full = export(client, container_id)
+    assert full["kind"] == "full"
+    assert sorted(item["name"] for item in full["containers"][0]["items"]) == ["Alien", "Heat"]
+
+    add_item("Ran")
+    assert client.delete(f"/api/container/{container_id}/item/delete/{heat}").status_code == 200
+    delta = export(client, container_id, since=full["export_id"])
+
+    assert (delta["kind"], delta["base_export_id"]) == ("delta", full["export_id"])
+    films_delta = delta["containers"][0]
+    assert [item["name"] for item in films_delta["items"]] == ["Ran"]
+    assert heat in json.dumps(films_delta)
+    assert alien not in json.dumps(films_delta)
+
+    # The next delta starts at the previous one
+    backdate(database, 1)
+    add_item("Kagemusha")
+    films_delta = export(client, container_id, since=delta["export_id"])["containers"][0]
+    assert [item["name"] for item in films_delta["items"]] == ["Kagemusha"]
+    assert heat not in json.dumps(films_delta)
+
+
+def test_unknown_or_foreign_baselines_are_rejected(films, login):
+    client, container_id, _ = films
+    full = export(client, container_id)
+    bob, _ = login("bob")
+    bob_container = bob.post("/api/container/add", json={"name": "Livres"}).get_json()["id"]
+
+    response = bob.post("/api/export/containers", json={"container_ids": [bob_container], "since": full["export_id"]})
+    assert response.status_code == 400
+    response = client.post("/api/export/containers", json={"container_ids": [container_id], "since": "yesterday"})
+    assert response.status_code == 400
+
+
+def test_exports_expire_with_the_tombstones(database):
+    expiry = {index["name"]: index.get("expireAfterSeconds") for index in database.exports.list_indexes()}
+    tombstones = {index["name"]: index.get("expireAfterSeconds") for index in database.deletions.list_indexes()}
+
+    assert expiry["export_expiry"] == tombstones["deletion_expiry"] == int(changes.TOMBSTONE_DAYS * 86400)
@@ -0,0 +1,25 @@
+import io
+import pytest
+from PIL import Image
+from app.api.utils import images
+
+
+def png(width, height):
+    out = io.BytesIO()
+    Image.new("RGB", (width, height), "red").save(out, "PNG")
+    return out.getvalue()
+
+
+@pytest.mark.filterwarnings("ignore::PIL.Image.DecompressionBombWarning")
+def test_images_over_the_pixel_limit_are_refused(monkeypatch):
+    monkeypatch.setattr(images, "IMAGE_MAX_PIXELS", 1000)
+
+    # 1600 pixels: Pillow would only warn below twice the limit
+    with pytest.raises(images.InvalidImage, match="Image too large"):
+        images.normalize(png(40, 40))
+    assert images.normalize(png(30, 30))[1] == images.EXTENSIONS[images.IMAGE_FORMAT]
+
+
+def test_non_images_are_refused():
+    with pytest.raises(images.InvalidImage):
+        images.normalize(b"not an image")
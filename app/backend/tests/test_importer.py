@@ -0,0 +1,115 @@
+import gzip
+import io
+import json
+import pytest
+from bson import ObjectId
+from app.api.utils import jsonstream
+from app.api.utils.importer import plan_import, read_export
+from app.compression import decompressing_reader
+
+EXPORT = {
+    "version": "1.0",
+    "export_id": "baseline",
+    "containers": [
+        {
+            "name": "Films",
+            "categories": [{"temp_id": "a", "name": "DVD"}, {"temp_id": "b", "name": "dvd"}, {"temp_id": "c", "name": "Blu-ray"}],
+            "items": [
+                {"name": "Alien", "category_temp_id": "a", "value": 12.5},
+                {"name": 5, "category_temp_id": "a"},
+                {"name": "Heat", "category_temp_id": "b"},
+                {"name": "Ran", "category_temp_id": "c", "tags": ["kurosawa"]},
+            ],
+        },
+        {"name": "Livres", "categories": [], "items": []},
+    ],
+}
+
+
+def test_plan_skips_case_insensitive_duplicate_categories(database):
+    plan = plan_import(EXPORT, ObjectId())
+    films = plan["containers"][0]
+
+    assert films["skipped_categories"] == [{"index": 1, "name": "dvd", "reason": "Duplicate category name"}]
+    assert films["categories"] == 2
+    # Items of the skipped category are skipped with it
+    assert [(skipped["index"], skipped["reason"]) for skipped in films["skipped_items"]] == [
+        (1, "Item name must be a string"),
+        (2, "Unknown category"),
+    ]
+    assert films["items"] == 2
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_streamed_export_plans_like_the_loaded_one(database, compress):
+    raw = json.dumps(EXPORT, indent=1).encode()
+    if compress:
+        raw = gzip.compress(raw)
+    user_id = ObjectId()
+
+    header, containers = read_export(decompressing_reader(io.BytesIO(raw)))
+
+    assert header == {"version": "1.0", "export_id": "baseline"}
+    assert plan_import({"containers": containers}, user_id) == plan_import(EXPORT, user_id)
+
+
+def test_streamed_items_are_read_lazily_and_skipped_when_unused():
+    raw = json.dumps(EXPORT).encode()
+    _, containers = read_export(io.BytesIO(raw))
+
+    films = next(containers)
+    assert not isinstance(films["items"], list)
+    assert next(films["items"])["name"] == "Alien"
+    # The rest of the items is skipped when moving to the next container
+    assert next(containers)["name"] == "Livres"
+    assert next(containers, None) is None
+
+
+@pytest.mark.parametrize("read_size", [1, 2, 3, 7])
+def test_reader_decodes_values_cut_by_reads(read_size):
+    value = {"a": [1.5, -20, 3e-7, "é\"\\", None, True, {"b": []}], "c": 12345678901234567890, "d": {}}
+    reader = jsonstream.Reader(io.BytesIO(json.dumps(value).encode()), read_size=read_size)
+
+    assert {key: reader.value() for key in reader.fields()} == value
+
+
+def test_reader_rejects_invalid_json():
+    reader = jsonstream.Reader(io.BytesIO(b'{"a": 1 "b": 2}'))
+    with pytest.raises(ValueError):
+        {key: reader.value() for key in reader.fields()}
+
+
+@pytest.mark.requires_mongod
+def test_import_writes_the_valid_part_of_the_file(login, database):
+    client, _ = login("alice")
+    response = client.post(
+        "/api/import/containers",
+        data={"file": (io.BytesIO(json.dumps(EXPORT).encode()), "export.json")},
+        content_type="multipart/form-data",
+    )
+
+    assert response.status_code == 201, response.get_json()
+    films = response.get_json()["imported_containers"][0]
+    assert (films["categories_count"], films["items_count"]) == (2, 2)
+    assert database.categories.count_documents({}) == 2
+    assert sorted(database.items.distinct("name")) == ["Alien", "Ran"]
+
+
+@pytest.mark.requires_mongod
+def test_invalid_images_are_reported_and_not_kept(login, database, media):
+    client, _ = login("alice")
+    export = {"version": "1.0", "containers": [{
+        "name": "Films",
+        "categories": [{"temp_id": "a", "name": "DVD"}],
+        "items": [{"name": "Alien", "category_temp_id": "a", "image_path": "exporter-file.jpg", "image_data": "bm90IGFuIGltYWdl"}],
+    }]}
+    response = client.post(
+        "/api/import/containers",
+        data={"file": (io.BytesIO(json.dumps(export).encode()), "export.json")},
+        content_type="multipart/form-data",
+    )
+
+    assert response.status_code == 201, response.get_json()
+    invalid = response.get_json()["imported_containers"][0]["invalid_images"]
+    assert [(entry["index"], entry["name"]) for entry in invalid] == [(0, "Alien")]
+    assert database.items.find_one()["image_path"] == "not-image.png"
@@ -0,0 +1,96 @@
+import datetime
+from concurrent.futures.process import BrokenProcessPool
+import pytest
+from bson import ObjectId
+from app.api.utils import images, phash
+
+IMAGE_HASH = "00ff00ff00ff00ff"
+
+
+@pytest.fixture
+def container(login):
+    """(client of the admin, user id, container id, category id)"""
+    client, user_id = login("alice")
+    container_id = client.post("/api/container/add", json={"name": "Films"}).get_json()["id"]
+    category_id = client.post(f"/api/container/{container_id}/category/add", json={"name": "DVD"}).get_json()["id"]
+    return client, user_id, container_id, category_id
+
+
+def item_payload(category_id, **fields):
+    return {"owner": "alice", "name": "Alien", "value": 12, "category": category_id, **fields}
+
+
+def stage(media, database, user_id, image_hash=IMAGE_HASH):
+    """Staged image token of the user, as the upload preview makes it"""
+    token = ObjectId().binary.hex()
+    media.staged.save(images.staged_name(token, ".jpg"), b"image")
+    database.staged_images.insert_one({
+        "_id": token,
+        "user_id": user_id,
+        "extension": ".jpg",
+        "size": 5,
+        "image_hash": image_hash,
+        "expires_at": datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(minutes=10),
+    })
+    return token
+
+
+def test_staged_image_token_is_claimed_once_by_its_user(container, login, media, database):
+    client, user_id, container_id, category_id = container
+    token = stage(media, database, user_id)
+    bob, _ = login("bob")
+    client.post(f"/api/container/{container_id}/members", json={"username": "bob"})
+
+    response = bob.post(f"/api/container/{container_id}/item/add", json=item_payload(category_id, image_token=token))
+    assert response.status_code == 400
+
+    response = client.post(f"/api/container/{container_id}/item/add", json=item_payload(category_id, image_token=token))
+    assert response.status_code == 201
+    item = database.items.find_one({"_id": ObjectId(response.get_json()["id"])})
+    assert media.media.exists(item["image_path"])
+    assert item["image_hash"] == IMAGE_HASH
+    assert item["image_hash_bands"] == phash.band_keys(IMAGE_HASH)
+
+    response = client.post(f"/api/container/{container_id}/item/add", json=item_payload(category_id, image_token=token))
+    assert response.status_code == 400
+
+
+def test_update_without_image_clears_the_image_hash(container, media, database):
+    client, user_id, container_id, category_id = container
+    token = stage(media, database, user_id)
+    item_id = client.post(f"/api/container/{container_id}/item/add", json=item_payload(category_id, image_token=token)).get_json()["id"]
+
+    response = client.post(f"/api/container/{container_id}/item/update/{item_id}", json=item_payload(category_id, name="Aliens"))
+
+    assert response.status_code == 200
+    item = database.items.find_one({"_id": ObjectId(item_id)})
+    assert item["image_path"] == "not-image.png"
+    assert (item["image_hash"], item["image_hash_bands"]) == (None, [])
+
+
+@pytest.mark.parametrize("name", [5, None, ["Alien"]])
+def test_non_string_item_names_are_rejected(container, database, name):
+    client, _, container_id, category_id = container
+    item_id = client.post(f"/api/container/{container_id}/item/add", json=item_payload(category_id)).get_json()["id"]
+
+    assert client.post(f"/api/container/{container_id}/item/add", json=item_payload(category_id, name=name)).status_code == 400
+    response = client.post(f"/api/container/{container_id}/item/update/{item_id}", json=item_payload(category_id, name=name))
+    assert response.status_code == 400
+    assert database.items.count_documents({}) == 1
+
+
+class BrokenPool:
+    def submit(self, fn, *args):
+        raise BrokenProcessPool("A process in the process pool was terminated abruptly")
+
+
+def test_image_pool_failure_does_not_store_the_item(container, database, monkeypatch):
+    client, _, container_id, category_id = container
+    monkeypatch.setattr(images, "_gevent_threadpool", lambda: None)
+    monkeypatch.setattr(images, "_get_pool", lambda: BrokenPool())
+
+    response = client.post(f"/api/container/{container_id}/item/add", json=item_payload(category_id, image_data="aW1hZ2U="))
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "5"
+    assert database.items.count_documents({}) == 0
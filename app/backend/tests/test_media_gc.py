@@ -0,0 +1,61 @@
+import os
+import time
+from app import media_gc
+from app.api.utils import images
+
+OLD = time.time() - 48 * 3600
+
+
+def save_old(area, name, data=b"image"):
+    area.save(name, data)
+    os.utime(area.path(name), (OLD, OLD))
+
+
+def test_quarantined_files_are_kept_for_the_quarantine_period(database, media):
+    save_old(media.media, "orphan.jpg")
+    save_old(media.media, "used.jpg")
+    database.items.insert_one({"name": "Alien", "image_path": "used.jpg"})
+
+    report = media_gc.collect(grace_hours=24, mode="quarantine")
+
+    assert (report["scanned"], report["orphans"]) == (2, 1)
+    assert [name for name, _ in media.media.iter_files()] == ["used.jpg"]
+    # Dated by the move: not purged with the files quarantined days ago
+    assert media_gc.purge_quarantine(1) == 0
+    assert media.quarantine.exists("orphan.jpg")
+
+
+def test_quarantine_keeps_files_of_the_same_name(database, media):
+    save_old(media.quarantine, "orphan.jpg", b"first")
+    save_old(media.media, "orphan.jpg", b"second")
+
+    media_gc.collect(grace_hours=24, mode="quarantine")
+
+    assert media.quarantine.path("orphan.jpg").read_bytes() == b"first"
+    assert media.quarantine.path("orphan-1.jpg").read_bytes() == b"second"
+    assert media_gc.purge_quarantine(1) == len(b"first")
+
+
+def test_recent_files_are_not_collected(database, media):
+    media.media.save("uploading.jpg", b"image")
+
+    report = media_gc.collect(grace_hours=24, mode="delete")
+
+    assert report["orphans"] == 0
+    assert media.media.exists("uploading.jpg")
+
+
+def test_thumbnails_gc_maps_names_to_their_source(database, media):
+    database.items.insert_one({"name": "Alien", "image_path": "used_image.jpg"})
+    for name in ("200_used_image.jpg", "200_orphan.jpg", "notes.txt", "large_file.jpg"):
+        save_old(media.thumbnails, name)
+
+    media_gc.collect(media.thumbnails, 24, "delete", image_name=images.source_name)
+
+    assert [name for name, _ in media.thumbnails.iter_files()] == ["200_used_image.jpg"]
+
+
+def test_source_name():
+    assert images.source_name("200_photo_1.jpg") == "photo_1.jpg"
+    assert images.source_name("photo.jpg") == "photo.jpg"
+    assert images.source_name("large_photo.jpg") == "large_photo.jpg"
@@ -0,0 +1,111 @@
+import pytest
+from bson import ObjectId
+from app.api.utils import memberships
+from app.api.utils.importer import plan_import
+
+
+def add_container(client, name="Films"):
+    response = client.post("/api/container/add", json={"name": name})
+    assert response.status_code == 201
+    return response.get_json()["id"]
+
+
+def test_creator_is_the_only_admin(login, database):
+    alice, alice_id = login("alice")
+    container_id = add_container(alice)
+
+    container = database.containers.find_one({"_id": ObjectId(container_id)})
+    assert "member_ids" not in container
+    assert container["admin_count"] == 1
+    assert alice.get("/api/containers").get_json()[0]["role"] == "admin"
+    assert memberships.has_access(ObjectId(container_id), alice_id, [memberships.ADMIN])
+
+
+def test_members_get_access_and_admins_manage_them(login):
+    alice, _ = login("alice")
+    bob, bob_id = login("bob")
+    login("carol")
+    container_id = add_container(alice)
+
+    assert bob.get(f"/api/container/{container_id}").status_code == 403
+    assert alice.post(f"/api/container/{container_id}/members", json={"username": "bob"}).status_code == 201
+    assert alice.post(f"/api/container/{container_id}/members", json={"username": "bob"}).status_code == 409
+    assert alice.post(f"/api/container/{container_id}/members", json={"username": "nobody"}).status_code == 404
+    assert bob.get(f"/api/container/{container_id}").status_code == 200
+
+    # Members can neither manage members nor delete the container
+    assert bob.post(f"/api/container/{container_id}/members", json={"username": "carol"}).status_code == 403
+    assert bob.delete(f"/api/container/delete/{container_id}").status_code == 403
+
+    members = alice.get(f"/api/container/{container_id}/members").get_json()
+    assert members["total"] == 2
+    assert [member["role"] for member in members["members"]] == ["admin", "member"]
+
+    assert bob.delete(f"/api/container/{container_id}/members/{bob_id}").status_code == 200
+    assert bob.get(f"/api/container/{container_id}").status_code == 403
+
+
+def test_last_admin_cannot_leave_or_be_demoted(login):
+    alice, alice_id = login("alice")
+    _, bob_id = login("bob")
+    container_id = add_container(alice)
+    alice.post(f"/api/container/{container_id}/members", json={"username": "bob"})
+
+    assert alice.post(f"/api/container/{container_id}/members/{alice_id}", json={"role": "member"}).status_code == 409
+    assert alice.delete(f"/api/container/{container_id}/members/{alice_id}").status_code == 409
+
+    assert alice.post(f"/api/container/{container_id}/members/{bob_id}", json={"role": "admin"}).status_code == 200
+    assert alice.delete(f"/api/container/{container_id}/members/{alice_id}").status_code == 200
+
+
+def test_admins_removing_each_other_keep_one_admin(database):
+    container_id = database.containers.insert_one({"name": "Films", "admin_count": 1}).inserted_id
+    alice, bob = ObjectId(), ObjectId()
+    database.memberships.insert_one(memberships.membership(container_id, alice, memberships.ADMIN))
+    memberships.add(container_id, bob, memberships.ADMIN)
+
+    # Both passed the admin check of their request before either removal
+    assert memberships.remove(container_id, alice) is True
+    assert memberships.remove(container_id, bob) is False
+    assert memberships.demote(container_id, bob) is False
+    assert database.memberships.count_documents({"container_id": container_id, "role": memberships.ADMIN}) == 1
+    assert database.containers.find_one({"_id": container_id})["admin_count"] == 1
+
+
+def test_removed_creator_cannot_replace_the_container_by_import(login, database):
+    alice, alice_id = login("alice")
+    bob, _ = login("bob")
+    container_id = add_container(alice)
+    alice.post(f"/api/container/{container_id}/members", json={"username": "bob", "role": "admin"})
+    assert bob.delete(f"/api/container/{container_id}/members/{alice_id}").status_code == 200
+    assert alice.get(f"/api/container/{container_id}").status_code == 403
+
+    plan = plan_import({"containers": [{"name": "Films", "categories": [], "items": []}]}, alice_id, "replace")
+    assert plan["containers"][0]["action"] == "create"
+    assert plan["containers"][0]["replaces"] is None
+
+
+@pytest.mark.requires_mongod
+def test_member_ids_are_migrated_with_an_admin(database):
+    admin, member = ObjectId(), ObjectId()
+    # admin_id outside member_ids was allowed by the old access check
+    container_id = database.containers.insert_one({"name": "Old", "admin_id": admin, "member_ids": [member]}).inserted_id
+
+    assert memberships.migrate(database) == (1, 2)
+    assert memberships.migrate(database) == (0, 0)
+    container = database.containers.find_one({"_id": container_id})
+    assert "member_ids" not in container
+    assert container["admin_count"] == 1
+    assert memberships.user_roles(admin, database) == {container_id: memberships.ADMIN}
+    assert memberships.user_roles(member, database) == {container_id: memberships.MEMBER}
+
+
+def test_container_responses_hide_bookkeeping_fields(login):
+    alice, _ = login("alice")
+    container_id = add_container(alice)
+    alice.post(f"/api/container/{container_id}/category/add", json={"name": "DVD"})
+
+    for container in (alice.get(f"/api/container/{container_id}").get_json(), alice.get("/api/containers").get_json()[0]):
+        assert container["name"] == "Films"
+        assert "admin_count" not in container
+        assert "categories_version" not in container
@@ -0,0 +1,51 @@
+import random
+from itertools import combinations
+from bson import ObjectId
+from app.api.utils import phash
+
+
+def flip(image_hash, bits):
+    value = int(image_hash, 16)
+    for bit in bits:
+        value ^= 1 << bit
+    return f"{value:016x}"
+
+
+def test_probe_keys_find_every_hash_within_the_distance():
+    rng = random.Random(7)
+    for _ in range(200):
+        image_hash = f"{rng.getrandbits(64):016x}"
+        max_distance = rng.randint(0, phash.MAX_DISTANCE)
+        other = flip(image_hash, rng.sample(range(phash.HASH_BITS), max_distance))
+
+        assert phash.distance(image_hash, other) == max_distance
+        assert set(phash.band_keys(other)) & set(phash.probe_keys(image_hash, max_distance))
+
+
+def test_similar_items_and_pairs_match_the_brute_force(database):
+    rng = random.Random(11)
+    container_id = ObjectId()
+    bases = [f"{rng.getrandbits(64):016x}" for _ in range(5)]
+    hashes = [flip(rng.choice(bases), rng.sample(range(64), rng.randint(0, 10))) for _ in range(40)]
+    database.items.insert_many([
+        {"container_id": container_id, "name": str(index), **phash.image_hash_fields(image_hash)}
+        for index, image_hash in enumerate(hashes)
+    ])
+    database.items.insert_one({"container_id": container_id, "name": "no image", **phash.image_hash_fields(None)})
+    names = {item["_id"]: item["name"] for item in database.items.find()}
+    max_distance = phash.DEFAULT_MAX_DISTANCE
+
+    expected = {
+        frozenset((str(a), str(b)))
+        for a, b in combinations(range(len(hashes)), 2)
+        if phash.distance(hashes[a], hashes[b]) <= max_distance
+    }
+    pairs, _ = phash.similar_pairs(database, container_id, max_distance)
+    assert {frozenset((names[a], names[b])) for a, b, _ in pairs} == expected
+
+    found = phash.similar_items(database, container_id, hashes[0], max_distance)
+    assert {item["_id"] for item, _ in found} == {
+        key for key, name in names.items()
+        if name != "no image" and phash.distance(hashes[0], hashes[int(name)]) <= max_distance
+    }
+    assert [d for _, d in found] == sorted(d for _, d in found)
@@ -0,0 +1,90 @@
+from types import SimpleNamespace
+import pytest
+from flask import Response, stream_with_context
+from bson import ObjectId
+from app.query_budget import QueryShapeListener, command_shape
+
+listener = QueryShapeListener()
+
+
+def issue(command_name, collection, **fields):
+    """Feed a synthetic command to the listener, as pymongo does before sending it"""
+    listener.started(SimpleNamespace(command_name=command_name, command={command_name: collection, **fields}))
+
+
+def test_commands_within_budget_are_recorded(query_budget):
+    with query_budget(max_commands=2, max_repeats=1) as log:
+        issue("find", "items", filter={"container_id": ObjectId()})
+        issue("getMore", "items")
+        issue("count", "items", query={"container_id": ObjectId(), "tags": "a"})
+
+    assert log.shapes == ["find items {container_id: ?}", "count items {container_id: ?, tags: ?}"]
+
+
+def test_commands_over_budget_fail_the_test(query_budget):
+    with pytest.raises(pytest.fail.Exception, match=r"3 MongoDB commands \(budget 2\)"):
+        with query_budget(max_commands=2):
+            for name in ("Alien", "Heat", "Ran"):
+                issue("insert", "items", documents=[{"name": name}])
+
+
+def test_repeated_query_shapes_fail_the_test(query_budget):
+    with pytest.raises(pytest.fail.Exception, match=r"3x identical query find categories \{_id: \?\}"):
+        with query_budget(max_repeats=2):
+            for _ in range(3):
+                issue("find", "categories", filter={"_id": ObjectId()})
+
+
+def test_requests_report_their_command_count(app, query_budget):
+    @app.route("/test/queries")
+    def queries():
+        issue("find", "containers", filter={"_id": ObjectId()})
+        issue("find", "items", filter={"container_id": ObjectId()})
+        return "", 204
+
+    with query_budget(max_commands=2) as log:
+        response = app.test_client().get("/test/queries")
+
+    assert response.headers["X-Query-Count"] == "2"
+    assert log.count == 2
+
+
+def test_command_shapes_hide_values():
+    assert command_shape("update", {"update": "items", "updates": [{"q": {"_id": 1, "tags": {"$in": ["a"]}}}]}) == "update items {_id: ?, tags: {$in: [?]}}"
+    assert command_shape("aggregate", {"aggregate": "items", "pipeline": [{"$match": {"container_id": 1}}]}) == "aggregate items [{$match: {container_id: ?}}]"
+
+
+@pytest.mark.requires_mongod
+def test_item_list_stays_within_its_query_budget(login, query_budget):
+    client, _ = login("alice")
+    container_id = client.post("/api/container/add", json={"name": "Films"}).get_json()["id"]
+    category_id = client.post(f"/api/container/{container_id}/category/add", json={"name": "DVD"}).get_json()["id"]
+    for index in range(30):
+        client.post(f"/api/container/{container_id}/item/add", json={"owner": "alice", "name": f"Item {index}", "value": 1, "category": category_id})
+
+    with query_budget(max_commands=4, max_repeats=1):
+        response = client.get(f"/api/container/{container_id}/items")
+
+    assert response.status_code == 200
+    assert int(response.headers["X-Query-Count"]) <= 4
+
+
+def test_streamed_responses_are_checked_when_closed(app, query_budget, caplog):
+    @app.route("/test/stream")
+    def stream():
+        def chunks():
+            for _ in range(3):
+                issue("find", "items", filter={"_id": ObjectId()})
+                yield b"chunk"
+        return Response(stream_with_context(chunks()))
+
+    app.config["QUERY_BUDGET"] = 2
+    with query_budget() as log:
+        with app.test_client().get("/test/stream") as response:
+            assert response.get_data() == b"chunk" * 3
+
+    # The commands of the body reach the request log, checked once the stream is closed
+    assert "X-Query-Count" not in response.headers
+    assert log.count == 3
+    assert "Query budget exceeded by GET /test/stream" in caplog.text
+    assert "3 MongoDB commands (budget 2)" in caplog.text
@@ -0,0 +1,32 @@
+import pytest
+
+
+@pytest.fixture
+def films(login):
+    client, _ = login("alice")
+    container_id = client.post("/api/container/add", json={"name": "Films"}).get_json()["id"]
+    category_id = client.post(f"/api/container/{container_id}/category/add", json={"name": "DVD"}).get_json()["id"]
+    for name, serie in [("Star Wars", ""), ("Alien", "Alien"), ("Aliens", "Alien"), ("Prometheus", "Alien"), ("Ran", "")]:
+        client.post(f"/api/container/{container_id}/item/add", json={"owner": "alice", "name": name, "serie": serie, "value": 1, "category": category_id})
+    return client, container_id
+
+
+def search(client, container_id, **params):
+    response = client.get(f"/api/container/{container_id}/items/search", query_string=params)
+    assert response.status_code == 200
+    return [item["name"] for item in response.get_json()]
+
+
+def test_search_by_name_prefix(films):
+    client, container_id = films
+    assert search(client, container_id, q="ALI") == ["Alien", "Aliens"]
+    assert search(client, container_id, q="s") == ["Star Wars"]
+
+
+def test_search_all_fields_merges_names_and_series(films):
+    client, container_id = films
+    names = search(client, container_id, q="ali", field="all")
+
+    assert sorted(names) == ["Alien", "Aliens", "Prometheus"]
+    assert len(search(client, container_id, q="ali", field="all", limit=2)) == 2
+    assert search(client, container_id, q="zz", field="all") == []
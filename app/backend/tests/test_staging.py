@@ -0,0 +1,63 @@
+import datetime
+import pytest
+from bson import ObjectId
+from app.api.utils import staging
+
+
+@pytest.fixture
+def upload(login, database, tmp_path, monkeypatch):
+    """(client of the owner, id of an upload of the client being imported)"""
+    monkeypatch.setattr(staging, "STAGING_FOLDER", tmp_path / "staging")
+    client, _ = login("alice")
+    response = client.post("/api/import/uploads", json={"size": 10, "sha256": "0" * 64, "filename": "export.json"})
+    assert response.status_code == 201, response.get_json()
+    upload_id = response.get_json()["upload_id"]
+    database.import_uploads.update_one({"_id": ObjectId(upload_id)}, {"$set": {"status": "importing"}})
+    return client, upload_id
+
+
+def beat(database, upload_id, seconds_ago):
+    heartbeat_at = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=seconds_ago)
+    database.import_uploads.update_one({"_id": ObjectId(upload_id)}, {"$set": {"heartbeat_at": heartbeat_at}})
+
+
+def test_running_import_cannot_be_deleted(upload, database):
+    client, upload_id = upload
+    beat(database, upload_id, 10)
+
+    assert client.get(f"/api/import/uploads/{upload_id}").get_json()["status"] == "importing"
+    assert client.delete(f"/api/import/uploads/{upload_id}").status_code == 409
+
+
+@pytest.mark.parametrize("seconds_ago", [staging.STALE_SECONDS + 60, None])
+def test_interrupted_import_fails_and_can_be_deleted(upload, database, seconds_ago):
+    client, upload_id = upload
+    if seconds_ago is not None:
+        beat(database, upload_id, seconds_ago)
+
+    status = client.get(f"/api/import/uploads/{upload_id}").get_json()
+    assert (status["status"], status["error"]) == ("failed", "Import interrupted, finalize the upload again")
+    assert client.delete(f"/api/import/uploads/{upload_id}").status_code == 200
+    assert database.import_uploads.count_documents({}) == 0
+
+
+def test_other_users_cannot_see_an_upload(upload, login):
+    _, upload_id = upload
+    bob, _ = login("bob")
+
+    assert bob.get(f"/api/import/uploads/{upload_id}").status_code == 404
+    assert bob.delete(f"/api/import/uploads/{upload_id}").status_code == 404
+
+
+def test_checksum_mismatch_fails_the_finalized_import(login, tmp_path, monkeypatch):
+    monkeypatch.setattr(staging, "STAGING_FOLDER", tmp_path / "staging")
+    client, _ = login("alice")
+    upload_id = client.post("/api/import/uploads", json={"size": 10, "sha256": "0" * 64}).get_json()["upload_id"]
+    assert client.put(f"/api/import/uploads/{upload_id}/chunks/0", data=b"0123456789").status_code == 200
+
+    # The file is verified in the background, not by the request
+    assert client.post(f"/api/import/uploads/{upload_id}/finalize", json={}).status_code == 202
+    staging._get_pool().submit(lambda: None).result(timeout=10)
+
+    status = client.get(f"/api/import/uploads/{upload_id}").get_json()
+    assert (status["status"], status["error"]) == ("failed", "Assembled file does not match the declared size and sha256")
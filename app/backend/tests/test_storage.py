@@ -0,0 +1,39 @@
+import pytest
+from app import storage
+
+
+def test_incomplete_storage_backends_cannot_be_created():
+    class WriteOnly(storage.MediaStorage):
+        def save(self, name, data):
+            pass
+
+    with pytest.raises(TypeError):
+        WriteOnly()
+
+
+def test_local_storage_replaces_files(tmp_path):
+    area = storage.LocalStorage(tmp_path)
+    area.save("a.jpg", b"first")
+    area.save("a.jpg", b"second")
+
+    assert area.read("a.jpg") == b"second"
+    assert area.sizes(["a.jpg", "b.jpg"]) == {"a.jpg": 6}
+
+
+class FailingUpload:
+    def read(self, size=-1):
+        raise OSError("Connection reset by peer")
+
+
+@pytest.mark.requires_mongod
+def test_gridfs_save_keeps_the_file_until_the_new_one_is_uploaded(database):
+    area = storage.GridFSStorage("test_media")
+    area.save("a.jpg", b"first")
+
+    with pytest.raises(OSError):
+        area.save("a.jpg", FailingUpload())
+    assert area.read("a.jpg") == b"first"
+
+    area.save("a.jpg", b"second")
+    assert area.read("a.jpg") == b"second"
+    assert database["test_media.files"].count_documents({"filename": "a.jpg"}) == 1
@@ -32,8 +32,7 @@ const AddItemPage = () => {
   
   const [formData, setFormData] = useState(initialFormData);
   const [imagePreview, setImagePreview] = useState(null);
-  const [imageData, setImageData] = useState(null);
-  const [imageExtension, setImageExtension] = useState(null);
+  const [imageToken, setImageToken] = useState(null);
   const [error, setError] = useState(null);
   const [success, setSuccess] = useState(null);
   const [loading, setLoading] = useState(false);
@@ -44,8 +43,8 @@ const AddItemPage = () => {
     setFormData((prev) => ({ ...prev, [name]: value }));
   };
   
-  // Handle image selection and convert to base64
-  const handleImageChange = (e) => {
+  // Handle image selection: the server validates and stages it, the item references its token
+  const handleImageChange = async (e) => {
     const file = e.target.files[0];
     if (!file) {
       return;
@@ -55,7 +54,7 @@ const AddItemPage = () => {
     setError(null);
 
     // Validate file type
-    const validTypes = ['image/png', 'image/jpeg', 'image/jpg', 'image/gif'];
+    const validTypes = ['image/png', 'image/jpeg', 'image/jpg', 'image/gif', 'image/webp'];
     if (!validTypes.includes(file.type)) {
       setError(t('invalid_image_type'));
       setLoading(false);
@@ -71,28 +70,19 @@ const AddItemPage = () => {
     }
 
     try {
-      const reader = new FileReader();
-      
-      reader.onloadend = () => {
-        const base64String = reader.result.split(',')[1];
-        const extension = '.' + file.name.split('.').pop().toLowerCase();
-        
-        setImageData(base64String);
-        setImageExtension(extension);
-        setImagePreview(reader.result);
-        
-        setSuccess(t('image_loaded'));
-        setLoading(false);
-      };
-      
-      reader.onerror = (error) => {
-        setError(t('image_load_failed'));
-        setLoading(false);
-      };
-      
-      reader.readAsDataURL(file);
+      const body = new FormData();
+      body.append('image', file);
+      const response = await axios.post('/upload/image/preview', body, {
+        headers: { 'Content-Type': 'multipart/form-data' },
+      });
+
+      setImageToken(response.data.image_token);
+      setImagePreview(URL.createObjectURL(file));
+      setSuccess(t('image_loaded'));
     } catch (err) {
-      setError(t('image_load_failed'));
+      console.error("Image upload failed:", err);
+      setError(err.response?.data?.error || t('image_load_failed'));
+    } finally {
       setLoading(false);
     }
   };
@@ -106,9 +96,8 @@ const AddItemPage = () => {
       ...formData,
       creation_date: new Date().toISOString(),
       tags: formData.tags.split(",").map(tag => tag.trim()).filter(Boolean),
-      // Include base64 image data if present
-      image_data: imageData,
-      image_extension: imageExtension,
+      // Staged image, if any
+      image_token: imageToken,
     };
 
     try {
@@ -123,8 +112,7 @@ const AddItemPage = () => {
       });
       
       // Reset image
-      setImageData(null);
-      setImageExtension(null);
+      setImageToken(null);
       setImagePreview(null);
       
       // Reset file input
@@ -138,8 +126,7 @@ const AddItemPage = () => {
   };
 
   const handleRemoveImage = () => {
-    setImageData(null);
-    setImageExtension(null);
+    setImageToken(null);
     setImagePreview(null);
     setSuccess(null);
     
@@ -189,6 +176,12 @@ const AddItemPage = () => {
     fetchContainer();
   }, [containerId]);
 
+  // Release the object URL of a local preview when it is replaced or on unmount
+  useEffect(() => {
+    if (!imagePreview?.startsWith('blob:')) return undefined;
+    return () => URL.revokeObjectURL(imagePreview);
+  }, [imagePreview]);
+
 
   return (
     <div className="container">
@@ -5,7 +5,8 @@ import { useTranslation } from 'react-i18next';
 import { getConditionLabel } from '../utils/TranslationHelper';
 import axios from "../api/axiosConfig";
 import "./DashboardPage.css";
-import getPublicImageUrl from "../utils/Media";
+import getPublicImageUrl, { spriteStyle } from "../utils/Media";
+import { THUMBNAIL_BATCH_SIZE } from "../utils/Const";
 import ImageLightbox from "../components/ImageLightbox";
 
 
@@ -30,6 +31,7 @@ const DashboardPage = () => {
 
   const [categories, setCategories] = useState([]);
   const [searchTerm, setSearchTerm] = useState("");
+  const [thumbnails, setThumbnails] = useState({});
   
   
   const requiredColumns = [
@@ -128,6 +130,46 @@ const DashboardPage = () => {
     fetchItems();
   }, [selectedContainer, navigate]);
 
+  // Fetch the item icons as sprite sheets, one request per batch instead of one per image
+  useEffect(() => {
+    if (!selectedContainer || !visibleColumns.includes("image_path")) return;
+    const names = [...new Set(items.map((item) => item.image_path).filter((name) => name && name !== "not-image.png"))];
+    if (names.length === 0) return;
+
+    let cancelled = false;
+    const urls = [];
+    const fetchThumbnails = async () => {
+      const batches = [];
+      for (let i = 0; i < names.length; i += THUMBNAIL_BATCH_SIZE) {
+        batches.push(names.slice(i, i + THUMBNAIL_BATCH_SIZE));
+      }
+      try {
+        const responses = await Promise.all(batches.map((batch) =>
+          axios.post(`/container/${selectedContainer}/media/thumbnails`, { names: batch, size: 64 })
+        ));
+        const loaded = {};
+        for (const { data } of responses) {
+          if (!data.sprite) continue;
+          const bytes = Uint8Array.from(atob(data.sprite), (c) => c.charCodeAt(0));
+          const url = URL.createObjectURL(new Blob([bytes], { type: data.mimetype }));
+          urls.push(url);
+          for (const [name, tile] of Object.entries(data.tiles)) {
+            loaded[name] = { url, tile, width: data.width, height: data.height };
+          }
+        }
+        if (!cancelled) setThumbnails(loaded);
+      } catch (error) {
+        console.error("Error fetching thumbnails:", error.message);
+      }
+    };
+
+    fetchThumbnails();
+    return () => {
+      cancelled = true;
+      urls.forEach((url) => URL.revokeObjectURL(url));
+    };
+  }, [items, selectedContainer, visibleColumns]);
+
   // Fetch categories
   useEffect(() => {
     if (!selectedContainer) return;
@@ -383,7 +425,9 @@ const DashboardPage = () => {
                             {col.key === "tags"
                               ? item[col.key]?.join(", ")
                               : col.key === "image_path"
-                              ? <img src={getPublicImageUrl(item[col.key])} alt="Item ICON" className="item-icon" />
+                              ? (thumbnails[item[col.key]]
+                                ? <span role="img" aria-label="Item ICON" className="item-icon" style={spriteStyle(thumbnails[item[col.key]], 20)} />
+                                : <img src={getPublicImageUrl(null)} alt="Item ICON" className="item-icon" />)
                               : col.key === "condition"
                               ? getConditionLabel(item[col.key])
                               : col.key === "date_created"
@@ -33,8 +33,7 @@ const EditItemPage = () => {
     edition: "",
   });
   const [imagePreview, setImagePreview] = useState(null);
-  const [imageData, setImageData] = useState(null);
-  const [imageExtension, setImageExtension] = useState(null);
+  const [imageToken, setImageToken] = useState(null);
   const [existingImagePath, setExistingImagePath] = useState(null);
   const [error, setError] = useState(null);
   const [success, setSuccess] = useState(null);
@@ -114,13 +113,19 @@ const EditItemPage = () => {
     fetchContainer();
   }, [containerId]);
 
+  // Release the object URL of a local preview when it is replaced or on unmount
+  useEffect(() => {
+    if (!imagePreview?.startsWith('blob:')) return undefined;
+    return () => URL.revokeObjectURL(imagePreview);
+  }, [imagePreview]);
+
   const handleChange = (e) => {
     const { name, value } = e.target;
     setFormData((prev) => ({ ...prev, [name]: value }));
   };
 
-  // Handle image selection and convert to base64
-  const handleImageChange = (e) => {
+  // Handle image selection: the server validates and stages it, the item references its token
+  const handleImageChange = async (e) => {
     const file = e.target.files[0];
     if (!file) return;
     
@@ -128,7 +133,7 @@ const EditItemPage = () => {
     setError(null);
 
     // Validate file type
-    const validTypes = ['image/png', 'image/jpeg', 'image/jpg', 'image/gif'];
+    const validTypes = ['image/png', 'image/jpeg', 'image/jpg', 'image/gif', 'image/webp'];
     if (!validTypes.includes(file.type)) {
       setError(t('invalid_image_type'));
       setLoading(false);
@@ -144,37 +149,26 @@ const EditItemPage = () => {
     }
 
     try {
-      const reader = new FileReader();
-      
-      reader.onloadend = () => {
-        const base64String = reader.result.split(',')[1];
-        const extension = '.' + file.name.split('.').pop().toLowerCase();
-        
-        setImageData(base64String);
-        setImageExtension(extension);
-        setImagePreview(reader.result);
-        setExistingImagePath(null); // Clear existing image reference
-        
-        setSuccess(t('image_loaded'));
-        setLoading(false);
-      };
-      
-      reader.onerror = () => {
-        setError(t('image_load_failed'));
-        setLoading(false);
-      };
-      
-      reader.readAsDataURL(file);
+      const body = new FormData();
+      body.append('image', file);
+      const response = await axios.post('/upload/image/preview', body, {
+        headers: { 'Content-Type': 'multipart/form-data' },
+      });
+
+      setImageToken(response.data.image_token);
+      setImagePreview(URL.createObjectURL(file));
+      setExistingImagePath(null); // Clear existing image reference
+      setSuccess(t('image_loaded'));
     } catch (err) {
-      console.error("Image loading failed:", err);
-      setError(t('image_load_failed'));
+      console.error("Image upload failed:", err);
+      setError(err.response?.data?.error || t('image_load_failed'));
+    } finally {
       setLoading(false);
     }
   };
 
   const handleRemoveImage = () => {
-    setImageData(null);
-    setImageExtension(null);
+    setImageToken(null);
     setImagePreview(null);
     setExistingImagePath(null);
     setSuccess(null);
@@ -195,9 +189,8 @@ const EditItemPage = () => {
     };
 
     // Include new image if uploaded
-    if (imageData) {
-      updatedItem.image_data = imageData;
-      updatedItem.image_extension = imageExtension;
+    if (imageToken) {
+      updatedItem.image_token = imageToken;
     } else if (existingImagePath) {
       // Keep existing image
       updatedItem.image_path = existingImagePath;
@@ -373,7 +366,7 @@ const EditItemPage = () => {
           </h3>
           <img
             src={
-              imagePreview.startsWith('data:') ? imagePreview : getPublicImageUrl(imagePreview)
+              /^(blob|data):/.test(imagePreview) ? imagePreview : getPublicImageUrl(imagePreview)
             }
             alt="Preview" 
             style={{ 
@@ -1 +1,3 @@
 export const DEFAULT_NOT_IMAGE_PATH = "not-image.png";
+// Image names per thumbnail sprite request (server maximum)
+export const THUMBNAIL_BATCH_SIZE = 100;
@@ -10,4 +10,17 @@ const getPublicImageUrl = (path) => {
   return `${API_BASE_URL}/media/${filename}`;
 };
 
+// Style showing one tile of a thumbnail sprite sheet, covering a size x size box
+export const spriteStyle = ({ url, tile, width, height }, size) => {
+  const scale = size / Math.min(tile.w, tile.h);
+  return {
+    display: "inline-block",
+    width: size,
+    height: size,
+    backgroundImage: `url(${url})`,
+    backgroundSize: `${width * scale}px ${height * scale}px`,
+    backgroundPosition: `${-(tile.x * scale + (tile.w * scale - size) / 2)}px ${-(tile.y * scale + (tile.h * scale - size) / 2)}px`,
+  };
+};
+
 export default getPublicImageUrl;